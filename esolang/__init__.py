@@ -1,10 +1,115 @@
-# A list of interpreter classes
+"""Interpreters for esoteric programming languages.
+
+The interpreters are described by lightweight Language descriptors,
+so an interpreter module is only imported, when it is actually used.
+Other packages can add languages using the "esolang.languages" entry
+point group (see plugins()).
+"""
+
+from importlib import import_module
+from warnings import warn
+
+__version__ = "0.1.0"
+
+# A list of interpreter classes, which have been imported so far
+# (each interpreter module appends its class).
 INTERPRETERS = []
 
-# Import modules and let them register with INTERPRETERS
-import esolang.lang.abcr
-import esolang.lang.befunge
-import esolang.lang.brainfuck
-import esolang.lang.l33t
-import esolang.lang.monkeys
-import esolang.lang.past
+
+class Language(object):
+    """Describes an interpreter class without importing it.
+
+    Args:
+        lang: The name of the language.
+        ext: The file extension used by the language.
+        module: The name of the module defining the interpreter.
+        name: The name of the interpreter class in that module.
+    """
+
+    def __init__(self, lang, ext, module, name):
+        self.lang = lang
+        self.ext = ext
+        self.module = module
+        self.name = name
+
+    def __repr__(self):
+        return "Language(%r, %r, %r, %r)" % (
+            self.lang, self.ext, self.module, self.name)
+
+    def load(self):
+        """Import the module and return the interpreter class."""
+        return getattr(import_module(self.module), self.name)
+
+
+# The languages bundled with esolang
+LANGUAGES = [
+    Language("ABCR", ".abcr", "esolang.lang.abcr", "ABCRInterpreter"),
+    Language("Befunge", ".bf", "esolang.lang.befunge", "BefungeInterpreter"),
+    Language("Brainfuck", ".b", "esolang.lang.brainfuck",
+             "BrainfuckInterpreter"),
+    Language("l33t", ".l33t", "esolang.lang.l33t", "L33tInterpreter"),
+    Language("Monkeys", ".mky", "esolang.lang.monkeys", "MonkeysInterpreter"),
+    Language("My Unreliable Past", ".past", "esolang.lang.past",
+             "Interpreter"),
+]
+
+_plugins = None
+
+
+def plugins():
+    """Return the languages registered by other packages.
+
+    An entry point in the "esolang.languages" group may refer to a
+    Language descriptor (which should live in a module, that is cheap
+    to import) or to an interpreter class. Entry points are only loaded
+    on the first call.
+    """
+    global _plugins
+
+    if _plugins is None:
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:
+            return []
+
+        eps = entry_points()
+        if hasattr(eps, "select"):
+            eps = eps.select(group="esolang.languages")
+        else:
+            eps = eps.get("esolang.languages", [])
+
+        _plugins = []
+        for ep in eps:
+            try:
+                obj = ep.load()
+            except Exception as e:
+                warn("Failed to load esolang plugin %r: %s" % (ep.name, e))
+                continue
+
+            if not isinstance(obj, Language):
+                obj = Language(obj.lang, obj.ext, obj.__module__,
+                               obj.__name__)
+            _plugins.append(obj)
+
+    return _plugins
+
+
+def languages():
+    """Return the bundled languages followed by those of plugins."""
+    return LANGUAGES + plugins()
+
+
+def find(ext=None, lang=None):
+    """Return the languages with the given extension or name.
+
+    The bundled languages take precedence: Plugins are only looked
+    up, if none of them matches.
+    """
+    def matches(language):
+        return ((ext is None or language.ext == ext) and
+                (lang is None or language.lang == lang))
+
+    found = [language for language in LANGUAGES if matches(language)]
+    if not found:
+        found = [language for language in plugins() if matches(language)]
+    return found
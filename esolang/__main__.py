@@ -1,47 +1,270 @@
 from __future__ import print_function
 
+import json
 import logging
 import os.path
 import sys
+import traceback
 
 from argparse import ArgumentParser
-from esolang import INTERPRETERS
+from io import BytesIO, StringIO
+from itertools import repeat
+from time import monotonic, process_time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import esolang
+
+from esolang import governor
+from esolang.interpreter import Interpreter, ENGINES
 
 
 def list_languages():
     print("Available languages:")
-    for cls in INTERPRETERS:
-        print("  - %s (%s)" % (cls.lang, cls.ext))
+    for language in esolang.languages():
+        print("  - %s (%s)" % (language.lang, language.ext))
 
 
 def select_interpreter(filename, lang=None):
+    """Return the interpreter class for filename (or lang).
+
+    Only the module of the selected interpreter is imported.
+    """
     if lang is None:
         ext = os.path.splitext(filename)[-1]
-        classes = [cls for cls in INTERPRETERS if cls.ext == ext]
-        if not classes:
+        languages = esolang.find(ext=ext)
+        if not languages:
             raise ValueError(
                 ("No interpreter available for extension '%s'.\n" +
                  "Please specify a language using --lang.") % ext)
-        elif len(classes) > 1:
-            langs = ["'%s'" % cls.lang for cls in classes]
+        elif len(languages) > 1:
+            langs = ["'%s'" % language.lang for language in languages]
             raise ValueError(
                 ("Multiple interpreters available for extension '%s'.\n" +
                  "Please specify a language using --lang.\n" +
                  "Candidates are: %s") % (ext, ", ".join(langs)))
-        else:
-            return classes[0]
     else:
-        classes = [cls for cls in INTERPRETERS if cls.lang == lang]
-        if not classes:
+        languages = esolang.find(lang=lang)
+        if not languages:
             raise ValueError("No interpreter available for lang '%s'" % lang)
+
+    return languages[0].load()
+
+
+def peak_memory():
+    """Return the peak resident set size of the process in bytes (None,
+    where it isn't available)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def write_stats(statsfile, stats):
+    """Write the stats of a run as a JSON line to statsfile."""
+    statsfile.write(json.dumps(stats, sort_keys=True) + "\n")
+    statsfile.flush()
+
+
+def run_file(cls, filename, infile=None, outfile=None, errfile=None,
+             instrument=False, limits=None, engine="auto", trace=None,
+             cache=None, stats=None, profile=None):
+    """Run the source file with a new instance of cls.
+
+    Errors are written to errfile. With instrument set, a report of
+    the executed instructions and I/O is written to errfile as well
+    (see esolang.instrument). With limits set, the program is stopped
+    with exit code 5, when it exceeds them (see esolang.governor).
+    engine selects the execution engine (see Interpreter.engine).
+    With trace set, the steps and I/O are recorded into the file
+    trace (see esolang.trace). With cache set (an
+    esolang.cache.LRUCache), the program is compiled through it.
+    With stats set, the metrics of the run are written as JSON line
+    to the file stats (see write_stats()). With profile set, the run
+    is profiled with cProfile and the pstats written to the file
+    profile.
+
+    Returns:
+        int: The exit code (0 on success).
+    """
+    infile = sys.stdin if infile is None else infile
+    outfile = sys.stdout if outfile is None else outfile
+    errfile = sys.stderr if errfile is None else errfile
+
+    try:
+        with open(filename, "r") as f:
+            source = f.read()
+    except IOError as e:
+        print(e, file=errfile)
+        return 2
+
+    intp = cls(infile=infile, outfile=outfile, engine=engine)
+    if instrument:
+        instrumentation = intp.instrument()
+    tracer = None
+    if trace is not None:
+        from esolang.trace import Tracer
+        tracer = Tracer(intp, trace)
+    profiler = None
+    if profile is not None:
+        from cProfile import Profile
+        profiler = Profile()
+
+    code = 0
+    status = None
+    start = monotonic()
+    cpu_start = process_time()
+    try:
+        if profiler is not None:
+            profiler.enable()
+
+        if cache is not None and isinstance(intp, Interpreter):
+            program, _ = cache.compile(intp, source)
+            intp.load_program(program)
+            intp.start()
+            source = None
+
+        if limits is None:
+            status = intp.run(source)
+        else:
+            status = governor.run(intp, source, limits)
+    except ValueError as e:
+        print(e, file=errfile)
+        code = 3
+    except governor.ResourceExceeded as e:
+        print(e, file=errfile)
+        code = 5
+    except RuntimeError as e:
+        print(e, file=errfile)
+        code = 4
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        if tracer is not None:
+            tracer.close()
+        if instrument:
+            outfile.flush()
+            print("%s (%s):" % (filename, cls.lang), file=errfile)
+            print(instrumentation.report(), file=errfile)
+
+    if stats is not None:
+        seconds = monotonic() - start
+        steps = getattr(intp, "steps", None)
+        reader = getattr(intp, "reader", None)
+        writer = getattr(intp, "writer", None)
+        write_stats(stats, {
+            "filename": filename,
+            "lang": cls.lang,
+            "engine": engine,
+            "exit": code,
+            "status": status,
+            "steps": steps,
+            "seconds": seconds,
+            "cpu_seconds": process_time() - cpu_start,
+            "steps_per_second": steps / seconds
+            if steps is not None and seconds > 0 else None,
+            "peak_memory": peak_memory(),
+            "input_bytes": None if reader is None else reader.consumed,
+            "output_bytes": None if writer is None else writer.written,
+        })
+
+    return code
+
+
+def run_captured(lang, filename, stdin, instrument=False, limits=None,
+                 engine="auto", cache=False, stats=False):
+    """Run a source file in a worker process (see run_parallel()).
+
+    With cache set, the compiled program is kept in the default
+    esolang.cache.DiskCache.
+
+    stdin and the output are bytes, so the output is the same as the
+    one of a run in the main process (see esolang.streams).
+
+    Returns:
+        tuple: The exit code, the output, the error output and the
+               stats written by run_file() (empty unless stats is set).
+    """
+    outfile = BytesIO()
+    errfile = StringIO()
+    statsfile = StringIO() if stats else None
+
+    try:
+        cls = select_interpreter(filename, lang)
+        if cache:
+            from esolang.cache import LRUCache, DiskCache
+            cache = LRUCache(disk=DiskCache())
         else:
-            return classes[0]
+            cache = None
+        code = run_file(cls, filename, BytesIO(stdin), outfile, errfile,
+                        instrument, limits, engine, cache=cache,
+                        stats=statsfile)
+    except Exception:
+        traceback.print_exc(file=errfile)
+        code = 1
+
+    return (code, outfile.getvalue(), errfile.getvalue(),
+            "" if statsfile is None else statsfile.getvalue())
+
+
+def run_parallel(jobs, workers, instrument=False, limits=None,
+                 engine="auto", cache=False, stats=None):
+    """Run the (cls, filename) jobs in a pool of worker processes.
+
+    Each job gets a copy of the standard input. The output of each
+    job is captured and written in the order of the jobs (the stats
+    to the file stats, see run_file()).
+
+    Returns:
+        int: The highest exit code of all jobs.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    stdin = b"" if sys.stdin.isatty() else \
+        getattr(sys.stdin, "buffer", sys.stdin).read()
+    stdout = getattr(sys.stdout, "buffer", sys.stdout)
+    status = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            run_captured,
+            [cls.lang for cls, _ in jobs],
+            [filename for _, filename in jobs],
+            repeat(stdin),
+            repeat(instrument),
+            repeat(limits),
+            repeat(engine),
+            repeat(cache),
+            repeat(stats is not None))
+
+        for code, output, errors, lines in results:
+            stdout.write(output)
+            stdout.flush()
+            sys.stderr.write(errors)
+            if lines:
+                stats.write(lines)
+                stats.flush()
+            status = max(status, code)
+
+    return status
 
 
 def main():
+    if sys.argv[1:2] in (["serve"], ["client"]):
+        from esolang import server
+        sys.exit(server.main(sys.argv[1:]))
+
     # build parser and parse command line arguments
     parser = ArgumentParser(
-        description="Run esoteric programming language source files.")
+        description="Run esoteric programming language source files.",
+        epilog="See 'python -m esolang serve --help' and "
+               "'python -m esolang client --help' for running programs "
+               "in a local server.")
     parser.add_argument(
         "filenames", metavar="filename", nargs="*",
         help="an esolang filename to run")
@@ -51,6 +274,50 @@ def main():
     parser.add_argument(
         "-l", "--lang",
         help="interpret the given filename(s) in the given esolang")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="run up to JOBS files in parallel; the output of each file "
+             "is captured and written in order")
+    parser.add_argument(
+        "--instrument", action="store_true",
+        help="write a report of the executed instructions and I/O "
+             "to stderr after each file")
+    parser.add_argument(
+        "--trace", metavar="FILE",
+        help="record the executed instructions and I/O into FILE; see "
+             "'python -m esolang.trace --help' for reading it")
+    parser.add_argument(
+        "--stats", metavar="FILE",
+        help="append a JSON line with the steps, times, peak memory and "
+             "I/O bytes of each run to FILE (--stats=FILE) or stderr "
+             "(--stats)")
+    parser.add_argument(
+        "--profile", metavar="FILE",
+        help="profile the interpreter with cProfile and write the "
+             "pstats to FILE")
+    parser.add_argument(
+        "--cache", action="store_true",
+        help="keep compiled programs in $ESOLANG_CACHE_DIR (default: "
+             "~/.cache/esolang) and load them from there next time")
+    parser.add_argument(
+        "--max-steps", type=int,
+        help="stop programs after MAX_STEPS instructions")
+    parser.add_argument(
+        "--timeout", type=float,
+        help="stop programs after TIMEOUT seconds")
+    parser.add_argument(
+        "--max-memory", type=int,
+        help="stop programs using more than MAX_MEMORY tape cells, "
+             "stack or queue entries")
+    parser.add_argument(
+        "--max-output", type=int,
+        help="stop programs writing more than MAX_OUTPUT characters")
+    parser.add_argument(
+        "--engine", choices=ENGINES, default="auto",
+        help="the execution engine: reference calls the interpreter for "
+             "every instruction, fast runs an optimized loop, compiled "
+             "generated code and auto (the default) switches from fast "
+             "to compiled for long running programs")
     parser.add_argument(
         "-v", "--verbose", dest="loglevel", action="store_const",
         const=logging.INFO, default=logging.WARNING,
@@ -60,9 +327,25 @@ def main():
         const=logging.DEBUG, default=logging.WARNING,
         help="set loglevel to debug")
 
-    args = parser.parse_args()
+    # Like an optional argument of GNU tools, the FILE of --stats is
+    # only taken from --stats=FILE, so "--stats a.b" runs a.b.
+    args = parser.parse_args(
+        ["--stats=-" if arg == "--stats" else arg for arg in sys.argv[1:]])
     logging.basicConfig(level=args.loglevel)
 
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.trace is not None and len(args.filenames) > 1:
+        parser.error("--trace only works with a single file")
+    if args.profile is not None and len(args.filenames) > 1:
+        parser.error("--profile only works with a single file")
+
+    limits = None
+    if any(value is not None for value in (
+            args.max_steps, args.timeout, args.max_memory, args.max_output)):
+        limits = governor.Limits(args.max_steps, args.timeout,
+                                 args.max_memory, args.max_output)
+
     if args.list:
         list_languages()
     elif not args.filenames:
@@ -78,24 +361,32 @@ def main():
                 print(e, file=sys.stderr)
                 sys.exit(1)
 
-        for cls, filename in jobs:
-            try:
-                with open(filename, "r") as f:
-                    source = f.read()
-            except IOError as e:
-                print(e, file=sys.stderr)
-                sys.exit(2)
+        stats = None
+        if args.stats == "-":
+            stats = sys.stderr
+        elif args.stats is not None:
+            stats = open(args.stats, "a")
 
-            try:
-                intp = cls()
-                intp.run(source)
-            except ValueError as e:
-                print(e, file=sys.stderr)
-                sys.exit(3)
-            except RuntimeError as e:
-                print(e, file=sys.stderr)
-                sys.exit(4)
+        try:
+            if args.jobs > 1 and len(jobs) > 1:
+                sys.exit(run_parallel(jobs, args.jobs, args.instrument,
+                                      limits, args.engine, args.cache, stats))
+
+            cache = None
+            if args.cache:
+                from esolang.cache import LRUCache, DiskCache
+                cache = LRUCache(disk=DiskCache())
 
+            for cls, filename in jobs:
+                code = run_file(cls, filename, instrument=args.instrument,
+                                limits=limits, engine=args.engine,
+                                trace=args.trace, cache=cache, stats=stats,
+                                profile=args.profile)
+                if code:
+                    sys.exit(code)
+        finally:
+            if stats is not None and stats is not sys.stderr:
+                stats.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,117 @@
+"""Run interpreters as coroutines on an asyncio event loop.
+
+Interpreter.run_async() runs a program in slices of slice_steps steps
+and gives control back to the event loop between them and whenever
+the program waits for input, so a single thread can serve many
+programs at once, e.g. interactive sessions behind a socket:
+
+    >>> import asyncio
+    >>> from esolang.lang.brainfuck import BrainfuckInterpreter
+    >>> class Writer(list):
+    ...     write = list.append
+    ...     async def drain(self):
+    ...         pass
+    >>> async def session(data):
+    ...     reader = asyncio.StreamReader()
+    ...     reader.feed_data(data)
+    ...     reader.feed_eof()
+    ...     writer = Writer()
+    ...     intp = BrainfuckInterpreter()
+    ...     status = await intp.run_async(reader, writer, ",[.,]")
+    ...     return status, b"".join(writer)
+    >>> asyncio.run(session(b"hi\\0"))
+    ('halted', b'hi')
+
+A coroutine like session() can serve the connections of a server
+started with asyncio.start_server().
+
+The input is read from an asyncio.StreamReader only when the program
+needs it, the output is written to the StreamWriter (or anything with
+write() and an awaitable drain()) after each slice. Both are bytes
+(see esolang.streams).
+
+Interpreters reading their input in the background (see
+Interpreter.waits_for_input) get it fed by a task through their
+feed_input() and close_input() methods instead. Interpreters waiting
+for something else than the standard input (like l33t network
+connections) override Interpreter.wait_async().
+"""
+
+import asyncio
+
+from io import BytesIO
+
+from esolang.interpreter import (
+    InputQueue, HALTED, EXHAUSTED, WAITING, SLICE_STEPS)
+from esolang.streams import BUFSIZE
+
+
+async def run(intp, reader, writer, source=None, max_steps=None,
+              slice_steps=SLICE_STEPS):
+    """Run intp (see Interpreter.run_async())."""
+    queue = InputQueue()
+    output = BytesIO()
+    intp.set_files(queue, output)
+    if source is not None:
+        intp.load(source)
+        intp.start()
+
+    arrived = asyncio.Event()
+    feeder = None
+    if intp.waits_for_input:
+        async def read_input():
+            data = await reader.read(BUFSIZE)
+            if data:
+                queue.feed(data.decode("latin-1"))
+            else:
+                queue.close()
+    else:
+        feeder = asyncio.ensure_future(feed(intp, reader, arrived))
+        read_input = arrived.wait
+
+    end = None if max_steps is None else intp.steps + max_steps
+    try:
+        while True:
+            budget = slice_steps
+            if end is not None:
+                if intp.steps >= end:
+                    return EXHAUSTED
+                budget = min(budget, end - intp.steps)
+
+            arrived.clear()
+            status = intp.execute(budget)
+            await drain(output, writer)
+
+            if status == HALTED:
+                return HALTED
+            elif status == WAITING:
+                await intp.wait_async(read_input)
+            else:
+                await asyncio.sleep(0)
+    finally:
+        if feeder is not None:
+            feeder.cancel()
+        intp.writer.flush()
+        await drain(output, writer)
+
+
+async def feed(intp, reader, arrived):
+    """Feed the input of reader to intp until its end."""
+    while True:
+        data = await reader.read(BUFSIZE)
+        if not data:
+            intp.close_input()
+            arrived.set()
+            return
+        intp.feed_input(data.decode("latin-1"))
+        arrived.set()
+
+
+async def drain(output, writer):
+    """Move the output collected in the BytesIO output to writer."""
+    data = output.getvalue()
+    if data:
+        output.seek(0)
+        output.truncate()
+        writer.write(data)
+        await writer.drain()
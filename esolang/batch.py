@@ -0,0 +1,243 @@
+"""Run one program against many inputs.
+
+The program is compiled once and sent to each worker process, which
+creates a fresh interpreter for every input, but never parses the
+source again (see Interpreter.compile()):
+
+    >>> inputs = [b"abc\\0", b"\\0", b"xyz\\0"]
+    >>> results = run_many("Brainfuck", ",[.,]", inputs, workers=1)
+    >>> [result.output for result in results]
+    [b'abc', b'', b'xyz']
+
+The inputs and outputs are bytes (see esolang.streams).
+
+All runs do the same work until the program reads its first input,
+e.g. building tables. This prefix is run only once (see run_prefix())
+and every input starts from a snapshot of the interpreter taken there
+(see Interpreter.snapshot()). Worker processes are forked, where
+possible, so they share the snapshot with the parent.
+"""
+
+import multiprocessing
+import os
+
+from io import BytesIO
+from time import monotonic
+
+import esolang
+
+from esolang import governor
+from esolang.interpreter import HALTED, WAITING, InputQueue
+
+# The interpreter class, compiled program, limits and Prefix (or None)
+# of a worker process
+_worker = None
+
+
+class Result(object):
+    """The result of running the program against one input.
+
+    Attributes:
+        output: The output (bytes) written before the program stopped.
+        error: None or the error, that stopped the program, as
+               "ExceptionName: message".
+        status: HALTED or WAITING (see Interpreter.run()) or None,
+                if the program failed.
+        steps: The number of executed steps.
+    """
+
+    def __init__(self, output, error=None, status=HALTED, steps=0):
+        self.output = output
+        self.error = error
+        self.status = status
+        self.steps = steps
+
+    def __repr__(self):
+        return "Result(%r, error=%r, status=%r, steps=%d)" % (
+            self.output, self.error, self.status, self.steps)
+
+
+class Prefix(object):
+    """The state of a program before it reads its first input.
+
+    Attributes:
+        snapshot: The snapshot of the interpreter or None, if the
+                  program stopped without reading input.
+        result: The Result of every input, if snapshot is None.
+        output: The output written so far.
+        steps: The number of steps executed so far.
+        seconds: The time it took.
+    """
+
+    def __init__(self, snapshot=None, result=None, output=b"", steps=0,
+                 seconds=0):
+        self.snapshot = snapshot
+        self.result = result
+        self.output = output
+        self.steps = steps
+        self.seconds = seconds
+
+    def remaining(self, limits):
+        """Return what is left of limits after the prefix."""
+        def sub(limit, used):
+            return None if limit is None else limit - used
+
+        return governor.Limits(
+            sub(limits.max_steps, self.steps),
+            sub(limits.timeout, self.seconds),
+            limits.max_memory,
+            sub(limits.max_output, len(self.output)),
+            limits.check_every)
+
+    def exceeded(self, e, limits):
+        """Return the ResourceExceeded error e, raised after the
+        prefix with its remaining() limits, as if the whole program
+        had run with limits."""
+        used = {"steps": self.steps, "output": len(self.output),
+                "time": self.seconds}.get(e.resource, 0)
+        limit = {"steps": limits.max_steps, "output": limits.max_output,
+                 "time": limits.timeout}.get(e.resource, e.limit)
+        value = e.value + used
+        if e.resource == "time":
+            value = round(value, 3)
+        return governor.ResourceExceeded(e.resource, limit, value, e.output)
+
+
+def _run(intp, limits):
+    if limits is None:
+        return intp.run()
+    return governor.run(intp, limits=limits)
+
+
+def _error(e):
+    return "%s: %s" % (type(e).__name__, e)
+
+
+def run_prefix(cls, program, limits=None):
+    """Run the compiled program until it reads input for the first
+    time.
+
+    Returns:
+        A Prefix or None, if the program can't be paused there (see
+        Interpreter.waits_for_input).
+    """
+    if not cls.waits_for_input:
+        return None
+
+    outfile = BytesIO()
+    intp = cls(infile=InputQueue(), outfile=outfile)
+    start = monotonic()
+    try:
+        intp.load_program(program)
+        intp.start()
+        status = _run(intp, limits)
+    except Exception as e:
+        intp.writer.flush()
+        return Prefix(result=Result(outfile.getvalue(), _error(e), None,
+                                    intp.steps))
+
+    seconds = monotonic() - start
+    if status != WAITING:
+        return Prefix(result=Result(outfile.getvalue(), None, status,
+                                    intp.steps))
+
+    try:
+        snapshot = intp.snapshot()
+    except ValueError:
+        # E.g. a l33t program, that has opened a connection.
+        return None
+    return Prefix(snapshot, None, outfile.getvalue(), intp.steps, seconds)
+
+
+def init_worker(cls, program, limits, prefix=None):
+    global _worker
+    _worker = cls, program, limits, prefix
+
+
+def run_one(data):
+    """Run the program of this worker against the input data."""
+    cls, program, limits, prefix = _worker
+    if prefix is not None and prefix.result is not None:
+        result = prefix.result
+        return Result(result.output, result.error, result.status,
+                      result.steps)
+
+    outfile = BytesIO()
+    intp = cls(infile=BytesIO(data), outfile=outfile)
+    output = b""
+
+    try:
+        if prefix is None:
+            intp.load_program(program)
+            intp.start()
+            status = _run(intp, limits)
+        else:
+            intp.restore(prefix.snapshot)
+            output = prefix.output
+            status = _run(intp, limits and prefix.remaining(limits))
+    except Exception as e:
+        if prefix is not None and isinstance(e, governor.ResourceExceeded):
+            e = prefix.exceeded(e, limits)
+        intp.writer.flush()
+        return Result(output + outfile.getvalue(), _error(e), None,
+                      intp.steps)
+
+    return Result(output + outfile.getvalue(), None, status, intp.steps)
+
+
+def run_many(lang, source, inputs, workers=None, limits=None,
+             chunksize=None, share_prefix=True):
+    """Run the program source written in lang against each of inputs.
+
+    Args:
+        lang: The name of the language.
+        source: The source code of the program.
+        inputs: An iterable of bytes.
+        workers: The number of worker processes (default: the number
+                 of CPUs). With 1, everything runs in this process.
+        limits: The esolang.governor.Limits for each run. Exceeding
+                them is reported as error of the input. Programs,
+                that never halt (like Past programs), need them.
+        chunksize: The number of inputs sent to a worker at once.
+        share_prefix: Whether to run the part of the program before
+                      the first input only once (see run_prefix()).
+
+    Returns:
+        list: A Result for each input in the order of inputs.
+
+    Raises:
+        ValueError: If the program can't be compiled.
+    """
+    languages = esolang.find(lang=lang)
+    if not languages:
+        raise ValueError("No interpreter available for lang '%s'" % lang)
+    cls = languages[0].load()
+
+    program = cls().compile(source)
+    inputs = list(inputs)
+    workers = workers or os.cpu_count() or 1
+
+    prefix = None
+    if share_prefix and len(inputs) > 1:
+        prefix = run_prefix(cls, program, limits)
+
+    if workers == 1 or len(inputs) < 2 or \
+            (prefix is not None and prefix.result is not None):
+        init_worker(cls, program, limits, prefix)
+        return [run_one(data) for data in inputs]
+
+    if chunksize is None:
+        chunksize = max(1, len(inputs) // (workers * 4))
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Forked workers get the snapshot without pickling it.
+    context = None
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=init_worker,
+                             initargs=(cls, program, limits, prefix)) \
+            as executor:
+        return list(executor.map(run_one, inputs, chunksize=chunksize))
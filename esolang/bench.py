@@ -0,0 +1,298 @@
+"""Benchmarks for the interpreters.
+
+Run all benchmarks and write a JSON report:
+
+    $ python -m esolang.bench --output baseline.json
+
+Run them again (e.g. after changing an interpreter) and compare the
+results with a saved report. The exit code is 1, if a benchmark got
+slower (or needs more memory) by more than the threshold:
+
+    $ python -m esolang.bench --compare baseline.json --threshold 0.1
+
+Two saved reports can be compared without running anything:
+
+    $ python -m esolang.bench --compare baseline.json current.json
+"""
+
+from __future__ import print_function
+
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tracemalloc
+
+from argparse import ArgumentParser
+from fnmatch import fnmatch
+from io import StringIO
+from time import perf_counter
+
+import esolang
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = os.path.join(ROOT, "examples")
+
+
+class Benchmark(object):
+    """A program together with its input.
+
+    Args:
+        name: The unique name of the benchmark.
+        lang: The name of the language.
+        source: The source code of the program.
+        input: The standard input of the program.
+        max_steps: The step budget for programs, that don't halt.
+        kind: What the benchmark stresses ("cpu", "io", "loops"
+              or "example").
+    """
+
+    def __init__(self, name, lang, source, input="", max_steps=None,
+                 kind="cpu"):
+        self.name = name
+        self.lang = lang
+        self.source = source
+        self.input = input
+        self.max_steps = max_steps
+        self.kind = kind
+
+    def __repr__(self):
+        return "Benchmark(%r, %r)" % (self.name, self.lang)
+
+    def run(self):
+        """Run the program once.
+
+        Returns:
+            tuple: The wall time in seconds and the number of steps.
+        """
+        cls = esolang.find(lang=self.lang)[0].load()
+        intp = cls(infile=StringIO(self.input), outfile=NullWriter())
+
+        start = perf_counter()
+        intp.run(self.source, max_steps=self.max_steps)
+        return perf_counter() - start, intp.steps
+
+
+class NullWriter(io.RawIOBase):
+    """A binary outfile, that drops everything."""
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return len(data)
+
+
+# Larger programs, that stress different parts of the interpreters.
+CORPUS = [
+    # 255 * 255 iterations of the inner loop
+    Benchmark("brainfuck-nested-loops", "Brainfuck",
+              "-[>-[>+>+<<-]<-]", kind="cpu"),
+    Benchmark("brainfuck-cat", "Brainfuck", ",[.,]",
+              input="x" * 50000 + "\0", kind="io"),
+    # Many short clear loops
+    Benchmark("brainfuck-clear-loops", "Brainfuck", "-[-]>" * 300,
+              kind="loops"),
+    # Count down from 8 ** 4
+    Benchmark("befunge-countdown", "Befunge",
+              "88*8*8*>1-:v\n       ^   _@", kind="loops"),
+    Benchmark("past-bang", "My Unreliable Past", "O=0, O+34;",
+              max_steps=100000, kind="io"),
+]
+
+
+def examples():
+    """Return a benchmark for each example program."""
+    benchmarks = []
+
+    if not os.path.isdir(EXAMPLES):
+        return benchmarks
+
+    for dirpath, _, filenames in sorted(os.walk(EXAMPLES)):
+        for filename in sorted(filenames):
+            languages = esolang.find(ext=os.path.splitext(filename)[1])
+            if not languages:
+                continue
+
+            with open(os.path.join(dirpath, filename)) as f:
+                source = f.read()
+
+            lang = languages[0].lang
+            # Past programs never halt.
+            max_steps = 100000 if lang == "My Unreliable Past" else None
+            benchmarks.append(Benchmark(
+                "example-" + os.path.splitext(filename)[0] + "-" +
+                os.path.basename(dirpath), lang, source,
+                max_steps=max_steps, kind="example"))
+
+    return benchmarks
+
+
+def peak_memory(benchmark):
+    """Return the peak memory (in bytes) allocated by a single run."""
+    tracemalloc.start()
+    try:
+        benchmark.run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def startup_time(repeat=5):
+    """Return the best time (in seconds) to start the command line
+    interface in a new Python process."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        subprocess.check_call(
+            [sys.executable, "-c", "import esolang.__main__"], env=env)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def measure(benchmark, repeat=5, warmup=1):
+    """Run a benchmark and return its results as dict."""
+    try:
+        for _ in range(warmup):
+            benchmark.run()
+
+        walls = []
+        for _ in range(repeat):
+            wall, steps = benchmark.run()
+            walls.append(wall)
+
+        walls.sort()
+        wall = walls[len(walls) // 2]
+        return {
+            "lang": benchmark.lang,
+            "kind": benchmark.kind,
+            "steps": steps,
+            "wall": wall,
+            "wall_min": walls[0],
+            "steps_per_sec": steps / wall if wall else None,
+            "peak_memory": peak_memory(benchmark),
+            "repeat": repeat,
+        }
+    except Exception as e:
+        return {"lang": benchmark.lang, "kind": benchmark.kind,
+                "error": "%s: %s" % (type(e).__name__, e)}
+
+
+def run(benchmarks, repeat=5, warmup=1, verbose=False):
+    """Run the benchmarks and return a report (see main())."""
+    results = {}
+    for benchmark in benchmarks:
+        results[benchmark.name] = measure(benchmark, repeat, warmup)
+        if verbose:
+            print_result(benchmark.name, results[benchmark.name])
+
+    return {
+        "python": platform.python_implementation() + " " +
+        platform.python_version(),
+        "platform": platform.platform(),
+        "startup": startup_time(),
+        "results": results,
+    }
+
+
+def print_result(name, result):
+    if "error" in result:
+        print("%-32s %s" % (name, result["error"]), file=sys.stderr)
+    else:
+        print("%-32s %9.4fs %12.0f steps/s %10d B" % (
+            name, result["wall"], result["steps_per_sec"] or 0,
+            result["peak_memory"]), file=sys.stderr)
+
+
+def compare(baseline, current, threshold=0.1):
+    """Compare two reports.
+
+    Returns:
+        list: A (name, metric, old, new) tuple for each benchmark,
+              that got worse by more than threshold (a fraction) in
+              wall time or peak memory (or started failing).
+    """
+    regressions = []
+
+    for name, new in sorted(current["results"].items()):
+        old = baseline["results"].get(name)
+        if old is None or "error" in old:
+            continue
+        if "error" in new:
+            regressions.append((name, "error", None, new["error"]))
+            continue
+
+        for metric in "wall", "peak_memory":
+            if new[metric] > old[metric] * (1 + threshold):
+                regressions.append((name, metric, old[metric], new[metric]))
+
+    if current.get("startup", 0) > \
+            baseline.get("startup", float("inf")) * (1 + threshold):
+        regressions.append(
+            ("startup", "wall", baseline["startup"], current["startup"]))
+
+    return regressions
+
+
+def main(argv=None):
+    parser = ArgumentParser(
+        prog="python -m esolang.bench",
+        description="Benchmark the esolang interpreters.")
+    parser.add_argument(
+        "-o", "--output", help="write the JSON report to OUTPUT")
+    parser.add_argument(
+        "-k", "--filter", default="*",
+        help="only run the benchmarks matching the pattern FILTER")
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=5,
+        help="the number of measured runs per benchmark (default: 5)")
+    parser.add_argument(
+        "-w", "--warmup", type=int, default=1,
+        help="the number of runs before measuring (default: 1)")
+    parser.add_argument(
+        "-c", "--compare", nargs="+", metavar="REPORT",
+        help="compare with the BASELINE report (or compare two reports)")
+    parser.add_argument(
+        "-t", "--threshold", type=float, default=0.1,
+        help="the allowed slowdown as fraction (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes one or two reports")
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[1]) as f:
+            report = json.load(f)
+    else:
+        benchmarks = [b for b in CORPUS + examples()
+                      if fnmatch(b.name, args.filter)]
+        report = run(benchmarks, args.repeat, args.warmup, verbose=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    elif not args.compare:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+
+        regressions = compare(baseline, report, args.threshold)
+        for name, metric, old, new in regressions:
+            print("REGRESSION %s %s: %s -> %s" % (name, metric, old, new))
+        if regressions:
+            return 1
+        print("No regressions.")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Caches for compiled programs (see Interpreter.compile()).
+
+    >>> cache = LRUCache(maxsize=2)
+    >>> cache.put("a", 1)
+    >>> cache.put("b", 2)
+    >>> cache.get("a")
+    1
+    >>> cache.put("c", 3)
+    >>> cache.get("b") is None
+    True
+    >>> sorted(cache)
+    ['a', 'c']
+
+A DiskCache keeps compiled programs between runs in a directory
+(default_directory()). An LRUCache with a DiskCache behind it only
+reads a file, when a program isn't in memory, and only compiles it,
+when there is no file either:
+
+    >>> import tempfile
+    >>> from esolang.lang.brainfuck import BrainfuckInterpreter
+    >>> disk = DiskCache(tempfile.mkdtemp())
+    >>> LRUCache(disk=disk).compile(BrainfuckInterpreter(), "+[-]")
+    (('+[-]', {1: 3, 3: 1}), False)
+    >>> LRUCache(disk=disk).compile(BrainfuckInterpreter(), "+[-]")
+    (('+[-]', {1: 3, 3: 1}), True)
+
+A cache file starts with MAGIC, the format VERSION, the version of
+marshal and the key, followed by the program in the marshal format,
+which is read from a memory map of the file.
+"""
+
+import marshal
+import mmap
+import os
+import tempfile
+
+from collections import OrderedDict
+from hashlib import sha256
+
+import esolang
+
+from esolang.snapshot import Encoder, Decoder
+
+MAGIC = b"ESOC"
+VERSION = 1
+
+
+def source_key(lang, source, options=""):
+    """Return the cache key of a program.
+
+    The key depends on the language, the source, the options of the
+    interpreter (see Interpreter.compile_options) and the version of
+    esolang.
+    """
+    digest = sha256()
+    for part in esolang.__version__, options, source:
+        digest.update(part.encode("utf-8", "surrogatepass") + b"\0")
+    return "%s:%s" % (lang, digest.hexdigest())
+
+
+def default_directory():
+    """Return $ESOLANG_CACHE_DIR or the esolang directory in
+    $XDG_CACHE_HOME (default: ~/.cache)."""
+    directory = os.environ.get("ESOLANG_CACHE_DIR")
+    if directory:
+        return directory
+    base = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "esolang")
+
+
+class DiskCache(object):
+    """Stores compiled programs as files in directory.
+
+    Reading and writing is best effort: Files, that can't be read,
+    are misses and failed writes are ignored.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = default_directory() if directory is None \
+            else directory
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, key):
+        name = sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name[:2], name[2:])
+
+    def get(self, key, default=None):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, ValueError):
+            self.misses += 1
+            return default
+
+        try:
+            program = self._decode(data, key)
+        except (ValueError, EOFError, TypeError):
+            program = None
+        finally:
+            data.close()
+
+        if program is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return program
+
+    @staticmethod
+    def _decode(data, key):
+        """Return the program in the cache file data (None, if it was
+        written for another key or version)."""
+        decoder = Decoder(data)
+        if decoder.take(len(MAGIC)) != MAGIC or decoder.uint() != VERSION \
+                or decoder.uint() != marshal.version \
+                or decoder.text() != key:
+            return None
+
+        view = memoryview(data)
+        payload = view[decoder.pos:]
+        try:
+            return marshal.loads(payload)
+        finally:
+            payload.release()
+            view.release()
+
+    def put(self, key, program):
+        encoder = Encoder()
+        encoder.data += MAGIC
+        encoder.uint(VERSION)
+        encoder.uint(marshal.version)
+        encoder.text(key)
+
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        try:
+            encoder.data += marshal.dumps(program)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            # Readers never see a partially written file.
+            fd, tmp = tempfile.mkstemp(dir=directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(encoder.data)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except (OSError, ValueError):
+            pass
+
+
+class LRUCache(object):
+    """A mapping of at most maxsize items, that drops the least
+    recently used item first.
+
+    Args:
+        maxsize: The number of items.
+        disk: None or a DiskCache used by compile().
+    """
+
+    def __init__(self, maxsize=128, disk=None):
+        self.maxsize = maxsize
+        self.disk = disk
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key, default=None):
+        try:
+            value = self.items.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.items[key] = value
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.items.pop(key, None)
+        self.items[key] = value
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    def compile(self, intp, source):
+        """Return the program for source compiled by intp.
+
+        Returns:
+            tuple: The program and whether it was found in the cache
+                   (or the DiskCache).
+        """
+        key = source_key(intp.lang, source, intp.compile_options)
+        program = self.get(key)
+        if program is not None:
+            return program, True
+
+        cached = False
+        if self.disk is not None:
+            program = self.disk.get(key)
+            cached = program is not None
+        if program is None:
+            program = intp.compile(source)
+            if self.disk is not None:
+                self.disk.put(key, program)
+
+        self.put(key, program)
+        return program, cached
@@ -0,0 +1,124 @@
+"""Run untrusted programs within resource limits.
+
+    >>> from io import StringIO
+    >>> from esolang.lang.brainfuck import BrainfuckInterpreter
+    >>> intp = BrainfuckInterpreter(outfile=StringIO())
+    >>> try:
+    ...     run(intp, "+[>+]", Limits(max_memory=1000, check_every=100))
+    ... except ResourceExceeded as e:
+    ...     print(e.resource, e.limit, e.value >= 1000)
+    memory 1000 True
+
+The limits are checked between slices of check_every steps (see
+Interpreter.run()), so the loop of the interpreter runs unchanged and
+a limit may be exceeded by the work of a single slice before the
+program is stopped. Only the output limit is exact: the writer of the
+interpreter (see esolang.streams.ByteWriter) drops output beyond it.
+"""
+
+from time import monotonic
+
+from esolang.interpreter import EXHAUSTED
+
+# The number of characters of the output kept for ResourceExceeded
+PARTIAL_OUTPUT = 65536
+
+
+class ResourceExceeded(RuntimeError):
+    """Raised when a program exceeds one of its Limits.
+
+    Attributes:
+        resource: "steps", "time", "memory" or "output".
+        limit: The limit, that was exceeded.
+        value: The usage, when the program was stopped.
+        output: The output written before the program was stopped.
+    """
+
+    def __init__(self, resource, limit, value, output=""):
+        super(ResourceExceeded, self).__init__(
+            "%s limit of %s exceeded (%s)" % (resource, limit, value))
+        self.resource = resource
+        self.limit = limit
+        self.value = value
+        self.output = output
+
+
+class Limits(object):
+    """The resources a program may use.
+
+    Args:
+        max_steps: The number of steps.
+        timeout: The wall time in seconds.
+        max_memory: The memory_size of the interpreter, i.e. the
+                    number of tape cells, stack or queue entries.
+        max_output: The number of characters written.
+        check_every: The number of steps between two checks.
+    """
+
+    def __init__(self, max_steps=None, timeout=None, max_memory=None,
+                 max_output=None, check_every=10000):
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.max_output = max_output
+        self.check_every = check_every
+
+
+def run(intp, source=None, limits=None):
+    """Run intp like intp.run(source), but stop it with a
+    ResourceExceeded error, when it exceeds limits.
+
+    Returns:
+        The status of the last call to intp.run(): HALTED or WAITING.
+    """
+    limits = Limits() if limits is None else limits
+    max_steps = limits.max_steps
+    max_memory = limits.max_memory
+    deadline = None if limits.timeout is None \
+        else monotonic() + limits.timeout
+
+    writer = intp.writer
+    start_output = writer.written
+    writer.limit = None if limits.max_output is None \
+        else start_output + limits.max_output
+    writer.keep = PARTIAL_OUTPUT
+    writer.kept = []
+
+    try:
+        if source is not None:
+            intp.load(source)
+            intp.start()
+
+        start = intp.steps
+        while True:
+            budget = limits.check_every
+            if max_steps is not None:
+                budget = min(budget, max_steps - (intp.steps - start))
+
+            status = intp.run(max_steps=budget)
+
+            # The writer is replaced, when the outfile is replaced.
+            writer = intp.writer
+            output = writer.written - start_output
+            if limits.max_output is not None and output > limits.max_output:
+                raise ResourceExceeded("output", limits.max_output, output,
+                                       writer.output)
+            if status != EXHAUSTED:
+                return status
+
+            steps = intp.steps - start
+            if max_steps is not None and steps >= max_steps:
+                raise ResourceExceeded("steps", max_steps, steps,
+                                       writer.output)
+            if max_memory is not None and intp.memory_size > max_memory:
+                raise ResourceExceeded("memory", max_memory,
+                                       intp.memory_size, writer.output)
+            if deadline is not None and monotonic() > deadline:
+                raise ResourceExceeded(
+                    "time", limits.timeout,
+                    round(limits.timeout + monotonic() - deadline, 3),
+                    writer.output)
+    finally:
+        writer = intp.writer
+        writer.limit = None
+        writer.keep = 0
@@ -0,0 +1,199 @@
+"""Instrumentation of interpreter runs.
+
+    >>> from io import StringIO
+    >>> from esolang.lang.brainfuck import BrainfuckInterpreter
+    >>> intp = BrainfuckInterpreter(outfile=StringIO())
+    >>> instrumentation = intp.instrument()
+    >>> intp.run("++[>+++<-]>.")
+    'halted'
+    >>> instrumentation.counters["+"]
+    8
+    >>> instrumentation.output_bytes
+    1
+
+Attaching an Instrumentation makes execute() use the loop in
+Instrumentation.execute(), which calls step() for each instruction.
+Without one, the (faster) loop of the interpreter runs unchanged.
+Interpreters provide the opcode and memory_size properties for this.
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from itertools import count
+
+from esolang.interpreter import (
+    WaitingForInput, HALTED, EXHAUSTED, WAITING)
+from esolang.streams import binary_file
+
+
+class Instrumentation(object):
+    """Counts the instructions and I/O of an interpreter.
+
+    Args:
+        on_step: Called as on_step(intp, opcode) after each step.
+        on_output: Called as on_output(intp, data) for each write.
+        on_input: Called as on_input(intp, data) for each read.
+        on_execute: Called as on_execute(intp) before the steps of
+                    each call to execute().
+    """
+
+    def __init__(self, on_step=None, on_output=None, on_input=None,
+                 on_execute=None):
+        self.on_step = on_step
+        self.on_output = on_output
+        self.on_input = on_input
+        self.on_execute = on_execute
+
+        # opcode -> number of times it was executed
+        self.counters = Counter()
+        self.steps = 0
+
+        self.output_bytes = 0
+        self.output_calls = 0
+        self.input_bytes = 0
+        self.input_calls = 0
+
+        # The highest memory_size of the interpreter seen after a step.
+        self.memory_high = 0
+
+    def execute(self, intp, max_steps=None):
+        """The instrumented version of Interpreter.execute()."""
+        counters = self.counters
+        on_step = self.on_step
+        step = intp.step
+        status = EXHAUSTED
+        n = 0
+
+        if self.on_execute is not None:
+            self.on_execute(intp)
+
+        try:
+            with self.proxies(intp):
+                for n in count() if max_steps is None else range(max_steps):
+                    opcode = intp.opcode
+                    if not step():
+                        status = HALTED
+                        break
+
+                    counters[opcode] += 1
+                    size = intp.memory_size
+                    if size > self.memory_high:
+                        self.memory_high = size
+                    if on_step is not None:
+                        on_step(intp, opcode)
+                else:
+                    n = max_steps
+        except WaitingForInput:
+            status = WAITING
+        finally:
+            intp.steps += n
+            self.steps += n
+            intp.writer.flush()
+
+        return status
+
+    @contextmanager
+    def proxies(self, intp):
+        """Replace the files of intp with proxies reporting to self."""
+        infile, outfile = intp.infile, intp.outfile
+        if isinstance(outfile, OutputProxy):
+            yield
+            return
+
+        intp.set_files(InputProxy(infile, intp, self),
+                       OutputProxy(outfile, intp, self))
+        try:
+            yield
+        finally:
+            intp.set_files(infile, outfile)
+
+    def summary(self):
+        """Return the collected metrics as dict."""
+        return {
+            "steps": self.steps,
+            "opcodes": dict((str(op), n) for op, n in self.counters.items()),
+            "output_bytes": self.output_bytes,
+            "output_calls": self.output_calls,
+            "input_bytes": self.input_bytes,
+            "input_calls": self.input_calls,
+            "memory_high": self.memory_high,
+        }
+
+    def report(self):
+        """Return a human readable report of the collected metrics."""
+        lines = [
+            "steps: %d" % self.steps,
+            "output: %d byte(s) in %d write(s)" % (
+                self.output_bytes, self.output_calls),
+            "input: %d byte(s) in %d read(s)" % (
+                self.input_bytes, self.input_calls),
+            "memory high-water mark: %d" % self.memory_high,
+            "opcodes:",
+        ]
+        for opcode, n in self.counters.most_common():
+            lines.append("  %-8s %10d %6.2f%%" % (
+                opcode, n, 100.0 * n / (self.steps or 1)))
+        return "\n".join(lines)
+
+
+class OutputProxy(object):
+    """Reports the writes to an outfile to an Instrumentation."""
+
+    def __init__(self, outfile, intp, instrumentation):
+        self.outfile = outfile
+        self.intp = intp
+        self.instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        return getattr(self.outfile, name)
+
+    def binary_file(self):
+        """Return a proxy of the binary file of outfile (see
+        esolang.streams.binary_file())."""
+        raw = binary_file(self.outfile)
+        if raw is None:
+            return None
+        return OutputProxy(raw, self.intp, self.instrumentation)
+
+    def write(self, data):
+        instrumentation = self.instrumentation
+        instrumentation.output_bytes += len(data)
+        instrumentation.output_calls += 1
+        if instrumentation.on_output is not None:
+            instrumentation.on_output(self.intp, data)
+        return self.outfile.write(data)
+
+
+class InputProxy(object):
+    """Reports the reads from an infile to an Instrumentation."""
+
+    def __init__(self, infile, intp, instrumentation):
+        self.infile = infile
+        self.intp = intp
+        self.instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        return getattr(self.infile, name)
+
+    def binary_file(self):
+        """Return a proxy of the binary file of infile (see
+        esolang.streams.binary_file())."""
+        raw = binary_file(self.infile)
+        if raw is None:
+            return None
+        return InputProxy(raw, self.intp, self.instrumentation)
+
+    def read(self, *args):
+        return self.report(self.infile.read(*args))
+
+    def read1(self, *args):
+        read = getattr(self.infile, "read1", self.infile.read)
+        return self.report(read(*args))
+
+    def report(self, data):
+        instrumentation = self.instrumentation
+        instrumentation.input_bytes += len(data)
+        instrumentation.input_calls += 1
+        if instrumentation.on_input is not None:
+            instrumentation.on_input(self.intp, data)
+        return data
@@ -1,34 +1,363 @@
+"""The execution protocol shared by all interpreters.
+
+An interpreter loads a program with load() and executes it one
+instruction at a time with step(). run() drives step() and can be
+given a step budget, so a program can be executed in slices:
+
+    >>> from io import StringIO
+    >>> from esolang.lang.brainfuck import BrainfuckInterpreter
+    >>> intp = BrainfuckInterpreter(outfile=StringIO())
+    >>> intp.run("++++++++[>++++++++<-]>+.", max_steps=10)
+    'exhausted'
+    >>> intp.run()
+    'halted'
+    >>> intp.outfile.getvalue()
+    'A'
+"""
+
 import sys
 
+from itertools import count
+
+from esolang.streams import ByteReader, ByteWriter
+
+# The results of Interpreter.run()
+HALTED = "halted"
+EXHAUSTED = "exhausted"
+WAITING = "waiting"
+
+# The execution engines from the slowest to the fastest tier and auto
+# (see Interpreter.engine)
+ENGINES = ("reference", "fast", "compiled", "auto")
+
+# The number of steps after which the auto engine switches from the
+# fast to the compiled tier
+PROMOTE_STEPS = 100000
+
+# The default number of steps between two returns to the event loop
+# (see run_async())
+SLICE_STEPS = 10000
+
+
+class WaitingForInput(Exception):
+    """Raised when reading from an InputQueue, that has no data (yet)."""
+
+
+class InputQueue(object):
+    """A file-like input, that never blocks.
+
+    Data is added with feed() and the end of the input is marked with
+    close(). Reading from an empty queue, that hasn't been closed,
+    raises WaitingForInput, which makes run() return WAITING.
+
+    Example:
+        >>> infile = InputQueue()
+        >>> infile.feed("ab")
+        >>> infile.read(1)
+        'a'
+        >>> infile.close()
+        >>> infile.read()
+        'b'
+        >>> infile.read(1)
+        ''
+    """
+
+    def __init__(self, data=""):
+        self.data = data
+        self.eof = False
+
+    def feed(self, data):
+        self.data += data
+
+    def close(self):
+        self.eof = True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            if not self.eof:
+                raise WaitingForInput()
+            size = len(self.data)
+        elif not self.data and not self.eof:
+            raise WaitingForInput()
+
+        data, self.data = self.data[:size], self.data[size:]
+        return data
+
 
 class Interpreter(object):
-    def __init__(self, infile=sys.stdin, outfile=sys.stdout):
+    """Base class for interpreters.
+
+    Subclasses implement load() and step(). step() executes a single
+    instruction and returns False, if the program has halted, in which
+    case calling step() again must not change anything. Reading input,
+    that isn't available yet, must raise WaitingForInput before any
+    state is changed, so the step can simply be executed again.
+
+    Subclasses may add faster execution tiers (see engine) as
+    execute_fast() and execute_compiled(), as long as they behave
+    the same as execute_reference().
+
+    Input and output go through reader.getbyte() and writer.putbyte()
+    (see esolang.streams), which are replaced together with infile
+    and outfile.
+    """
+
+    lang = None
+    ext = None
+
+    # The attached Instrumentation (see instrument()).
+    instrumentation = None
+
+    # The execution tiers implemented as execute_<tier>()
+    tiers = ("reference",)
+
+    # Whether input is only read by step(), so run() returns WAITING
+    # before the first read from an empty InputQueue (see
+    # esolang.batch). Interpreters reading in the background don't and
+    # implement feed_input() and close_input() (see esolang.aio).
+    waits_for_input = True
+
+    def __init__(self, infile=sys.stdin, outfile=sys.stdout, engine="auto"):
         self.infile = infile
         self.outfile = outfile
-        self.code = []
-        self.pc = 0
+        self.engine = engine
 
-    def load(self, source):
+        # The number of steps executed so far.
+        self.steps = 0
+
+    @property
+    def infile(self):
+        return self._infile
+
+    @infile.setter
+    def infile(self, infile):
+        # Bytes read ahead from the old file aren't lost.
+        old = self.__dict__.get("reader")
+        self._infile = infile
+        self.reader = ByteReader(infile, () if old is None else old.pending)
+        if old is not None:
+            self.reader.fetched += old.consumed
+        self.reader.writer = self.__dict__.get("writer")
+
+    @property
+    def outfile(self):
+        return self._outfile
+
+    @outfile.setter
+    def outfile(self, outfile):
+        old = self.__dict__.get("writer")
+        if old is not None:
+            old.flush()
+        self._outfile = outfile
+        self.writer = ByteWriter(outfile, old)
+        if "reader" in self.__dict__:
+            self.reader.writer = self.writer
+
+    @property
+    def engine(self):
+        """The execution engine, one of ENGINES.
+
+        "reference" calls step() for every instruction, "fast" runs
+        an optimized loop and "compiled" generated Python code. An
+        interpreter without the requested tier uses the next slower
+        one. "auto" starts in the fast tier, which has no start-up
+        cost, and switches to the compiled tier after PROMOTE_STEPS.
+        """
+        return self._engine
+
+    @engine.setter
+    def engine(self, engine):
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine '%s' (choose from %s)." %
+                             (engine, ", ".join(ENGINES)))
+        self._engine = engine
+
+    def tier(self, engine):
+        """Return the execute method of the fastest tier up to engine
+        (which isn't "auto")."""
+        tiers = [tier for tier in self.tiers
+                 if ENGINES.index(tier) <= ENGINES.index(engine)]
+        return getattr(self, "execute_" + tiers[-1])
+
+    @property
+    def opcode(self):
+        """The instruction step() will execute next."""
+        return None
+
+    @property
+    def memory_size(self):
+        """The number of values (cells, stack entries, ...) in memory."""
+        return 0
+
+    @property
+    def position(self):
+        """The position of the instruction step() will execute next as
+        int (see esolang.trace)."""
+        return getattr(self, "pc", 0)
+
+    def set_files(self, infile, outfile):
+        """Replace the input and output file."""
+        self.infile = infile
+        self.outfile = outfile
+
+    def instrument(self, on_step=None, on_output=None, on_input=None):
+        """Attach a new Instrumentation (see esolang.instrument).
+
+        Set the instrumentation attribute to None to detach it.
+
+        Returns:
+            Instrumentation: The new instrumentation.
+        """
+        from esolang.instrument import Instrumentation
+
+        self.instrumentation = Instrumentation(on_step, on_output, on_input)
+        return self.instrumentation
+
+    def snapshot(self):
+        """Return the complete state as bytes (see esolang.snapshot).
+
+        The output is flushed first. The files are not part of the
+        state, but the input read ahead from the infile is.
+        """
+        from esolang import snapshot
+
+        return snapshot.dump(self)
+
+    def restore(self, data):
+        """Continue from the state returned by snapshot().
+
+        Raises:
+            ValueError: If data isn't a snapshot of this language.
+        """
+        from esolang import snapshot
+
+        snapshot.load(self, data)
+
+    def save_state(self, encoder):
+        """Write the state to an esolang.snapshot.Encoder."""
+        raise NotImplementedError("Implement in subclass")
+
+    def load_state(self, decoder):
+        """Read the state written by save_state() from an
+        esolang.snapshot.Decoder."""
+        raise NotImplementedError("Implement in subclass")
+
+    @property
+    def compile_options(self):
+        """The options of the interpreter, that change the result of
+        compile(), as str (part of the key of esolang.cache)."""
+        return ""
+
+    def compile(self, source):
+        """Parse source and return the program for load_program().
+
+        The program only consists of plain data (tuples, lists, dicts,
+        strings and numbers), so it can be cached and sent to other
+        processes. The default is the source itself.
+        """
+        return source
+
+    def load_program(self, program):
+        """Load a program returned by compile()."""
         raise NotImplementedError("Implement in subclass")
 
-    def exec(self, line):
-        raise NotImplementedError()
+    def load(self, source):
+        """Load the program in source."""
+        self.load_program(self.compile(source))
+
+    def start(self):
+        """Prepare a freshly loaded program for its first step.
+
+        Interpreters with a random initial state override this.
+        """
 
     def step(self):
-        try:
-            line = self.code[self.pc]
-        except IndexError:
-            raise StopIteration("EOF reached.")
+        raise NotImplementedError("Implement in subclass")
 
-        self.exec(line)
-        self.pc += 1
+    def run(self, source=None, max_steps=None):
+        """Run the program until it halts or max_steps have been executed.
 
-    def run(self, source=None):
-        if source:
+        If source is given, it is loaded (and started) first. Otherwise
+        execution continues where the last call to run() stopped.
+
+        Returns:
+            HALTED, if the program has ended, EXHAUSTED, if max_steps
+            have been executed, or WAITING, if the program needs input,
+            that isn't available yet.
+        """
+        if source is not None:
             self.load(source)
+            self.start()
+        return self.execute(max_steps)
+
+    def run_async(self, reader, writer, source=None, max_steps=None,
+                  slice_steps=SLICE_STEPS):
+        """Run the program as coroutine on an asyncio event loop.
+
+        Like run(), but the input is read from the asyncio.StreamReader
+        reader and the output written to the StreamWriter writer. The
+        event loop gets control back every slice_steps steps and while
+        the program waits for input (see esolang.aio).
+
+        Returns:
+            A coroutine returning HALTED or EXHAUSTED, if max_steps
+            have been executed.
+        """
+        from esolang import aio
+
+        return aio.run(self, reader, writer, source, max_steps, slice_steps)
+
+    def wait_async(self, read_input):
+        """Return an awaitable, that completes when the program can
+        continue after execute() returned WAITING (see esolang.aio).
+
+        read_input() returns one, that waits for more standard input.
+        """
+        return read_input()
+
+    def execute(self, max_steps=None):
+        """Execute up to max_steps steps (or forever, if None) with the
+        selected engine."""
+        if self.instrumentation is not None:
+            return self.instrumentation.execute(self, max_steps)
+
+        if self.engine != "auto":
+            return self.tier(self.engine)(max_steps)
+
+        fast = self.tier("fast")
+        compiled = self.tier("compiled")
+        budget = PROMOTE_STEPS - self.steps
+        if compiled == fast or budget <= 0:
+            return compiled(max_steps)
+        if max_steps is not None and max_steps <= budget:
+            return fast(max_steps)
+
+        status = fast(budget)
+        if status != EXHAUSTED:
+            return status
+        return compiled(None if max_steps is None else max_steps - budget)
+
+    def execute_reference(self, max_steps=None):
+        """Call step() up to max_steps times (or forever, if None).
+
+        The budget is enforced by the iterator of the loop, so there
+        is no additional cost per step, when no budget is set.
+        """
+        step = self.step
+        status = EXHAUSTED
+        n = 0
+
+        try:
+            for n in count() if max_steps is None else range(max_steps):
+                if not step():
+                    status = HALTED
+                    break
+            else:
+                n = max_steps
+        except WaitingForInput:
+            status = WAITING
+        finally:
+            self.steps += n
+            self.writer.flush()
 
-        while True:
-            try:
-                self.step()
-            except StopIteration:
-                pass
+        return status
@@ -0,0 +1,405 @@
+"""A shared intermediate representation (IR) and virtual machine (VM).
+
+Front ends lower a program into IR with a Builder, one instruction per
+source step. The passes of finish() turn it into a Program, which
+execute() runs on the state of the interpreter:
+
+    >>> from io import StringIO
+    >>> from esolang.lang.brainfuck import BrainfuckInterpreter
+    >>> intp = BrainfuckInterpreter(outfile=StringIO(), engine="fast")
+    >>> intp.load("++++++++[>++++++++<-]>+.")
+    >>> for instruction in intp.program.code:
+    ...     print(instruction)
+    Instruction(op=0, a=0, b=8, cost=9, pc=0)
+    Instruction(op=4, a=5, b=0, cost=0, pc=0)
+    Instruction(op=0, a=1, b=8, cost=12, pc=9)
+    Instruction(op=0, a=0, b=-1, cost=0, pc=0)
+    Instruction(op=5, a=2, b=0, cost=0, pc=0)
+    Instruction(op=0, a=1, b=1, cost=3, pc=21)
+    Instruction(op=2, a=1, b=0, cost=0, pc=0)
+    Instruction(op=1, a=1, b=0, cost=0, pc=0)
+    Instruction(op=21, a=0, b=0, cost=1, pc=24)
+    >>> intp.run()
+    'halted'
+    >>> intp.outfile.getvalue()
+    'A'
+
+Tape machines use the dict memory and the pointer of the interpreter,
+queue machines its register r and its queues. The pc of the
+interpreter is the position in the source, like for step().
+
+The passes group the instructions into blocks, which end with a jump
+and start at jump targets and at barriers (instructions, that can
+raise, e.g. because they read input). The first instruction of a
+block carries the number of source steps of the whole block, so the
+VM counts steps exactly and only stops between blocks. The steps of
+a block, that doesn't fit into the budget, and the steps from a pc
+inside a block (after such a stop) are executed by step().
+"""
+
+from collections import namedtuple
+
+from esolang.interpreter import WaitingForInput, HALTED, EXHAUSTED, WAITING
+
+# Tape operations (a: offset from the pointer)
+ADD = 0     # memory[pointer + a] += b
+MOVE = 1    # pointer += a
+OUT = 2     # write memory[pointer + a]
+IN = 3      # read into memory[pointer + a], unchanged at the end
+JZ = 4      # jump to a, if memory[pointer] is 0
+JNZ = 5     # jump to a, unless memory[pointer] is 0
+CLEAR = 6   # [-] (a == -1) or [+] (a == 1) in a single instruction
+
+# Queue operations (b: the index of the queue)
+QGET = 7    # r = get()
+QPUT = 8    # put(r)
+QPEEK = 9   # r = peek()
+QLEN = 10   # r = len(queue)
+QADD = 11   # r += get()
+QSUB = 12   # r -= get()
+QOUTN = 13  # write peek() as number
+QOUTC = 14  # write peek() as character
+QJZ = 15    # jump to a, if peek() is 0
+RJZ = 16    # jump to a, if r is 0
+RADD = 17   # r += a
+
+# Operations of all machines
+JMP = 18    # jump to a
+CALL = 19   # call the method named a of the interpreter
+NOP = 20
+HALT = 21
+
+JUMPS = (JZ, JNZ, QJZ, RJZ, JMP)
+
+# An instruction of a Program. cost is the number of source steps of
+# the block starting here (0 inside a block) and pc its position in
+# the source. Jump targets are indices into Program.code.
+Instruction = namedtuple("Instruction", "op a b cost pc")
+
+
+class Program(object):
+    """A program in IR.
+
+    Attributes:
+        code: A list of Instructions.
+        entries: A dict mapping the pc of the first instruction of each
+                 block to its index.
+        mod: The size of the tape cells (None for unlimited).
+    """
+
+    def __init__(self, code, entries, mod=None):
+        self.code = code
+        self.entries = entries
+        self.mod = mod
+
+
+class Builder(object):
+    """Collects the IR of a program, one instruction per source step.
+
+    Jump targets are positions in the source. A jump to a position
+    behind the end of the source halts there.
+    """
+
+    def __init__(self):
+        self.code = []
+
+    def emit(self, pc, op, a=0, b=0, barrier=False):
+        """Add the instruction for the step at pc. A barrier starts a
+        new block (see the module documentation)."""
+        self.code.append([op, a, b, 1, pc, barrier])
+
+    def finish(self, end, mod=None):
+        """Return the optimized Program (the source has length end)."""
+        code = self.code + [[HALT, 0, 0, 1, end, True]]
+        for target in sorted(set(i[1] for i in code if i[0] in JUMPS)):
+            if target > end:
+                code.append([HALT, 0, 0, 1, target, True])
+
+        for optimize in PASSES:
+            code = optimize(code, mod)
+        return link(code, mod)
+
+
+def clear_loops(code, mod):
+    """Replace the loops [-] and [+] by CLEAR.
+
+    The cells only reach 0 for sure, if they wrap around.
+    """
+    if mod is None:
+        return code
+
+    result = []
+    i = 0
+    while i < len(code):
+        window = code[i:i + 3]
+        if len(window) == 3 and [x[0] for x in window] == [JZ, ADD, JNZ] \
+                and window[1][1:3] in ([0, -1], [0, 1]) \
+                and window[0][1] == window[2][4] + 1 \
+                and window[2][1] == window[1][4]:
+            result.append([CLEAR, window[1][2], 0, 1, window[0][4], True])
+            i += 3
+        else:
+            result.append(code[i])
+            i += 1
+    return result
+
+
+def split_blocks(code, mod):
+    """Group the instructions into blocks (lists of instructions)."""
+    targets = set(i[1] for i in code if i[0] in JUMPS)
+    blocks = []
+    block = None
+    for instruction in code:
+        if block is None or instruction[5] or instruction[4] in targets:
+            block = []
+            blocks.append(block)
+        block.append(instruction)
+        if instruction[0] in JUMPS or instruction[0] in (CLEAR, HALT):
+            block = None
+    return blocks
+
+
+def fold(blocks, mod):
+    """Add up the changes of the tape and the register in each block.
+
+    The cell changes are applied, when a cell is written or read, and
+    the pointer moves once at the end of the block. NOPs are dropped.
+    """
+    result = []
+    for block in blocks:
+        folded = []
+        deltas = {}
+        offset = 0
+
+        def add(offset):
+            folded.append([ADD, offset, deltas.pop(offset), 0, 0, False])
+
+        def flush():
+            for cell in list(deltas):
+                add(cell)
+            if offset:
+                folded.append([MOVE, offset, 0, 0, 0, False])
+
+        for instruction in block:
+            op, a = instruction[0], instruction[1]
+            if op == NOP:
+                continue
+            elif op == ADD:
+                deltas[offset + a] = deltas.get(offset + a, 0) + \
+                    instruction[2]
+            elif op == MOVE:
+                offset += a
+            elif op in (OUT, IN):
+                if offset + a in deltas:
+                    add(offset + a)
+                folded.append([op, offset + a, 0, 0, 0, False])
+            elif op == RADD and folded and folded[-1][0] == RADD:
+                folded[-1][1] += a
+            else:
+                flush()
+                offset = 0
+                folded.append([op, a, instruction[2], 0, 0, False])
+        flush()
+
+        if not folded:
+            folded.append([NOP, 0, 0, 0, 0, False])
+        folded[0][3] = sum(i[3] for i in block)
+        folded[0][4] = block[0][4]
+        result.append(folded)
+    return result
+
+
+def link(blocks, mod):
+    """Return the Program of blocks with the jump targets resolved."""
+    entries = {}
+    code = []
+    for block in blocks:
+        entries[block[0][4]] = len(code)
+        code.extend(block)
+
+    return Program([
+        Instruction(op, entries[a] if op in JUMPS else a, b, cost,
+                    pc if cost else 0)
+        for op, a, b, cost, pc, _ in code], entries, mod)
+
+
+# The passes of Builder.finish() (the last one returns the blocks)
+PASSES = [clear_loops, split_blocks, fold]
+
+
+def execute(intp, program, max_steps=None):
+    """Execute program on the state of intp for up to max_steps steps
+    (see Interpreter.execute())."""
+    n = 0
+    try:
+        while max_steps is None or n < max_steps:
+            limit = None if max_steps is None else max_steps - n
+            status, steps = _run(intp, program, limit)
+            n += steps
+            if status is not None:
+                return status
+
+            # The pc is inside a block or the block doesn't fit.
+            limit = None if max_steps is None else max_steps - n
+            status, steps = _step(intp, program.entries, limit)
+            n += steps
+            if status is not None:
+                return status
+        return EXHAUSTED
+    finally:
+        intp.writer.flush()
+
+
+def _step(intp, entries, max_steps):
+    """Call step() at least once and until the pc is the start of a
+    block. Returns the status (None, if not stopped) and the steps."""
+    step = intp.step
+    n = 0
+    try:
+        while max_steps is None or n < max_steps:
+            if not step():
+                return HALTED, n
+            n += 1
+            if intp.pc in entries:
+                break
+    except WaitingForInput:
+        return WAITING, n
+    finally:
+        intp.steps += n
+    return None, n
+
+
+def _run(intp, program, max_steps):
+    """Execute whole blocks. Returns the status (None, if the next
+    block doesn't fit into max_steps) and the steps."""
+    code = program.code
+    index = program.entries.get(intp.pc)
+    if index is None:
+        return None, 0
+
+    mod = program.mod
+    memory = getattr(intp, "memory", None)
+    pointer = getattr(intp, "pointer", 0)
+    register = getattr(intp, "r", None)
+    r = 0 if register is None else register.value
+    queues = getattr(intp, "queues", ())
+    getbyte = intp.reader.getbyte
+    putbyte = intp.writer.putbyte
+    write = intp.writer.write
+
+    status = None
+    pc = intp.pc
+    n = block = 0
+
+    try:
+        while True:
+            op, a, b, cost, start = code[index]
+            if cost:
+                if max_steps is not None and n + cost > max_steps:
+                    pc = start
+                    break
+                n += cost
+                pc = start
+                block = cost
+            index += 1
+
+            if op == ADD:
+                a += pointer
+                if mod:
+                    memory[a] = (memory[a] + b) % mod
+                else:
+                    memory[a] += b
+            elif op == MOVE:
+                pointer += a
+            elif op == JNZ:
+                if memory[pointer]:
+                    index = a
+            elif op == JZ:
+                if not memory[pointer]:
+                    index = a
+            elif op == OUT:
+                putbyte(memory[pointer + a])
+            elif op == CLEAR:
+                # 1 step for "[" and 2 for each pass through the loop
+                steps = 2 * (-a * memory[pointer] % mod)
+                if max_steps is not None and n + steps > max_steps:
+                    n -= cost
+                    break
+                n += steps
+                memory[pointer] = 0
+            elif op == IN:
+                byte = getbyte()
+                if byte >= 0:
+                    memory[pointer + a] = byte
+            elif op == QGET or op == QADD or op == QSUB:
+                queue = queues[b]
+                if queue:
+                    value = queue.popleft()
+                else:
+                    if register is not None:
+                        register.value = r
+                    value = queue.get()
+                if op == QGET:
+                    r = value
+                elif op == QADD:
+                    r += value
+                else:
+                    r -= value
+            elif op == QPUT:
+                queues[b].append(r)
+            elif op == RADD:
+                r += a
+            elif op == QLEN:
+                r = len(queues[b])
+            elif op == RJZ:
+                if r == 0:
+                    index = a
+            elif op == JMP:
+                index = a
+            elif op == HALT:
+                # Like execute_reference(), the end is only noticed
+                # within the budget, but it isn't a step.
+                n -= cost
+                status = HALTED
+                break
+            elif op == CALL:
+                if register is not None:
+                    register.value = r
+                getattr(intp, a)()
+                if register is not None:
+                    r = register.value
+            elif op == NOP:
+                pass
+            else:
+                queue = queues[b]
+                if queue:
+                    value = queue[0]
+                else:
+                    if register is not None:
+                        register.value = r
+                    value = queue.peek()
+                if op == QPEEK:
+                    r = value
+                elif op == QJZ:
+                    if value == 0:
+                        index = a
+                elif op == QOUTN:
+                    write(str(value))
+                else:
+                    write(chr(value))
+    except WaitingForInput:
+        # Barriers start a block, so nothing has been changed.
+        n -= block
+        status = WAITING
+    except Exception:
+        n -= block
+        raise
+    finally:
+        intp.pc = pc
+        intp.steps += n
+        if memory is not None:
+            intp.pointer = pointer
+        if register is not None:
+            register.value = r
+
+    return status, n
@@ -12,35 +12,53 @@ import sys
 from collections import deque
 from operator import add, sub
 
-from esolang.helpers import flow, Register, Fifo, FileBuffer
-from esolang import INTERPRETERS
+from esolang.helpers import flow, Register, Fifo
+from esolang.interpreter import Interpreter, WaitingForInput
+from esolang import INTERPRETERS, ir
 
 if sys.version_info.major < 3:
     chr = unichr
 
 
-class ABCRInterpreter(object):
+# The IR of the commands, that don't jump (see ABCRInterpreter.lower())
+OPERATIONS = {
+    name: (op, 0, index)
+    for index, names in enumerate(("aA1!*-oO", "bB2@+.pP", "cC3#,/qQ"))
+    for name, op in zip(names, (ir.QGET, ir.QPUT, ir.QPEEK, ir.QLEN,
+                                ir.QADD, ir.QSUB, ir.QOUTN, ir.QOUTC))}
+OPERATIONS["("] = (ir.RADD, -1, 0)
+OPERATIONS[")"] = (ir.RADD, 1, 0)
+OPERATIONS["i"] = (ir.CALL, "_read_signed_into_r", 0)
+
+# Commands, that may read input or fail
+BARRIERS = set("c,/OPQi")
+
+
+class ABCRInterpreter(Interpreter):
     lang = "ABCR"
     ext = ".abcr"
 
+    tiers = ("reference", "fast")
+
     def __init__(self,
-                 infile=sys.stdin, outfile=sys.stdout, errfile=sys.stderr):
+                 infile=sys.stdin, outfile=sys.stdout, errfile=sys.stderr,
+                 engine="auto"):
+        super(ABCRInterpreter, self).__init__(infile, outfile, engine)
+
         self.r = Register(0)
         self.a = Fifo(lambda: 0, lambda: 0)
         self.b = Fifo(lambda: 1, lambda: 1)
         self.c = Fifo(
             pop_default=self._read_all_chars_into_c,
             peek_default=self.r.get)
+        self.queues = (self.a, self.b, self.c)
 
-        self.source = None
+        self.source = ""
         self.pc = 0  # program counter
+        self._program = None
 
-        self.infile = infile
-        self.outfile = outfile
         self.errfile = errfile
 
-        self.inbuffer = FileBuffer(self.infile)
-
         self.commands = {
             "a": flow(self.r.put, self.a.get),
             "b": flow(self.r.put, self.b.get),
@@ -70,14 +88,14 @@ class ABCRInterpreter(object):
             "/": flow(self.r.put, sub, self.r.get, self.c.get),
 
             # output values as numbers
-            "o": flow(self.outfile.write, self.a.peek),
-            "p": flow(self.outfile.write, self.b.peek),
-            "q": flow(self.outfile.write, self.c.peek),
+            "o": flow(self._write, self.a.peek),
+            "p": flow(self._write, self.b.peek),
+            "q": flow(self._write, self.c.peek),
 
             # output values as characters
-            "O": flow(self.outfile.write, chr, self.a.peek),
-            "P": flow(self.outfile.write, chr, self.b.peek),
-            "Q": flow(self.outfile.write, chr, self.c.peek),
+            "O": flow(self._write, chr, self.a.peek),
+            "P": flow(self._write, chr, self.b.peek),
+            "Q": flow(self._write, chr, self.c.peek),
 
             # loops
             "4": flow(self._skip_loop_if_zero, self.a.peek),
@@ -95,6 +113,18 @@ class ABCRInterpreter(object):
             "i": self._read_signed_into_r,
         }
 
+    @property
+    def opcode(self):
+        if self.pc < len(self.source):
+            return self.source[self.pc]
+
+    @property
+    def memory_size(self):
+        return len(self.a) + len(self.b) + len(self.c)
+
+    def _write(self, value):
+        self.writer.write(str(value))
+
     def _skip_loop_if_zero(self, value):
         if value == 0:
             while self.pc < len(self.source) and self.source[self.pc] != "x":
@@ -111,14 +141,21 @@ class ABCRInterpreter(object):
     def _read_signed_into_r(self):
         s = ""
 
-        while True:
-            char = self.inbuffer.get()
-
-            if char in "-+0123456789":
-                s += char
-            else:
-                self.inbuffer.put(char)
-                break
+        try:
+            while True:
+                byte = self.reader.getbyte()
+
+                if byte >= 0 and chr(byte) in "-+0123456789":
+                    s += chr(byte)
+                else:
+                    if byte >= 0:
+                        self.reader.unget(byte)
+                    break
+        except WaitingForInput:
+            # Put the digits back, so the command can be repeated.
+            for char in reversed(s):
+                self.reader.unget(ord(char))
+            raise
 
         try:
             self.r.put(int(s))
@@ -126,30 +163,96 @@ class ABCRInterpreter(object):
             self.r.put(0)
 
     def _read_all_chars_into_c(self):
-        char = self.inbuffer.get()
-        if not char:
+        chars = []
+
+        try:
+            byte = self.reader.getbyte()
+            while byte >= 0:
+                chars.append(byte)
+                byte = self.reader.getbyte()
+        except WaitingForInput:
+            # Put the input back, so the command can be repeated.
+            for byte in reversed(chars):
+                self.reader.unget(byte)
+            raise
+
+        if not chars:
             raise EOFError(
                 "Tried to read from C-queue without available input.")
 
-        while char:
-            self.c.put(ord(char))
-            char = self.inbuffer.get()
-
-    def run(self, source):
+        for byte in chars:
+            self.c.put(byte)
+        return self.c.popleft()
+
+    def save_state(self, encoder):
+        encoder.text(self.source)
+        encoder.sint(self.pc)
+        encoder.sint(self.r.value)
+        for queue in self.a, self.b, self.c:
+            encoder.sints(queue)
+
+    def load_state(self, decoder):
+        self.load(decoder.text())
+        self.pc = decoder.sint()
+        self.r.value = decoder.sint()
+        for queue in self.a, self.b, self.c:
+            queue.clear()
+            queue.extend(decoder.sints())
+
+    def load_program(self, source):
         self.source = source
+        self.pc = 0
+        self._program = None
+
+    @property
+    def program(self):
+        """The program in IR (see esolang.ir)."""
+        if self._program is None:
+            self._program = self.lower()
+        return self._program
+
+    def lower(self):
+        """Translate the program into IR."""
+        source = self.source
+        builder = ir.Builder()
+        loop = 0
+
+        for pc, char in enumerate(source):
+            if char in "4567":
+                loop = pc
+                end = source.find("x", pc)
+                target = len(source) + 1 if end < 0 else end + 1
+                if char == "7":
+                    builder.emit(pc, ir.RJZ, target)
+                else:
+                    builder.emit(pc, ir.QJZ, target, "4567".index(char))
+            elif char == "x":
+                builder.emit(pc, ir.JMP, loop)
+            elif char in OPERATIONS:
+                builder.emit(pc, *OPERATIONS[char],
+                             barrier=char in BARRIERS)
+            else:
+                builder.emit(pc, ir.NOP)
 
-        while True:
-            if self.pc >= len(self.source):
-                break
+        return builder.finish(len(source))
 
-            char = self.source[self.pc]
-            func = self.commands.get(char, None)
-            if func is None:
-                pass
-            else:
-                func()
+    def execute_fast(self, max_steps=None):
+        """Run the program in the IR VM (see esolang.ir)."""
+        return ir.execute(self, self.program, max_steps)
+
+    def step(self):
+        if self.pc >= len(self.source):
+            return False
+
+        char = self.source[self.pc]
+        func = self.commands.get(char, None)
+        if func is None:
+            pass
+        else:
+            func()
 
-            self.pc += 1
+        self.pc += 1
+        return True
 
 
 INTERPRETERS.append(ABCRInterpreter)
@@ -8,12 +8,13 @@ import sys
 
 from random import choice
 from esolang import INTERPRETERS
+from esolang.interpreter import Interpreter, WaitingForInput
 
 if sys.version_info.major < 3:
     chr = unichr
 
 
-class BefungeInterpreter(object):
+class BefungeInterpreter(Interpreter):
     """Befunge-93 interpreter"""
 
     lang = "Befunge"
@@ -22,7 +23,9 @@ class BefungeInterpreter(object):
     WIDTH = 80
     HEIGHT = 25
 
-    def __init__(self):
+    def __init__(self, infile=sys.stdin, outfile=sys.stdout, engine="auto"):
+        super(BefungeInterpreter, self).__init__(infile, outfile, engine)
+
         self.dx = 1
         self.dy = 0
         self.x = 0
@@ -32,20 +35,80 @@ class BefungeInterpreter(object):
         self.stack = []
         self.string_mode = False
 
-    def load(self, code):
+    @property
+    def opcode(self):
+        return self.grid[self.y][self.x]
+
+    @property
+    def memory_size(self):
+        return len(self.stack)
+
+    @property
+    def position(self):
+        return self.y * self.WIDTH + self.x
+
+    def load_program(self, code):
         for row, line in enumerate(code.split("\n")):
             for col, c in enumerate(line):
                 self.grid[row][col] = c
 
-    def run(self, code, infile=sys.stdin, outfile=sys.stdout):
-        self.load(code)
-
-        while True:
-            run = self.step(infile, outfile)
-            if not run:
-                break
-
-    def step(self, infile=sys.stdin, outfile=sys.stdout):
+    def save_state(self, encoder):
+        encoder.text("".join("".join(row) for row in self.grid))
+        encoder.sints(self.stack)
+        for n in self.x, self.y, self.dx, self.dy:
+            encoder.sint(n)
+        encoder.uint(self.string_mode)
+
+    def load_state(self, decoder):
+        cells = decoder.text()
+        self.grid = [list(cells[y * self.WIDTH:(y + 1) * self.WIDTH])
+                     for y in range(self.HEIGHT)]
+        self.stack = decoder.sints()
+        self.x, self.y, self.dx, self.dy = [decoder.sint() for _ in range(4)]
+        self.string_mode = bool(decoder.uint())
+
+    def run(self, code=None, infile=None, outfile=None, max_steps=None):
+        if infile is not None:
+            self.infile = infile
+        if outfile is not None:
+            self.outfile = outfile
+
+        return super(BefungeInterpreter, self).run(code, max_steps)
+
+    def pop(self):
+        """Pop a value from the stack (an empty stack pops 0)."""
+        if self.stack:
+            return self.stack.pop()
+        return 0
+
+    def read_number(self):
+        """Read a decimal number for "&" (-1 at the end of the input).
+
+        Everything before the first digit is skipped.
+        """
+        consumed = []
+        try:
+            byte = self.reader.getbyte()
+            while byte >= 0 and not 48 <= byte <= 57:
+                consumed.append(byte)
+                byte = self.reader.getbyte()
+
+            number = -1
+            while 48 <= byte <= 57:
+                consumed.append(byte)
+                number = max(number, 0) * 10 + byte - 48
+                byte = self.reader.getbyte()
+        except WaitingForInput:
+            # Put the input back, so the step can be repeated.
+            for byte in reversed(consumed):
+                self.reader.unget(byte)
+            raise
+
+        if byte >= 0:
+            self.reader.unget(byte)
+        return number
+
+    def step(self):
         op = self.grid[self.y][self.x]
 
         if self.string_mode:
@@ -55,20 +118,20 @@ class BefungeInterpreter(object):
                 self.stack.append(ord(op))
         else:
             if op == "+":
-                a = self.stack.pop()
-                b = self.stack.pop()
+                a = self.pop()
+                b = self.pop()
                 self.stack.append(a + b)
             elif op == "-":
-                a = self.stack.pop()
-                b = self.stack.pop()
+                a = self.pop()
+                b = self.pop()
                 self.stack.append(b - a)
             elif op == "*":
-                a = self.stack.pop()
-                b = self.stack.pop()
+                a = self.pop()
+                b = self.pop()
                 self.stack.append(a * b)
             elif op == "/":
-                a = self.stack.pop()
-                b = self.stack.pop()
+                a = self.pop()
+                b = self.pop()
 
                 if a == 0:
                     msg = "Divsion by zero. What result do you want? "
@@ -82,8 +145,8 @@ class BefungeInterpreter(object):
                 else:
                     self.stack.append(b // a)
             elif op == "%":
-                a = self.stack.pop()
-                b = self.stack.pop()
+                a = self.pop()
+                b = self.pop()
 
                 if a == 0:
                     msg = "Divsion by zero. What result do you want? "
@@ -97,11 +160,11 @@ class BefungeInterpreter(object):
                 else:
                     self.stack.append(b % a)
             elif op == "!":
-                a = self.stack.pop()
+                a = self.pop()
                 self.stack.append(int(not a))
             elif op == "`":
-                a = self.stack.pop()
-                b = self.stack.pop()
+                a = self.pop()
+                b = self.pop()
                 self.stack.append(int(b > a))
             elif op == ">":
                 self.dx, self.dy = 1, 0
@@ -115,13 +178,13 @@ class BefungeInterpreter(object):
                 self.dx, self.dy = choice(
                     (1, 0), (-1, 0), (0, -1), (0, 1))
             elif op == "_":
-                a = self.stack.pop()
+                a = self.pop()
                 if a:
                     self.dx, self.dy = -1, 0
                 else:
                     self.dx, self.dy = 1, 0
             elif op == "|":
-                a = self.stack.pop()
+                a = self.pop()
                 if a:
                     self.dx, self.dy = -1, 0
                 else:
@@ -129,34 +192,36 @@ class BefungeInterpreter(object):
             elif op == '"':
                 self.string_mode = True
             elif op == ":":
-                self.stack.append(self.stack[-1])
+                a = self.pop()
+                self.stack.append(a)
+                self.stack.append(a)
             elif op == "\\":
-                a = self.stack.pop()
-                b = self.stack.pop()
+                a = self.pop()
+                b = self.pop()
                 self.stack.append(a)
                 self.stack.append(b)
             elif op == "$":
-                self.stack.pop()
+                self.pop()
             elif op == ".":
-                a = self.stack.pop()
-                outfile.write(a)
+                a = self.pop()
+                self.writer.write("%d " % a)
             elif op == ",":
-                a = self.stack.pop()
-                outfile.write(chr(a))
+                a = self.pop()
+                self.writer.putbyte(a)
             elif op == "#":
                 self.x += self.dx
                 self.y += self.dy
             elif op == "g":
-                y = self.stack.pop()
-                x = self.stack.pop()
+                y = self.pop()
+                x = self.pop()
                 try:
                     self.stack.append(ord(self.grid[y][x]))
                 except IndexError:
                     self.stack.append(0)
             elif op == "p":
-                y = self.stack.pop()
-                x = self.stack.pop()
-                v = self.stack.pop()
+                y = self.pop()
+                x = self.pop()
+                v = self.pop()
 
                 if (not 0 <= x < self.WIDTH) or (not 0 <= y < self.HEIGHT):
                     raise RuntimeError(
@@ -165,11 +230,9 @@ class BefungeInterpreter(object):
 
                 self.grid[y][x] = chr(v)
             elif op == "&":
-                # TODO
-                raise NotImplementedError()
+                self.stack.append(self.read_number())
             elif op == "~":
-                # TODO
-                raise NotImplementedError()
+                self.stack.append(self.reader.getbyte())
             elif op == "@":
                 return False
             elif op in string.digits:
@@ -2,23 +2,30 @@ from collections import defaultdict
 
 import sys
 
-from esolang import INTERPRETERS
+from esolang import INTERPRETERS, ir
+from esolang.interpreter import (
+    Interpreter, WaitingForInput, HALTED, EXHAUSTED, WAITING)
 
 if sys.version_info.major < 3:
     chr = unichr
 
 
-class BrainfuckInterpreter(object):
+class BrainfuckInterpreter(Interpreter):
     lang = "Brainfuck"
     ext = ".b"
 
-    def __init__(self, cellsize=8):
+    tiers = ("reference", "fast", "compiled")
+
+    def __init__(self, cellsize=8, infile=sys.stdin, outfile=sys.stdout,
+                 engine="auto"):
         """Create a new Brainfuck Interpreter.
 
         Args:
             cellsize: The size of a single memory cell in Bit.
                       (can be set to None, which means infinite memory per cell.
+            engine: The execution engine (see Interpreter.engine).
         """
+        super(BrainfuckInterpreter, self).__init__(infile, outfile, engine)
 
         if cellsize is None:
             self.cellsize = cellsize
@@ -36,7 +43,17 @@ class BrainfuckInterpreter(object):
         self.memory = defaultdict(lambda: 0)
         self.pointer = 0
 
-    def __build_jump_targets(self, code):
+        self.code = ""
+        self.jump_targets = {}
+        self.pc = 0
+
+        # The IR (see program) and the blocks of the compiled engine
+        # by pc (see _compile_block())
+        self._program = None
+        self.blocks = {}
+
+    @staticmethod
+    def __build_jump_targets(code):
         """Return a dict of jump targets."""
         targets = {}
         opening = []
@@ -57,43 +74,230 @@ class BrainfuckInterpreter(object):
 
         return targets
 
-    def run(self, code, infile=sys.stdin, outfile=sys.stdout):
-        jump_targets = self.__build_jump_targets(code)
-        index = 0
+    @property
+    def opcode(self):
+        if self.pc < len(self.code):
+            return self.code[self.pc]
+
+    @property
+    def memory_size(self):
+        return len(self.memory)
+
+    def compile(self, code):
+        return code, self.__build_jump_targets(code)
+
+    def load_program(self, program):
+        self.code, self.jump_targets = program
+        self.pc = 0
+        self._program = None
+        self.blocks = {}
+
+    def save_state(self, encoder):
+        encoder.uint(self.cellsize or 0)
+        encoder.text(self.code)
+        encoder.uint(self.pc)
+        encoder.sint(self.pointer)
+        encoder.cells(self.memory)
+
+    def load_state(self, decoder):
+        cellsize = decoder.uint() or None
+        if cellsize != self.cellsize:
+            self.cellsize = cellsize
+            self.MAXNUM = float("inf") if cellsize is None else 2 ** cellsize
+
+        self.load(decoder.text())
+        self.pc = decoder.uint()
+        self.pointer = decoder.sint()
+        decoder.cells(self.memory)
+
+    def run(self, code=None, infile=None, outfile=None, max_steps=None):
+        if infile is not None:
+            self.infile = infile
+        if outfile is not None:
+            self.outfile = outfile
+
+        return super(BrainfuckInterpreter, self).run(code, max_steps)
+
+    def step(self):
+        # Reached EOF.
+        if self.pc >= len(self.code):
+            return False
+
+        char = self.code[self.pc]
+
+        if char == ">":
+            self.pointer += 1
+        elif char == "<":
+            self.pointer -= 1
+        elif char == "+":
+            self.memory[self.pointer] += 1
+            if self.cellsize:
+                self.memory[self.pointer] %= self.MAXNUM
+        elif char == "-":
+            self.memory[self.pointer] -= 1
+            if self.cellsize:
+                self.memory[self.pointer] %= self.MAXNUM
+        elif char == ".":
+            self.writer.putbyte(self.memory[self.pointer])
+        elif char == ",":
+            byte = self.reader.getbyte()
+            # Leave the cell unchanged on EOF.
+            if byte >= 0:
+                self.memory[self.pointer] = byte
+        elif char == "[":
+            if not self.memory[self.pointer]:
+                self.pc = self.jump_targets[self.pc]
+        elif char == "]":
+            if self.memory[self.pointer]:
+                self.pc = self.jump_targets[self.pc]
+
+        self.pc += 1
+        return True
+
+    @property
+    def program(self):
+        """The program in IR (see esolang.ir)."""
+        if self._program is None:
+            self._program = self.lower()
+        return self._program
+
+    def lower(self):
+        """Translate the program into IR."""
+        ops = {
+            ">": (ir.MOVE, 1, 0),
+            "<": (ir.MOVE, -1, 0),
+            "+": (ir.ADD, 0, 1),
+            "-": (ir.ADD, 0, -1),
+            ".": (ir.OUT, 0, 0),
+        }
+
+        builder = ir.Builder()
+        for pc, char in enumerate(self.code):
+            if char in ops:
+                builder.emit(pc, *ops[char])
+            elif char == ",":
+                builder.emit(pc, ir.IN, barrier=True)
+            elif char == "[":
+                builder.emit(pc, ir.JZ, self.jump_targets[pc] + 1)
+            elif char == "]":
+                builder.emit(pc, ir.JNZ, self.jump_targets[pc] + 1)
+            else:
+                builder.emit(pc, ir.NOP)
+
+        return builder.finish(len(self.code),
+                              self.MAXNUM if self.cellsize else None)
+
+    def execute_fast(self, max_steps=None):
+        """Run the program in the IR VM (see esolang.ir)."""
+        return ir.execute(self, self.program, max_steps)
 
-        while True:
-            # Reached EOF.
-            if index >= len(code):
-                break
+    def _compile_block(self, start):
+        """Generate the code from start to the next bracket or ",".
 
-            char = code[index]
+        A block begins with a "," (if there is one at start), which
+        reads before anything is changed, so the block can be repeated
+        on WaitingForInput. The changes to each cell between two
+        outputs are added up and the block ends with the jump of its
+        closing bracket, if it has one.
 
+        Returns:
+            tuple: The number of steps of the block and a function
+                   taking the memory, the pointer, getbyte and putbyte
+                   and returning the new pointer and pc.
+        """
+        code = self.code
+        end = len(code)
+        mod = " %% %d" % self.MAXNUM if self.cellsize else ""
+        lines = []
+        deltas = {}
+        offset = 0
+
+        def add(offset):
+            cell = "m[p + %d]" % offset
+            lines.append("%s = (%s + %d)%s" % (
+                cell, cell, deltas.pop(offset), mod))
+
+        pc = start
+        if pc < end and code[pc] == ",":
+            lines.append("byte = getbyte()")
+            lines.append("if byte >= 0:")
+            lines.append("    m[p] = byte")
+            pc += 1
+
+        while pc < end and code[pc] not in ",[]":
+            char = code[pc]
             if char == ">":
-                self.pointer += 1
+                offset += 1
             elif char == "<":
-                self.pointer -= 1
+                offset -= 1
             elif char == "+":
-                self.memory[self.pointer] += 1
-                if self.cellsize:
-                    self.memory[self.pointer] %= self.MAXNUM
+                deltas[offset] = deltas.get(offset, 0) + 1
             elif char == "-":
-                self.memory[self.pointer] -= 1
-                if self.cellsize:
-                    self.memory[self.pointer] %= self.MAXNUM
+                deltas[offset] = deltas.get(offset, 0) - 1
             elif char == ".":
-                outfile.write(str(chr(self.memory[self.pointer])))
-            elif char == ",":
-                self.memory[self.pointer] = ord(infile.read())
-            elif char == "[":
-                if not self.memory[self.pointer]:
-                    index = jump_targets[index]
-            elif char == "]":
-                if self.memory[self.pointer]:
-                    index = jump_targets[index]
+                if offset in deltas:
+                    add(offset)
+                lines.append("putbyte(m[p + %d])" % offset)
+            pc += 1
+
+        for cell in list(deltas):
+            add(cell)
+        lines.append("p += %d" % offset)
+
+        if pc < end and code[pc] != ",":
+            target = self.jump_targets[pc]
+            condition = "not m[p]" if code[pc] == "[" else "m[p]"
+            lines.append("if %s:" % condition)
+            lines.append("    return p, %d" % (target + 1))
+            pc += 1
+        lines.append("return p, %d" % pc)
+
+        namespace = {}
+        exec("def block(m, p, getbyte, putbyte):\n    " +
+             "\n    ".join(lines), namespace)
+        return pc - start, namespace["block"]
+
+    def execute_compiled(self, max_steps=None):
+        """Execute the program in blocks of generated code (see
+        _compile_block()). The steps, that don't fill a whole block,
+        are executed by execute_fast()."""
+        end = len(self.code)
+        blocks = self.blocks
+        memory = self.memory
+        pointer = self.pointer
+        pc = self.pc
+        getbyte = self.reader.getbyte
+        putbyte = self.writer.putbyte
+
+        status = EXHAUSTED
+        n = 0
+
+        try:
+            while max_steps is None or n < max_steps:
+                if pc >= end:
+                    status = HALTED
+                    break
+
+                block = blocks.get(pc)
+                if block is None:
+                    block = blocks[pc] = self._compile_block(pc)
+                steps, func = block
+                if max_steps is not None and n + steps > max_steps:
+                    break
 
-            index += 1
+                pointer, pc = func(memory, pointer, getbyte, putbyte)
+                n += steps
+        except WaitingForInput:
+            status = WAITING
+        finally:
+            self.pointer = pointer
+            self.pc = pc
+            self.steps += n
+            self.writer.flush()
 
-        return self.memory[self.pointer]
+        if status == EXHAUSTED and max_steps is not None and n < max_steps:
+            return self.execute_fast(max_steps - n)
+        return status
 
     def memory_as_list(self):
         """Return the internal memory as list."""
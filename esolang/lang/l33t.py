@@ -12,6 +12,7 @@ import sys
 from collections import defaultdict
 
 from esolang import INTERPRETERS
+from esolang.interpreter import Interpreter, WaitingForInput
 
 # logging
 logger = logging.getLogger(__name__)
@@ -34,36 +35,69 @@ DEC = 8
 CON = 9
 END = 10
 
+NAMES = ["NOP", "WRT", "RD", "IF", "EIF", "FWD", "BAK", "INC", "DEC",
+         "CON", "END"]
+
 
 class StandardConnection(object):
-    """Socket emulation for files."""
+    """Socket emulation for the files of an interpreter."""
 
-    def __init__(self, infile, outfile):
-        self.infile = infile
-        self.outfile = outfile
+    def __init__(self, intp):
+        self.intp = intp
 
     def send(self, msg):
-        self.outfile.write(msg)
+        self.intp.writer.write(msg)
         return len(msg)
 
     def recv(self, length):
-        return self.infile.read(length)
+        return bytes(self.intp.reader.read(length))
 
     def close(self):
         pass
 
 
-class L33tInterpreter(object):
+class AsyncConnection(object):
+    """A network connection made by CON in run_async(), that never
+    blocks: recv() raises WaitingForInput, until wait() got data."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.data = bytearray()
+        self.eof = False
+
+    def send(self, msg):
+        self.writer.write(msg)
+        return len(msg)
+
+    def recv(self, length):
+        if not self.data and not self.eof:
+            raise WaitingForInput()
+        data = bytes(self.data[:length])
+        del self.data[:length]
+        return data
+
+    async def wait(self):
+        data = await self.reader.read(4096)
+        if data:
+            self.data += data
+        else:
+            self.eof = True
+
+    def close(self):
+        self.writer.close()
+
+
+class L33tInterpreter(Interpreter):
     lang = "l33t"
     ext = ".l33t"
 
     def __init__(self, infile=sys.stdin, outfile=sys.stdout, errfile=sys.stderr,
-                 memsize=64 * 1024):
-        self.infile = infile
-        self.outfile = outfile
+                 memsize=64 * 1024, engine="auto"):
+        super(L33tInterpreter, self).__init__(infile, outfile, engine)
         self.errfile = errfile
 
-        self.connection = StandardConnection(self.infile, self.outfile)
+        self.connection = StandardConnection(self)
 
         self.memsize = int(memsize)
         assert memsize > 0
@@ -76,6 +110,16 @@ class L33tInterpreter(object):
         # instruction pointer
         self.pc = 0
 
+        # Set by END and errors, that end the program.
+        self.halted = False
+
+        # In run_async(), CON waits for the event loop to connect to
+        # the address in connecting and finds ((host, port), connection
+        # or None on errors) in connected, when it's repeated.
+        self.asynchronous = False
+        self.connecting = None
+        self.connected = None
+
     @property
     def mem(self):
         """Returns a copy of the current memory."""
@@ -84,23 +128,113 @@ class L33tInterpreter(object):
         except ValueError:
             return []
 
-    def parse(self, source):
-        for i, word in enumerate(source.split()):
-            self.memory[i] = sum([int(c) for c in word if c in string.digits])
+    @property
+    def opcode(self):
+        op = self.memory[self.pc]
+        return NAMES[op] if op < len(NAMES) else op
+
+    @property
+    def memory_size(self):
+        return len(self.memory)
+
+    def save_state(self, encoder):
+        if not isinstance(self.connection, StandardConnection):
+            raise ValueError("Can't snapshot an open network connection.")
+
+        encoder.uint(self.memsize)
+        encoder.cells(self.memory)
+        encoder.uint(self.pc)
+        encoder.uint(self.ptr)
+        encoder.uint(self.halted)
+
+    def load_state(self, decoder):
+        self.memsize = decoder.uint()
+        decoder.cells(self.memory)
+        self.pc = decoder.uint()
+        self.ptr = decoder.uint()
+        self.halted = bool(decoder.uint())
+
+        self.connection.close()
+        self.connection = StandardConnection(self)
+
+    def compile(self, source):
+        return [sum([int(c) for c in word if c in string.digits])
+                for word in source.split()]
+
+    def load_program(self, values):
+        for i, value in enumerate(values):
+            self.memory[i] = value
             self.ptr += 1
 
         logger.debug("Source loaded. pc = %d, ptr = %d" % (self.pc, self.ptr))
         logger.debug("Code: %s" % str(self.mem))
 
+    def parse(self, source):
+        self.load(source)
+
+    async def run_async(self, *args, **kwargs):
+        """Like Interpreter.run_async(), but CON connects with asyncio
+        streams, so neither connecting nor receiving blocks."""
+        self.asynchronous = True
+        try:
+            return await super(L33tInterpreter, self).run_async(
+                *args, **kwargs)
+        finally:
+            self.asynchronous = False
+
+    def wait_async(self, read_input):
+        if self.connecting is not None:
+            return self.connect_async(*self.connecting)
+        if isinstance(self.connection, AsyncConnection):
+            return self.connection.wait()
+        return read_input()
+
+    async def connect_async(self, host, port):
+        # Imported here, asyncio takes long to import.
+        import asyncio
+
+        self.connecting = None
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            connection = AsyncConnection(reader, writer)
+        except OSError:
+            connection = None
+        self.connected = ((host, port), connection)
+
+    def connect(self, host, port):
+        """Replace the connection by one to host and port."""
+        if not self.asynchronous:
+            sock = socket.socket()
+            sock.connect((host, port))
+            self.connection.close()
+            self.connection = sock
+            return
+
+        if self.connected is None or self.connected[0] != (host, port):
+            # Repeat the step, once the event loop has connected.
+            self.connecting = (host, port)
+            raise WaitingForInput()
+        connection = self.connected[1]
+        self.connected = None
+        if connection is None:
+            raise socket.error("Connection failed")
+        self.connection.close()
+        self.connection = connection
+
     def step(self):
+        if self.halted:
+            return False
+
         op = self.memory[self.pc]
 
         if op == NOP:
             pass
         elif op == WRT:
-            self.connection.send(bytes(chr(self.memory[self.ptr])))
+            self.connection.send(bytes([self.memory[self.ptr]]))
         elif op == RD:
-            self.memory[self.ptr] = ord(self.connection.recv(1))
+            data = self.connection.recv(1)
+            # Read 0 at the end of the input.
+            self.memory[self.ptr] = data[0] if data else 0
         elif op == IF:
             if self.memory[self.ptr] == 0:
                 addrs = [k for (k, v) in self.memory.items()
@@ -126,7 +260,8 @@ class L33tInterpreter(object):
                             opening_count -= 1
                 else:
                     self.errfile.write(IF_EIF_ERROR)
-                    raise StopIteration(IF_EIF_ERROR)
+                    self.halted = True
+                    return False
 
                 self.pc = closing_pc
         elif op == EIF:
@@ -154,7 +289,8 @@ class L33tInterpreter(object):
                         closing_count += 1
                 else:
                     self.errfile.write(IF_EIF_ERROR)
-                    raise StopIteration(IF_EIF_ERROR)
+                    self.halted = True
+                    return False
 
                 self.pc = opening_pc
         elif op == FWD:
@@ -179,38 +315,26 @@ class L33tInterpreter(object):
             self.memory[self.ptr] %= 256
         elif op == CON:
             try:
-                sock = socket.socket()
                 addrs = [(self.ptr + i) % self.memsize for i in range(6)]
                 values = [self.memory[addr] for addr in addrs]
                 if values == [0, 0, 0, 0, 0, 0]:
                     self.connection.close()
-                    self.connection = StandardConnection(
-                        self.infile, self.outfile)
+                    self.connection = StandardConnection(self)
                 else:
                     host = ".".join(str(values[i]) for i in range(4))
                     port = values[4] * 256 + values[5]
-                    sock.connect((host, port))
-                    self.connection.close()
-                    self.connection = sock
+                    self.connect(host, port)
             except socket.error:
                 self.errfile.write(CONNECTION_ERROR)
         elif op == END:
-            raise StopIteration()
+            self.halted = True
+            return False
         else:
             self.errfile.write(STANDARD_ERROR)
 
         self.pc += 1
         self.pc %= self.memsize
-
-    def run(self, source=None):
-        if source is not None:
-            self.parse(source)
-
-        while True:
-            try:
-                self.step()
-            except StopIteration:
-                return
+        return True
 
 
 INTERPRETERS.append(L33tInterpreter)
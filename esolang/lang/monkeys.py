@@ -9,6 +9,7 @@ import sys
 from random import randrange
 
 from esolang import INTERPRETERS
+from esolang.interpreter import Interpreter
 
 
 SETUP = """
@@ -59,11 +60,12 @@ ACTIONS += " TEACH FIGHT BOND EGO"
 ACTIONS = ACTIONS.split()
 
 
-class MonkeysInterpreter(object):
+class MonkeysInterpreter(Interpreter):
     lang = "Monkeys"
     ext = ".mky"
 
-    def __init__(self, infile=sys.stdin, outfile=sys.stdout, strict=False):
+    def __init__(self, infile=sys.stdin, outfile=sys.stdout, strict=False,
+                 detect_cycles=False, engine="auto"):
         """
 
         When in strict mode the interpreter will only accept
@@ -71,10 +73,20 @@ class MonkeysInterpreter(object):
         number and the action the monkey should take. Otherwise it
         will ignore any additional items, which can be used to
         place comments at the end of the line.
+
+        With detect_cycles enabled, the interpreter checks the state
+        of the world each time a BACK is taken and stops with a
+        RuntimeError, if a MARK/BACK loop can be proven to run
+        forever without doing any I/O (see _check_cycle()).
         """
-        self.infile = infile
-        self.outfile = outfile
+        super(MonkeysInterpreter, self).__init__(infile, outfile, engine)
         self.strict = strict
+        self.detect_cycles = detect_cycles
+
+        # Number of LEARN, YELL and PLAY actions executed so far and
+        # the cycle detection state for every BACK instruction.
+        self.io_count = 0
+        self.loops = {}
 
         self.bananas = []
         self.monkeys = []
@@ -94,16 +106,72 @@ class MonkeysInterpreter(object):
         self.code = []
         self.pc = 0
 
-    def run(self, source):
-        self.load(source)
+    @property
+    def opcode(self):
+        if self.pc < len(self.code):
+            return self.code[self.pc][1]
 
-        while True:
-            run = self.step()
-            if not run:
-                break
+    @property
+    def memory_size(self):
+        return len(self.monkeys) + len(self.bananas)
+
+    def save_state(self, encoder):
+        encoder.uint(len(self.code))
+        for number, action in self.code:
+            encoder.uint(number)
+            encoder.uint(ACTIONS.index(action))
+        encoder.uint(self.pc)
+        encoder.uint(self.io_count)
+
+        # A banana held by two monkeys may have been eaten by one of
+        # them, so it is stored after the ones lying around.
+        bananas = list(self.bananas)
+        for monkey in self.monkeys:
+            if monkey.banana is not None and monkey.banana not in bananas:
+                bananas.append(monkey.banana)
+        encoder.uint(len(self.bananas))
+        encoder.uint(len(bananas))
+        for banana in bananas:
+            encoder.uint(banana.x)
+            encoder.uint(banana.y)
+
+        for monkey in self.monkeys:
+            encoder.uint(monkey.x)
+            encoder.uint(monkey.y)
+            encoder.uint(monkey.value)
+            encoder.uint(monkey.sleeping)
+            encoder.uint(monkey.mark)
+            encoder.uint(0 if monkey.banana is None
+                         else bananas.index(monkey.banana) + 1)
+
+    def load_state(self, decoder):
+        """Restore the state (the cycle detection starts over)."""
+        self.code = [(decoder.uint(), ACTIONS[decoder.uint()])
+                     for _ in range(decoder.uint())]
+        self.pc = decoder.uint()
+        self.io_count = decoder.uint()
+        self.loops = {}
+
+        lying = decoder.uint()
+        bananas = [Banana(decoder.uint(), decoder.uint())
+                   for _ in range(decoder.uint())]
+        self.bananas = bananas[:lying]
+
+        for monkey in self.monkeys:
+            monkey.x = decoder.uint()
+            monkey.y = decoder.uint()
+            monkey.value = decoder.uint()
+            monkey.sleeping = bool(decoder.uint())
+            monkey.mark = decoder.uint()
+            banana = decoder.uint()
+            monkey.banana = bananas[banana - 1] if banana else None
 
-    def load(self, source):
-        self.code = []
+    @property
+    def compile_options(self):
+        return "strict" if self.strict else ""
+
+    def compile(self, source):
+        code = []
         for line in source.split("\n"):
             try:
                 items = line.split(" ")
@@ -114,11 +182,15 @@ class MonkeysInterpreter(object):
                 number = int(number)
                 assert 1 <= number <= 7
                 assert action in ACTIONS
-                self.code.append((number, action))
+                code.append((number, action))
             except (IndexError, ValueError, AssertionError):
                 # Invalid line
                 pass
 
+        return code
+
+    def load_program(self, code):
+        self.code = list(code)
         self.pc = 0
 
     def step(self):
@@ -140,11 +212,17 @@ class MonkeysInterpreter(object):
             if not monkey.banana:
                 monkey.sleeping = True
         elif action == "LEARN":
-            monkey.value = ord(self.infile.read(1))
+            byte = self.reader.getbyte()
+            # Leave the value unchanged on EOF.
+            if byte >= 0:
+                monkey.value = byte
+            self.io_count += 1
         elif action == "YELL":
-            self.outfile.write(chr(monkey.value))
+            self.writer.putbyte(monkey.value)
+            self.io_count += 1
         elif action == "PLAY":
             monkey.value = randrange(0, 256)
+            self.io_count += 1
 
         # movement actions
         elif action == "UP":
@@ -172,6 +250,9 @@ class MonkeysInterpreter(object):
             monkey.mark = self.pc
         elif action == "BACK":
             if monkey.mark is not None:
+                if self.detect_cycles:
+                    self._check_cycle()
+
                 # -1 because of the pc increment below
                 self.pc = monkey.mark - 1
 
@@ -199,6 +280,63 @@ class MonkeysInterpreter(object):
         self.pc += 1
         return True
 
+    def _state(self):
+        """Return everything, that decides which actions have an effect.
+
+        The values of the monkeys are not part of the state: No action
+        depends on a value (they are only ever changed), so two equal
+        states will execute exactly the same actions from here on.
+        """
+        # Like in save_state(), bananas held, but already eaten by
+        # another monkey, come after the ones lying around.
+        bananas = list(self.bananas)
+        for m in self.monkeys:
+            if m.banana is not None and m.banana not in bananas:
+                bananas.append(m.banana)
+
+        monkeys = tuple(
+            (m.x, m.y, m.sleeping, m.mark,
+             bananas.index(m.banana) if m.banana else -1)
+            for m in self.monkeys)
+        return (self.pc, monkeys, len(self.bananas),
+                tuple((b.x, b.y) for b in bananas))
+
+    def _check_cycle(self):
+        """Raise a RuntimeError, if the loop closed by this BACK repeats.
+
+        Uses Brent's algorithm on the states seen at this BACK, so
+        only a single state has to be stored per loop. Any LEARN, YELL
+        or PLAY resets the detection, since such a loop is doing
+        something observable (or random) and is left alone.
+        """
+        values = [m.value for m in self.monkeys]
+        state = self._state()
+
+        loop = self.loops.get(self.pc)
+        if loop is None or loop["io_count"] != self.io_count:
+            self.loops[self.pc] = {
+                "io_count": self.io_count, "state": state,
+                "values": values, "power": 1, "length": 0}
+            return
+
+        loop["length"] += 1
+        if state == loop["state"]:
+            delta = ", ".join(
+                "%d: %+d" % (m.number, (new - old + 128) % 256 - 128)
+                for m, old, new in zip(self.monkeys, loop["values"], values)
+                if new != old)
+            raise RuntimeError(
+                ("Infinite loop: BACK at instruction %d repeats the same " +
+                 "state every %d iteration(s) without any I/O " +
+                 "(value changes per cycle: %s).") % (
+                    self.pc, loop["length"], delta or "none"))
+
+        if loop["power"] == loop["length"]:
+            loop["state"] = state
+            loop["values"] = values
+            loop["power"] *= 2
+            loop["length"] = 0
+
     def _adjacent(self, monkey):
         return [m for m in self.monkeys if m != monkey
                 and abs(monkey.x - m.x) < 2 and abs(monkey.y - m.y) < 2]
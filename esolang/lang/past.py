@@ -2,22 +2,38 @@
 
 https://esolangs.org/wiki/My_Unreliable_Past
 """
+import codecs
 import logging
+import os
+import re
+import selectors
 import string
+import struct
 import sys
 import threading
 
-from random import choice, random, randrange
+from bisect import bisect_right
+from collections import Counter
+from collections.abc import MutableMapping
+from math import log1p
+from queue import Queue
+from random import Random
 
 from esolang import INTERPRETERS
+from esolang.interpreter import (
+    Interpreter as BaseInterpreter, WaitingForInput, EXHAUSTED, WAITING)
 
 logger = logging.getLogger(__name__)
 
-if sys.version_info.major < 3:
-    chr = unichr
-    from Queue import Queue
-else:
-    from queue import Queue
+# The names of the registers in the order of the register file.
+REGISTERS = "ABCDEFGHIKLMNOPQRSTUWXYZ"
+OUT = REGISTERS.index("O")
+IN = REGISTERS.index("I")
+
+PARENS = re.compile(r"[()]")
+
+# A translation table, which removes all whitespace.
+WHITESPACE = dict.fromkeys(map(ord, string.whitespace))
 
 
 def align(source):
@@ -49,36 +65,25 @@ def align(source):
             "Incorrectly commented source: count fo '(':" +
             "%d, count for ')': %d." % (source.count('('), source.count(')')))
 
-    indices = [idx for idx in range(len(source)) if source[idx] == '(']
-    for start in indices:
-        idx = start
-        count = 0
-
-        # Run through the source and keep track of the
-        # count of opening and closing parentheses.
-        # If we reach the starting index again and count is 0
-        # we have found a valid starting index for the program,
-        # if the count is < 0 at any point, the starting point is invalid.
-        while True:
-            if source[idx] == '(':
-                count += 1
-            elif source[idx] == ')':
-                count -= 1
-
-            if count < 0:
-                break
-
-            idx += 1
-            idx %= len(source)
-            if idx == start:
-                break
+    # The program may start at any '(', at which the nesting depth
+    # of the comments is minimal: From there on, the depth never drops
+    # below its starting value, when walking through the whole
+    # (circular) source. The depth only changes at parentheses, so
+    # it's enough to compute the depth before each of them.
+    parens = [(m.start(), m.group()) for m in PARENS.finditer(source)]
+    depths = []
+    depth = 0
+    for _, char in parens:
+        depths.append(depth)
+        depth += 1 if char == '(' else -1
 
-        # found a valid start
-        if count == 0:
-            return source[start:] + source[:start]
+    if parens:
+        lowest = min(depths)
+        for (start, char), depth in zip(parens, depths):
+            if char == '(' and depth == lowest:
+                return source[start:] + source[:start]
 
-    # If we reached this point, there wasn't a valid starting '('.
-    if indices:
+        # Can't happen for a balanced count of '(' and ')'.
         raise ValueError(
             "Incorrectly commented source. No valid rotation exists.")
 
@@ -108,35 +113,518 @@ def strip_comments(source):
     """Remove all comments from the source.
 
     This must be run after align().
+
+    Examples:
+        >>> strip_comments("(a (nested) comment)O=0,(x) O+66;")
+        'O=0, O+66;'
+    """
+    pieces = []
+    start = 0
+    depth = 0
+
+    for m in PARENS.finditer(source):
+        if depth == 0:
+            pieces.append(source[start:m.start()])
+        depth += 1 if m.group() == '(' else -1
+        if depth == 0:
+            start = m.end()
+
+    if depth == 0:
+        pieces.append(source[start:])
+
+    return "".join(pieces)
+
+
+def parse(source):
+    """Return the transactions of source as lists of
+    (register, operation, value) commands.
+
+    Examples:
+        >>> parse("(comment) O=0, O+34;")
+        [[('O', '=', 0), ('O', '+', 34)]]
+
+    Raises:
+        ValueError: If the source is invalid.
+    """
+    # align the source, strip comments and whitespace,
+    # split by transaction and command and parse the resulting
+    # lists.
+    source = align(source)
+    source = strip_comments(source)
+    source = source.translate(WHITESPACE)
+
+    transactions = []
+    for t in source.split(";"):
+        # skip empty transactions
+        if not t:
+            continue
+
+        commands = []
+        for c in t.split(","):
+            # skip empty commands
+            if not c:
+                continue
+
+            if len(c) < 3:
+                raise ValueError(
+                    "Command '%s' too short in transaction '%s'." % (c, t))
+
+            if c[0] not in REGISTERS:
+                raise ValueError(
+                    ("Unsupported register '%s' in " +
+                     "transaction '%s'.") % (c[0], t))
+
+            if c[1] not in "+-=":
+                raise ValueError(
+                    ("Unsupported operation '%s' in " +
+                     "transaction '%s'.") % (c[1], t))
+
+            try:
+                value = int(c[2:])
+            except ValueError:
+                raise ValueError(
+                    ("Invalid integer '%s' in " +
+                     "transaction '%s'.") % (c[2:], t))
+
+            commands.append((c[0], c[1], value))
+        transactions.append(commands)
+
+    return transactions
+
+
+def fold(commands, nonnegative=True):
+    """Fold the commands of a transaction into checks and changes.
+
+    All commands either add to a register or check its current value,
+    so every check is a check on the value the register had at the
+    start of the transaction. A transaction succeeds, if all of its
+    checks hold, which means that all checks can be done before any
+    register is changed (and nothing has to be rolled back).
+
+    Args:
+        commands: A list of (register index, op, value) tuples.
+        nonnegative: If True, registers are known to never hold negative
+                     values, so checks like 'A-0' are dropped.
+
+    Returns:
+        tuple: (equal, minimum, delta), three dicts mapping register
+               indices to the value the register must have, the minimum
+               value it must have and the value added to it on success,
+               or None if the transaction can never succeed.
+
+    Examples:
+        >>> fold([(0, "-", 3), (0, "=", 0), (0, "+", 100)])
+        ({0: 3}, {}, {0: 97})
+        >>> fold([(0, "=", 0), (0, "-", 1)])
+        >>> fold([(1, "=", 0), (0, "-", 2), (0, "+", 5), (1, "+", 1)])
+        ({1: 0}, {0: 2}, {0: 3, 1: 1})
+        >>> fold([(0, "-", 0), (2, "+", 1), (2, "-", 1)])
+        ({}, {}, {})
+    """
+    equal = {}
+    minimum = {}
+    delta = {}
+
+    for idx, op, value in commands:
+        offset = delta.get(idx, 0)
+        if op == "+":
+            delta[idx] = offset + value
+        elif op == "-":
+            delta[idx] = offset - value
+            # reg + offset - value >= 0
+            minimum[idx] = max(minimum.get(idx, value - offset),
+                               value - offset)
+        elif op == "=":
+            # reg + offset == value
+            if equal.get(idx, value - offset) != value - offset:
+                return None
+            equal[idx] = value - offset
+
+    for idx, value in list(minimum.items()):
+        if idx in equal:
+            if equal[idx] < value:
+                return None
+            del minimum[idx]
+        elif nonnegative and value <= 0:
+            del minimum[idx]
+
+    delta = dict((idx, value) for idx, value in delta.items() if value)
+    return equal, minimum, delta
+
+
+def compile_transactions(transactions):
+    """Compile transactions into functions over a register file.
+
+    Each function takes a list of register values (in the order of
+    REGISTERS), executes the transaction on it and returns True,
+    if it succeeded or False, if it was rolled back. The indices of the
+    registers checked by a transaction are stored in its guards
+    attribute and those of the registers it changes in writes.
+
+    Args:
+        transactions: A list of transactions, which are lists of
+                      (register name, op, value) tuples.
+
+    Returns:
+        list: The compiled functions in the order of transactions.
     """
-    s = ""
-    count = 0
-    for char in source:
-        if char == '(':
-            count += 1
-        elif char == ')':
-            count -= 1
-        elif count == 0:
-            s += char
+    nonnegative = not any(
+        op == "+" and value < 0 for t in transactions for _, op, value in t)
+
+    indices = dict((name, idx) for idx, name in enumerate(REGISTERS))
+    functions = []
+    cache = {}
+
+    for t in transactions:
+        folded = fold(
+            [(indices[name], op, value) for name, op, value in t],
+            nonnegative)
+
+        if folded is None:
+            functions.append(never)
+            continue
+
+        key = tuple(tuple(sorted(d.items())) for d in folded)
+
+        # Identical transactions share a single function.
+        if key not in cache:
+            shape = tuple(len(items) for items in key)
+            factory = FACTORIES.get(shape)
+            if factory is None:
+                factory = FACTORIES[shape] = transaction_factory(*shape)
+            func = factory(*[v for items in key for item in items
+                             for v in item])
+            func.guards = tuple(idx for idx, _ in key[0] + key[1])
+            func.writes = tuple(idx for idx, _ in key[2])
+            cache[key] = func
+
+        functions.append(cache[key])
+
+    return functions
+
+
+def never(regs):
+    """A transaction, that never succeeds."""
+    return False
+
+
+never.guards = never.writes = ()
+
+
+# Transaction factories by shape (see transaction_factory()).
+FACTORIES = {}
+
+
+def transaction_factory(equal, minimum, delta):
+    """Return a function, that creates transactions of the given shape.
+
+    Compiling Python code is expensive, so code is only generated once
+    for every shape of transaction, that is the number of equality
+    checks, minimum checks and changed registers. The factory takes
+    (index, value) pairs for each of them in that order and returns
+    the transaction as closure over them.
+    """
+    params = ["i%d, v%d" % (n, n) for n in range(equal + minimum + delta)]
+    checks = ["r[i%d] != v%d" % (n, n) for n in range(equal)]
+    checks += ["r[i%d] < v%d" % (n, n)
+               for n in range(equal, equal + minimum)]
+
+    lines = ["def factory(%s):" % ", ".join(params)]
+    lines.append("    def transaction(r):")
+    if checks:
+        lines.append("        if %s:" % " or ".join(checks))
+        lines.append("            return False")
+    for n in range(equal + minimum, equal + minimum + delta):
+        lines.append("        r[i%d] += v%d" % (n, n))
+    lines.append("        return True")
+    lines.append("    return transaction")
+
+    namespace = {}
+    exec("\n".join(lines), namespace)
+    return namespace["factory"]
+
+
+class IOReactor(object):
+    """Serve the I/O of all running interpreters from a single thread.
+
+    Input files with a file descriptor are watched using a selector and
+    read as soon as data is available. Other file-like objects (e.g.
+    StringIO) and regular files never block, so they are read in one go.
+    Output is written by the reactor thread as well.
+
+    The thread is started by the first call to register() and exits
+    as soon as the last interpreter has been unregistered.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.calls = None
+        self.wakeup = None
+        self.thread = None
+
+    def register(self, intp):
+        """Start serving the infile and outfile of intp."""
+        with self.lock:
+            if self.thread is not None and not self.thread.is_alive():
+                self._reset()
+            self.clients.add(intp)
+            if self.thread is None:
+                self.calls = Queue()
+                self.wakeup = os.pipe()
+                os.set_blocking(self.wakeup[1], False)
+                self.thread = threading.Thread(
+                    target=self.serve, args=(self.calls, self.wakeup[0]))
+                self.thread.daemon = True
+                self.thread.start()
+
+        self.call("add", intp)
+
+    def unregister(self, intp):
+        """Write all pending output of intp and stop serving it."""
+        with self.lock:
+            thread = self.thread
+            registered = intp in self.clients
+
+        if registered and thread.is_alive():
+            done = threading.Event()
+            self.call("remove", intp, done)
+            while not done.wait(0.1):
+                if not thread.is_alive():
+                    break
+            if done.is_set():
+                return
+
+            # The reactor died (the exception has been printed by the
+            # threading module), so the output is written here.
+            logger.warning("The I/O reactor thread died")
+
+        with self.lock:
+            self.clients.discard(intp)
+            if self.thread is thread and thread is not None \
+                    and not thread.is_alive():
+                self._reset()
+        self._write(intp)
+
+    def _reset(self):
+        """Forget a dead reactor thread (called with the lock held)."""
+        self.clients.clear()
+        self.thread = None
+        for fd in self.wakeup:
+            os.close(fd)
+        self.wakeup = None
+        self.calls = None
+
+    def write(self, intp):
+        """Write the pending output of intp.
+
+        The output of interpreters, which aren't registered (e.g. when
+        stepping through a program manually), is written immediately.
+        """
+        if intp in self.clients:
+            self.call("write", intp)
+        else:
+            self._write(intp)
+
+    def call(self, *request):
+        with self.lock:
+            self.calls.put(request)
+            try:
+                os.write(self.wakeup[1], b"\0")
+            except BlockingIOError:
+                # The pipe is full, so the reactor will wake up anyway.
+                pass
+
+    def serve(self, calls, wakeup):
+        """The reactor loop. Runs until there are no more clients."""
+        selector = selectors.DefaultSelector()
+        selector.register(wakeup, selectors.EVENT_READ)
+
+        # fd -> (decoder, list of interpreters reading from fd)
+        readers = {}
+
+        while True:
+            for key, _ in selector.select():
+                if key.fd != wakeup:
+                    self._read(selector, readers, key.fd)
+                    continue
+
+                os.read(wakeup, 4096)
+                while not calls.empty():
+                    request = calls.get()
+                    if request[0] == "add":
+                        self._add(selector, readers, request[1])
+                    elif request[0] == "write":
+                        self._write(request[1])
+                    elif request[0] == "remove":
+                        intp, done = request[1:]
+                        self._write(intp)
+                        for fd, (_, intps) in list(readers.items()):
+                            if intp in intps:
+                                intps.remove(intp)
+                            if not intps:
+                                selector.unregister(fd)
+                                del readers[fd]
+
+                        with self.lock:
+                            self.clients.discard(intp)
+                            stop = not self.clients
+                            if stop:
+                                self.thread = None
+                                os.close(self.wakeup[1])
+                        done.set()
+
+                        if stop:
+                            selector.close()
+                            os.close(wakeup)
+                            return
+
+    def _add(self, selector, readers, intp):
+        infile = intp.infile
+
+        try:
+            fd = infile.fileno()
+        except (AttributeError, ValueError):
+            fd = None
+
+        if fd in readers:
+            readers[fd][1].append(intp)
+            return
+
+        if fd is not None:
+            try:
+                selector.register(fd, selectors.EVENT_READ)
+                encoding = getattr(infile, "encoding", None) or "utf-8"
+                errors = getattr(infile, "errors", None) or "strict"
+                decoder = codecs.getincrementaldecoder(encoding)(errors)
+                readers[fd] = (decoder, [intp])
+                return
+            except (OSError, ValueError):
+                # epoll doesn't support regular files, but those
+                # don't block either.
+                pass
+
+        if not getattr(infile, "closed", False):
+            data = infile.read()
+            if isinstance(data, bytes):
+                # Binary files are read byte by byte (see esolang.streams).
+                data = data.decode("latin-1")
+            intp.feed_input(data)
+        intp.close_input()
+
+    def _read(self, selector, readers, fd):
+        decoder, intps = readers[fd]
+
+        try:
+            data = os.read(fd, 4096)
+        except OSError:
+            data = b""
+
+        chars = decoder.decode(data, final=not data)
+        for intp in intps:
+            intp.feed_input(chars)
+
+        if not data:
+            selector.unregister(fd)
+            del readers[fd]
+            for intp in intps:
+                intp.close_input()
+
+    def _write(self, intp):
+        chars = []
+        while not intp.output_q.empty():
+            chars.append(intp.output_q.get())
+
+        try:
+            if chars:
+                intp.writer.write("".join(chars))
+            intp.writer.flush()
+        except (OSError, ValueError) as e:
+            # Don't let a closed outfile take down the other clients.
+            logger.warning("Dropping output: %s" % e)
+            while not intp.output_q.empty():
+                intp.output_q.get()
+
+
+# The reactor shared by all interpreters.
+reactor = IOReactor()
+
+
+class Registers(MutableMapping):
+    """A view of the register file of an interpreter by name.
+
+    Setting a register revives the transactions that check it (see
+    Interpreter.skip()). Registers can't be deleted.
+    """
+
+    def __init__(self, intp):
+        self.intp = intp
+
+    def __getitem__(self, name):
+        return self.intp.regs[self.index(name)]
+
+    def __setitem__(self, name, value):
+        idx = self.index(name)
+        self.intp.regs[idx] = value
+        self.intp.changed(idx)
+
+    def __delitem__(self, name):
+        raise TypeError("Registers can't be deleted")
+
+    def __iter__(self):
+        return iter(REGISTERS)
+
+    def __len__(self):
+        return len(REGISTERS)
 
-    return s
+    def __repr__(self):
+        return repr(dict(self))
 
+    @staticmethod
+    def index(name):
+        if len(name) != 1 or name not in REGISTERS:
+            raise KeyError(name)
+        return REGISTERS.index(name)
 
-class Interpreter(object):
+
+class Interpreter(BaseInterpreter):
     lang = "My Unreliable Past"
     ext = ".past"
 
-    def __init__(
-            self, infile=sys.stdin, outfile=sys.stdout, errfile=sys.stderr):
-        self.infile = infile
-        self.outfile = outfile
+    # The reactor reads the input as soon as the program starts.
+    waits_for_input = False
+
+    def __init__(self, infile=sys.stdin, outfile=sys.stdout,
+                 errfile=sys.stderr, seed=None, detect_cycles=False,
+                 engine="auto"):
+        """Create a new interpreter.
+
+        With detect_cycles enabled, run() notices when the program
+        keeps repeating the same states and jumps straight to the
+        next I/O event, waits for input without spinning or raises
+        a RuntimeError, if the program is stuck (see check_cycle()).
+        """
+        super(Interpreter, self).__init__(infile, outfile, engine)
         self.errfile = errfile
+        self.detect_cycles = detect_cycles
+
+        # All randomness comes from this generator, so runs can be
+        # reproduced by passing a seed.
+        self.random = Random(seed)
 
-        self.registers = dict([(n, 0) for n in "ABCDEFGHIKLMNOPQRSTUWXYZ"])
+        # The register file, indexed like REGISTERS.
+        self.regs = [0] * len(REGISTERS)
         self.transactions = []
+        self.compiled = []
+        self.dependents = [[] for _ in REGISTERS]
+        self.dead = bytearray()
         self.tc = 0
 
+        # Both queues are filled and drained by the reactor, which
+        # sets input_ready whenever there is new input or EOF.
         self.input_q = Queue()
+        self.input_ready = threading.Event()
+        self.input_eof = False
         self.input = []
         self.input_idx = 0
         self.input_chance = 0.125
@@ -144,27 +632,91 @@ class Interpreter(object):
         self.output_q = Queue()
         self.output_chance = 0.125
 
-        self.running = True
+        # The number of I/O trials up to and including the next
+        # successful one (see reset_countdowns()).
+        self.reset_countdowns()
+
+        # The number of I/O events, that changed a register, and the
+        # state of the cycle detection (see check_cycle()).
+        self.events = 0
+        self.cycle = None
+
+        self.running = False
+
+    @property
+    def opcode(self):
+        """The index of the next transaction."""
+        return self.tc
+
+    @property
+    def memory_size(self):
+        return (self.input_q.qsize() + len(self.input) +
+                self.output_q.qsize())
+
+    @property
+    def position(self):
+        return self.tc
+
+    @property
+    def input_closed(self):
+        """Whether the input has ended (so it is replayed)."""
+        return self.input_eof or getattr(self.infile, "closed", False)
+
+    def feed_input(self, data):
+        """Add the characters data to the input (called by the reactor
+        or esolang.aio)."""
+        for char in data:
+            self.input_q.put(char)
+        self.input_ready.set()
+
+    def close_input(self):
+        """Mark the end of the input."""
+        self.input_eof = True
+        self.input_ready.set()
+
+    @property
+    def registers(self):
+        """A live mapping of the register names to their values."""
+        return Registers(self)
+
+    @registers.setter
+    def registers(self, values):
+        self.registers.update(values)
 
-    def input_thread(self):
-        """Keeps reading the infile until it closes."""
-        while self.running:
-            if self.input_q.empty():
-                char = self.infile.read(1)
-                if char:
-                    self.input_q.put(char)
-
-    def output_thread(self):
-        """Write everything from the output_q to outfile."""
-        while self.running:
-            if not self.output_q.empty():
-                char = self.output_q.get()
-                self.outfile.write(char)
-                self.outfile.flush()
+    def geometric(self, chance):
+        """Return the number of trials up to and including the first
+        success, if each trial succeeds with the given chance.
+
+        This draws from the geometric distribution using a single
+        random number: P(result > k) = (1 - chance) ** k, which is
+        exactly the distribution of rolling random() < chance
+        once per trial.
+        """
+        if chance >= 1:
+            return 1
+        elif chance <= 0:
+            return float("inf")
+        return int(log1p(-self.random.random()) / log1p(-chance)) + 1
+
+    def reset_countdowns(self):
+        """Draw new countdowns for the input and output trials.
+
+        An output trial is made on every step with O != 0 and an input
+        trial on every step with I == 0. Instead of rolling a random
+        number on every trial, step() only counts down to the next
+        successful one.
+        """
+        self.output_countdown = self.geometric(self.output_chance)
+        self.input_countdown = self.geometric(self.input_chance)
 
     def setup_registers(self):
+        """Set all registers to random values.
+
+        This revives all dead transactions (see skip()).
+        """
+        self.dead = bytearray(len(self.compiled))
         logger.debug("Setting up registers:")
-        for name in self.registers:
+        for idx, name in enumerate(REGISTERS):
 
             # Randomize register value
             # 0 with chance 1/2 = 1/2 ** 1
@@ -180,130 +732,557 @@ class Interpreter(object):
                 # On each iteration, we accept half of the random() result.
                 # E.g. This gives us 1/2 ** 3 = 1/8 chance
                 # for the 3rd iteration.
-                if random() < 0.5:
-                    self.registers[name] = randrange(vmin, vmax)
-                    logger.debug(" - %s: %d" % (name, self.registers[name]))
+                if self.random.random() < 0.5:
+                    self.regs[idx] = self.random.randrange(vmin, vmax)
+                    logger.debug(" - %s: %d" % (name, self.regs[idx]))
                     break
 
-    def load(self, source):
-        # align the source, strip comments and whitespace,
-        # split by transaction and command and parse the resulting
-        # lists.
-        source = align(source)
-        source = strip_comments(source)
-        for char in string.whitespace:
-            source = source.replace(char, "")
+    def compile(self, source):
+        return parse(source)
 
-        self.transactions = []
-        for t in source.split(";"):
-            # skip empty transactions
-            if not t:
-                continue
+    def load_program(self, transactions):
+        self.transactions = transactions
+        self.compiled = compile_transactions(self.transactions)
 
-            commands = []
-            for c in t.split(","):
-                # skip empty commands
-                if not c:
+        # The transactions checking each register as a list of
+        # (start, stop, zeros) runs of consecutive transactions, so
+        # they can be marked as not dead with a slice assignment.
+        self.dependents = []
+        for idx in range(len(REGISTERS)):
+            runs = []
+            for t, transaction in enumerate(self.compiled):
+                if idx not in transaction.guards:
                     continue
+                if runs and runs[-1][1] == t:
+                    runs[-1][1] = t + 1
+                else:
+                    runs.append([t, t + 1])
+            self.dependents.append(
+                [(start, stop, bytes(stop - start)) for start, stop in runs])
+        self.dead = bytearray(len(self.compiled))
 
-                if len(c) < 3:
-                    raise ValueError(
-                        "Command '%s' too short in transaction '%s'." % (c, t))
+        # The runs revived by each transaction, when it succeeds.
+        self.revives = [
+            [run for idx in transaction.writes for run in self.dependents[idx]]
+            for transaction in self.compiled]
 
-                if c[0] not in self.registers:
-                    raise ValueError(
-                        ("Unsupported register '%s' in " +
-                         "transaction '%s'.") % (c[0], t))
+    def start(self):
+        """Set up random registers, countdowns and a random start
+        transaction."""
+        self.setup_registers()
+        self.reset_countdowns()
 
-                if c[1] not in "+-=":
-                    raise ValueError(
-                        ("Unsupported operation '%s' in " +
-                         "transaction '%s'.") % (c[1], t))
+        # Set transaction counter to a random transaction.
+        self.tc = self.random.randrange(len(self.transactions))
 
-                try:
-                    value = int(c[2:])
-                except ValueError:
-                    raise ValueError(
-                        ("Invalid integer '%s' in " +
-                         "transaction '%s'.") % (c[2:], t))
+    def save_state(self, encoder):
+        """Write the state (see esolang.snapshot).
 
-                commands.append((c[0], c[1], value))
-            self.transactions.append(commands)
+        The state of the cycle detection isn't saved, it starts over
+        after restoring.
+        """
+        encoder.uint(len(self.transactions))
+        for transaction in self.transactions:
+            encoder.uint(len(transaction))
+            for name, op, value in transaction:
+                encoder.text(name + op)
+                encoder.sint(value)
 
-    def step(self):
-        """Execute a single transaction"""
+        encoder.sints(self.regs)
+        encoder.uint(self.tc)
+        encoder.blob(self.dead)
+        for countdown in self.output_countdown, self.input_countdown:
+            # An infinite countdown (chance 0) is stored as 0.
+            encoder.uint(0 if countdown == float("inf") else countdown)
+        encoder.float(self.output_chance)
+        encoder.float(self.input_chance)
 
-        # Create a backup, in case we have to rollback.
-        backup = dict(self.registers)
+        encoder.text("".join(self.input))
+        encoder.uint(self.input_idx)
+        encoder.uint(self.input_eof)
+        encoder.text("".join(list(self.input_q.queue)))
+        encoder.text("".join(list(self.output_q.queue)))
+        encoder.uint(self.events)
 
-        for name, op, value in self.transactions[self.tc]:
-            if op == "+":
-                self.registers[name] += value
-            elif op == "-":
-                self.registers[name] -= value
+        version, internal, gauss_next = self.random.getstate()
+        encoder.uint(version)
+        encoder.blob(struct.pack("<%dI" % len(internal), *internal))
+        encoder.uint(gauss_next is not None)
+        if gauss_next is not None:
+            encoder.float(gauss_next)
 
-                # rollback and cancel the transaction,
-                # if the result is negative.
-                if self.registers[name] < 0:
-                    self.registers = backup
-                    break
-            elif op == "=":
-                # Rollback and cancel the transaction,
-                # if reg doesn't have the correct value.
-                if self.registers[name] != value:
-                    self.registers = backup
-                    break
+    def load_state(self, decoder):
+        transactions = []
+        for _ in range(decoder.uint()):
+            transaction = []
+            for _ in range(decoder.uint()):
+                name, op = decoder.text()
+                transaction.append((name, op, decoder.sint()))
+            transactions.append(transaction)
+        self.load_program(transactions)
+
+        self.regs[:] = decoder.sints()
+        self.tc = decoder.uint()
+        self.dead = bytearray(decoder.blob())
+        self.output_countdown = decoder.uint() or float("inf")
+        self.input_countdown = decoder.uint() or float("inf")
+        self.output_chance = decoder.float()
+        self.input_chance = decoder.float()
+
+        self.input = list(decoder.text())
+        self.input_idx = decoder.uint()
+        self.input_eof = bool(decoder.uint())
+        for queue in self.input_q, self.output_q:
+            with queue.mutex:
+                queue.queue.clear()
+            for char in decoder.text():
+                queue.put(char)
+        self.events = decoder.uint()
+        self.cycle = None
+
+        version = decoder.uint()
+        internal = decoder.blob()
+        internal = struct.unpack("<%dI" % (len(internal) // 4), internal)
+        gauss_next = decoder.float() if decoder.uint() else None
+        self.random.setstate((version, internal, gauss_next))
+
+    def changed(self, idx):
+        """Mark the transactions checking register idx as not dead."""
+        dead = self.dead
+        for start, stop, zeros in self.dependents[idx]:
+            dead[start:stop] = zeros
+
+    def step(self):
+        """Execute a single transaction"""
+        regs = self.regs
+        tc = self.tc
+        if self.compiled[tc](regs):
+            dead = self.dead
+            for start, stop, zeros in self.revives[tc]:
+                dead[start:stop] = zeros
+        else:
+            # A failed transaction only depends on the registers it
+            # checks, so it will fail again until one of them changes.
+            self.dead[tc] = 1
 
         # handle I/O
-        if self.registers["O"] != 0:
-            if random() < self.output_chance and self.output_q.empty():
-                self.output_q.put(chr(self.registers["O"] - 1))
-                logger.debug("Output register set to 0 from: %d" %
-                             self.registers["O"])
-                self.registers["O"] = 0
-
-        if self.registers["I"] == 0:
-            if random() < self.input_chance:
+        if regs[OUT] != 0:
+            self.output_countdown -= 1
+            if not self.output_countdown:
+                self.output_countdown = self.geometric(self.output_chance)
+                if self.output_q.empty():
+                    self.output_q.put(chr(regs[OUT] - 1))
+                    reactor.write(self)
+                    logger.debug("Output register set to 0 from: %d" %
+                                 regs[OUT])
+                    regs[OUT] = 0
+                    self.changed(OUT)
+                    self.events += 1
+
+        if regs[IN] == 0:
+            self.input_countdown -= 1
+            if not self.input_countdown:
+                self.input_countdown = self.geometric(self.input_chance)
+
                 char = None
-                if self.infile.closed:
+                if not self.input_q.empty():
+                    # get char from input_q and add it to input
+                    char = self.input_q.get()
+                    self.input.append(char)
+
+                elif self.input_closed:
                     # replay already seen input, unless we have none.
                     if len(self.input) > 0:
                         self.input_idx %= len(self.input)
                         char = self.input[self.input_idx]
                         self.input_idx += 1
 
-                elif not self.input_q.empty():
-                    # get char from input_q and add it to input
-                    char = self.input_q.get()
-                    self.input.append(char)
-
                 if char is not None:
-                    self.registers["I"] = ord(char) + 1
-                    logger.debug("Input register set to: %d" %
-                                 self.registers["I"])
+                    regs[IN] = ord(char) + 1
+                    logger.debug("Input register set to: %d" % regs[IN])
+                    self.changed(IN)
+                    self.events += 1
 
         self.tc += 1
         self.tc %= len(self.transactions)
+        return True
 
-    def run(self, source):
-        self.load(source)
-        self.setup_registers()
+    def skip(self, limit=None):
+        """Skip the dead transactions starting at tc.
 
-        # Set transaction counter to a random transaction.
-        self.tc = randrange(len(self.transactions))
+        Dead transactions failed before and none of the registers they
+        check has changed since, so they are certain to fail again.
+        The I/O trials of the skipped steps are still made, but only
+        up to the step before the next successful trial (which changes
+        a register and is left to step()).
 
-        logger.debug("Starting I/O threads...")
-        t1 = threading.Thread(target=self.input_thread)
-        t2 = threading.Thread(target=self.output_thread)
-        t1.daemon = t2.daemon = True
-        t1.start()
-        t2.start()
+        Args:
+            limit: The maximum number of steps to skip.
 
-        while True:
-            try:
+        Returns:
+            int: The number of skipped steps.
+        """
+        regs = self.regs
+        count = len(self.dead)
+
+        if limit is None:
+            limit = float("inf")
+        if regs[OUT]:
+            limit = min(limit, self.output_countdown - 1)
+        if not regs[IN]:
+            limit = min(limit, self.input_countdown - 1)
+
+        live = self.dead.find(0, self.tc)
+        if live >= 0:
+            n = live - self.tc
+        else:
+            live = self.dead.find(0, 0, self.tc)
+            n = count - self.tc + live if live >= 0 else count
+        n = int(min(n, limit))
+
+        self.tc = (self.tc + n) % count
+        self.steps += n
+        if regs[OUT]:
+            self.output_countdown -= n
+        if not regs[IN]:
+            self.input_countdown -= n
+
+        return n
+
+    def input_available(self):
+        """Return whether an input trial can deliver a character now."""
+        if not self.input_q.empty():
+            return True
+        return bool(self.input) and self.input_closed
+
+    def check_cycle(self, limit=None):
+        """Look for a cycle of register states (called with tc == 0).
+
+        Between two I/O events, that change a register, the program is
+        deterministic: each full pass over the transactions maps the
+        registers to new ones. This uses Brent's algorithm to find the
+        period of this mapping and then calls fast_forward() with the
+        given limit.
+        """
+        state = tuple(self.regs)
+        cycle = self.cycle
+        if cycle is None or cycle["events"] != self.events:
+            self.cycle = {"events": self.events, "state": state,
+                          "power": 1, "length": 0}
+            return
+
+        cycle["length"] += 1
+        if state == cycle["state"]:
+            self.cycle = None
+            self.fast_forward(cycle["length"], limit)
+        elif cycle["length"] == cycle["power"]:
+            cycle["state"] = state
+            cycle["power"] *= 2
+            cycle["length"] = 0
+
+    def fast_forward(self, period, limit=None):
+        """Jump to the step before the next I/O event.
+
+        The registers (with tc == 0) repeat every period passes over
+        the transactions, until an I/O trial succeeds. Only the steps
+        of a single period are executed to find out, where the trials
+        are made, then the registers and the countdowns are moved to
+        the step before the next successful trial.
+
+        If the next trial can only succeed with input, that isn't
+        there yet, this waits for the reactor instead (or raises
+        WaitingForInput, if a limit is given). A RuntimeError is raised
+        if no I/O event can ever happen.
+
+        Args:
+            limit: The maximum number of steps to jump.
+        """
+        count = len(self.transactions)
+        length = period * count
+        compiled = self.compiled
+
+        regs = list(self.regs)
+        outputs = []
+        inputs = []
+        for offset in range(1, length + 1):
+            compiled[(offset - 1) % count](regs)
+            if regs[OUT] != 0:
+                outputs.append(offset)
+            if regs[IN] == 0:
+                inputs.append(offset)
+
+        def next_event(countdown, offsets):
+            """Return the offset of the successful trial."""
+            q, r = divmod(countdown - 1, len(offsets))
+            return q * length + offsets[r]
+
+        ends = []
+        if outputs and self.output_countdown != float("inf"):
+            ends.append(next_event(self.output_countdown, outputs))
+        available = self.input_available()
+        if inputs and available and self.input_countdown != float("inf"):
+            ends.append(next_event(self.input_countdown, inputs))
+
+        if not ends:
+            if inputs and not self.input_closed:
+                if limit is not None:
+                    raise WaitingForInput()
+                logger.debug("Waiting for input")
+                self.input_ready.clear()
+                if not self.input_available():
+                    self.input_ready.wait(1)
+                return
+            raise RuntimeError(
+                "Program is stuck: the registers repeat every %d step(s) "
+                "and no I/O event can ever happen" % length)
+
+        # Trials, that fail anyway, because there is no input yet,
+        # don't need to be counted: the chance of success is the same
+        # for each trial.
+        n = min(ends) - 1
+        if limit is not None:
+            n = min(n, limit)
+        full, rest = divmod(n, length)
+        self.output_countdown -= (
+            full * len(outputs) + bisect_right(outputs, rest))
+        if available:
+            self.input_countdown -= (
+                full * len(inputs) + bisect_right(inputs, rest))
+
+        regs = self.regs
+        for tc in range(rest):
+            compiled[tc % count](regs)
+        self.tc = rest % count
+        self.steps += n
+        self.dead[:] = bytes(len(self.dead))
+        logger.debug("Fast-forwarded %d step(s)" % n)
+
+    def execute(self, max_steps=None):
+        """Execute the transactions (see Interpreter.execute()).
+
+        Dead transactions are skipped (see skip()). With detect_cycles
+        enabled, the state is checked for cycles at the start of each
+        pass over the transactions. Past programs never halt, so this
+        only returns, if max_steps is given.
+
+        This is the only engine of Past, so the engine is ignored.
+        """
+        count = len(self.transactions)
+        dead = self.dead
+        self.cycle = None
+
+        if self.instrumentation is not None:
+            return self.instrumentation.execute(self, max_steps)
+
+        # skip() and fast_forward() count the steps they take.
+        if max_steps is None:
+            if not self.detect_cycles:
+                while True:
+                    if dead[self.tc]:
+                        self.skip()
+                    self.step()
+                    self.steps += 1
+
+            while True:
+                if not self.tc:
+                    self.check_cycle()
+                if dead[self.tc] and self.skip(count - self.tc):
+                    continue
+                self.step()
+                self.steps += 1
+
+        # skip() and fast_forward() take many steps at once, so the
+        # budget is checked against the steps taken.
+        end = self.steps + max_steps
+        try:
+            while self.steps < end:
+                if self.detect_cycles and not self.tc:
+                    self.check_cycle(end - self.steps)
+                    if self.steps >= end:
+                        break
+
+                if dead[self.tc]:
+                    limit = end - self.steps
+                    if self.detect_cycles:
+                        limit = min(limit, count - self.tc)
+                    if self.skip(limit):
+                        continue
                 self.step()
-            except StopIteration:
+                self.steps += 1
+        except WaitingForInput:
+            return WAITING
+
+        return EXHAUSTED
+
+    def run(self, source=None, max_steps=None):
+        """Run the program (see esolang.interpreter.Interpreter.run())."""
+        if source is not None:
+            self.load(source)
+            self.start()
+
+        # The reactor reads and writes the files, so the proxies of
+        # an instrumentation have to be in place for the whole run.
+        if self.instrumentation is not None:
+            with self.instrumentation.proxies(self):
+                return self._run(max_steps)
+        return self._run(max_steps)
+
+    def _run(self, max_steps):
+        reactor.register(self)
+        self.running = True
+        try:
+            return self.execute(max_steps)
+        finally:
+            self.running = False
+            reactor.unregister(self)
+
+
+class Ensemble(object):
+    """Run a program in many independent universes at once.
+
+    Every universe behaves like a separate Interpreter with its own
+    random registers, start transaction and I/O trials, but the
+    registers of all universes are kept in a single NumPy matrix and
+    each step is executed for all of them with a few vectorized
+    operations. All universes read the same input, which is replayed
+    once it has been read completely (like a closed infile).
+
+    Requires NumPy.
+    """
+
+    def __init__(self, source, size=1000, input="", seed=None):
+        import numpy as np
+
+        self.size = size
+        self.input = input
+        self.input_chance = 0.125
+        self.output_chance = 0.125
+        self.rng = np.random.default_rng(seed)
+
+        self.transactions = parse(source)
+
+        # One row per transaction, one column per register. Missing
+        # minimum checks use a minimum, that always holds.
+        shape = (len(self.transactions), len(REGISTERS))
+        self.never = np.zeros(shape[0], dtype=bool)
+        self.is_equal = np.zeros(shape, dtype=bool)
+        self.equal = np.zeros(shape, dtype=np.int64)
+        self.minimum = np.full(shape, np.iinfo(np.int64).min, dtype=np.int64)
+        self.delta = np.zeros(shape, dtype=np.int64)
+
+        for t, commands in enumerate(self.transactions):
+            folded = fold([(REGISTERS.index(name), op, value)
+                           for name, op, value in commands], False)
+            if folded is None:
+                self.never[t] = True
+                continue
+
+            equal, minimum, delta = folded
+            for idx, value in equal.items():
+                self.is_equal[t, idx] = True
+                self.equal[t, idx] = value
+            for idx, value in minimum.items():
+                self.minimum[t, idx] = value
+            for idx, value in delta.items():
+                self.delta[t, idx] = value
+
+    def setup_registers(self):
+        """Return a matrix of random registers (see Interpreter)."""
+        import numpy as np
+
+        shape = (self.size, len(REGISTERS))
+
+        # The number of rejected iterations in Interpreter.setup_registers()
+        exp = np.minimum(self.rng.geometric(0.5, size=shape) - 1, 62)
+        vmin = np.where(exp > 0, 2 ** np.maximum(exp - 1, 0), 0)
+        vmax = 2 ** exp
+        offset = (self.rng.random(shape) * (vmax - vmin)).astype(np.int64)
+        return vmin + np.minimum(offset, vmax - vmin - 1)
+
+    def run(self, steps, max_output=None):
+        """Run all universes and return their outputs.
+
+        Args:
+            steps: The number of transactions to execute per universe.
+            max_output: Stop once every universe has written at least
+                        this many characters and cut off the rest.
+
+        Returns:
+            list: The output of every universe as string.
+        """
+        import numpy as np
+
+        n = self.size
+        rng = self.rng
+        universes = np.arange(n)
+        regs = self.setup_registers()
+        tc = rng.integers(len(self.transactions), size=n)
+
+        codes = np.array([ord(c) + 1 for c in self.input], dtype=np.int64)
+        position = np.zeros(n, dtype=np.int64)
+
+        output_countdown = self._geometric(self.output_chance, n)
+        input_countdown = self._geometric(self.input_chance, n)
+        written = np.zeros(n, dtype=np.int64)
+        events = []
+
+        for _ in range(steps):
+            ok = ~self.never[tc] & np.all(
+                (~self.is_equal[tc] | (regs == self.equal[tc])) &
+                (regs >= self.minimum[tc]), axis=1)
+            regs += self.delta[tc] * ok[:, None]
+
+            # output
+            trial = regs[:, OUT] != 0
+            output_countdown -= trial
+            fire = universes[trial & (output_countdown == 0)]
+            if len(fire):
+                output_countdown[fire] = self._geometric(
+                    self.output_chance, len(fire))
+                events.append((fire, regs[fire, OUT] - 1))
+                regs[fire, OUT] = 0
+                written[fire] += 1
+
+            # input
+            trial = regs[:, IN] == 0
+            input_countdown -= trial
+            fire = universes[trial & (input_countdown == 0)]
+            if len(fire):
+                input_countdown[fire] = self._geometric(
+                    self.input_chance, len(fire))
+                if len(codes):
+                    regs[fire, IN] = codes[position[fire] % len(codes)]
+                    position[fire] += 1
+
+            tc += 1
+            tc %= len(self.transactions)
+
+            if max_output is not None and written.min() >= max_output:
                 break
 
+        outputs = [[] for _ in range(n)]
+        for fire, chars in events:
+            for u, char in zip(fire.tolist(), chars.tolist()):
+                outputs[u].append(chr(char))
+
+        return ["".join(chars[:max_output]) for chars in outputs]
+
+    def histogram(self, steps, max_output=None):
+        """Run all universes and count how often each output occurred.
+
+        Returns:
+            collections.Counter: output -> number of universes
+        """
+        return Counter(self.run(steps, max_output))
+
+    def _geometric(self, chance, size):
+        """Draw size countdowns (see Interpreter.geometric())."""
+        import numpy as np
+
+        if chance <= 0:
+            # Never reaches 0, since countdowns only decrease by one.
+            return np.full(size, -1, dtype=np.int64)
+        return self.rng.geometric(min(chance, 1), size=size)
+
 
 INTERPRETERS.append(Interpreter)
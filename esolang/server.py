@@ -0,0 +1,381 @@
+"""A local daemon, that runs programs in warm worker processes.
+
+Starting Python and importing an interpreter takes much longer than
+running most programs, so a script running many small programs can
+start a server once:
+
+    $ python -m esolang serve --socket /tmp/esolang.sock --workers 4
+
+and send each program to it:
+
+    $ python -m esolang client --socket /tmp/esolang.sock hello.b
+
+The server imports all interpreters and then forks its workers, which
+accept the connections on the shared socket. Every worker keeps the
+recently compiled programs in an LRUCache keyed by the hash of their
+source (see Interpreter.compile()), so running the same program again
+skips parsing. With --cache-dir, the workers share a DiskCache, which
+survives restarts of the server.
+
+The protocol consists of JSON objects, one per line. The client sends
+a single request:
+
+    {"source": "...", "lang": null, "filename": "hello.b", "input": "",
+     "max_steps": null}
+
+and receives the output of the program in {"output": "..."} messages
+while it runs, followed by the result:
+
+    {"exit": 0, "status": "halted", "steps": 1234, "cached": false}
+
+The exit codes are the same as the ones of "python -m esolang". An
+"error" message is included for exit codes other than 0. Programs
+running longer than the timeout of the server (default: 60 seconds)
+are stopped with exit code 5.
+"""
+
+from __future__ import print_function
+
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+
+from argparse import ArgumentParser
+from io import StringIO
+from time import monotonic
+
+import esolang
+
+from esolang.cache import LRUCache, DiskCache
+from esolang.governor import ResourceExceeded
+from esolang.interpreter import Interpreter, EXHAUSTED
+
+logger = logging.getLogger(__name__)
+
+# The default wall time in seconds a request may run
+TIMEOUT = 60.0
+
+
+class OutputStream(object):
+    """An outfile, that sends the output as messages to the client.
+
+    The output is buffered and sent on flush() or when the buffer is
+    full.
+    """
+
+    def __init__(self, f, bufsize=8192):
+        self.f = f
+        self.bufsize = bufsize
+        self.buffer = []
+        self.size = 0
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.size += len(data)
+        if self.size >= self.bufsize:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self.buffer:
+            send(self.f, {"output": "".join(self.buffer)})
+            self.buffer = []
+            self.size = 0
+
+
+def send(f, message):
+    f.write(json.dumps(message).encode("utf-8") + b"\n")
+    f.flush()
+
+
+def receive(f):
+    line = f.readline()
+    if not line:
+        raise EOFError("Connection closed")
+    return json.loads(line.decode("utf-8"))
+
+
+class Worker(object):
+    """Runs the requests of one worker process.
+
+    Args:
+        cache_size: The number of compiled programs to keep.
+        slice_steps: The output is sent to the client at least every
+                     slice_steps steps.
+        cache_dir: None or the directory of a DiskCache.
+        timeout: The wall time in seconds a request may run (None for
+                 no limit). It is checked after each slice.
+    """
+
+    def __init__(self, cache_size=128, slice_steps=100000, cache_dir=None,
+                 timeout=TIMEOUT):
+        disk = None if cache_dir is None else DiskCache(cache_dir)
+        self.cache = LRUCache(cache_size, disk)
+        self.slice_steps = slice_steps
+        self.timeout = timeout
+
+    def handle(self, conn):
+        """Answer the request sent over the connection conn."""
+        f = conn.makefile("rwb")
+        try:
+            request = receive(f)
+            outfile = OutputStream(f)
+            result = self.execute(request, outfile)
+            outfile.flush()
+            send(f, result)
+        except (EOFError, OSError, ValueError) as e:
+            # The client went away or sent garbage.
+            logger.warning("Dropping request: %s" % e)
+        finally:
+            f.close()
+
+    def execute(self, request, outfile):
+        """Run the program of request and return the result message."""
+        from esolang.__main__ import select_interpreter
+
+        try:
+            cls = select_interpreter(request.get("filename", ""),
+                                     request.get("lang"))
+        except ValueError as e:
+            return {"exit": 1, "error": str(e)}
+
+        source = request.get("source", "")
+        max_steps = request.get("max_steps")
+        result = {"exit": 0, "cached": False}
+        deadline = None if self.timeout is None \
+            else monotonic() + self.timeout
+
+        try:
+            intp = cls(infile=StringIO(request.get("input", "")),
+                       outfile=outfile)
+            if not isinstance(intp, Interpreter):
+                # A plugin, that doesn't implement the protocol.
+                intp.run(source)
+                return result
+
+            program, result["cached"] = self.cache.compile(intp, source)
+            intp.load_program(program)
+            intp.start()
+
+            status = EXHAUSTED
+            while status == EXHAUSTED and (
+                    max_steps is None or intp.steps < max_steps):
+                budget = self.slice_steps
+                if max_steps is not None:
+                    budget = min(budget, max_steps - intp.steps)
+                status = intp.run(max_steps=budget)
+                outfile.flush()
+                if deadline is not None and status == EXHAUSTED and \
+                        monotonic() > deadline:
+                    raise ResourceExceeded(
+                        "time", self.timeout,
+                        round(self.timeout + monotonic() - deadline, 3))
+
+            result["status"] = status
+            result["steps"] = intp.steps
+        except ValueError as e:
+            result.update(exit=3, error=str(e))
+        except ResourceExceeded as e:
+            result.update(exit=5, error=str(e))
+        except RuntimeError as e:
+            result.update(exit=4, error=str(e))
+        except Exception as e:
+            # A bug in an interpreter mustn't take down the worker.
+            logger.exception("Request failed")
+            result.update(exit=1, error="%s: %s" % (type(e).__name__, e))
+
+        return result
+
+
+class Server(object):
+    """A pre-forking server listening on the unix socket path.
+
+    Args:
+        path: The filename of the socket.
+        workers: The number of worker processes.
+        cache_size: The number of compiled programs each worker keeps.
+        cache_dir: None or the directory of a DiskCache shared by the
+                   workers.
+        timeout: The wall time in seconds a request may run (None for
+                 no limit).
+    """
+
+    def __init__(self, path, workers=4, cache_size=128, cache_dir=None,
+                 timeout=TIMEOUT):
+        self.path = path
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.children = set()
+        self.running = False
+        self.sock = None
+
+    def serve_forever(self):
+        """Start the workers and restart them, if they die, until
+        SIGTERM or SIGINT is received."""
+        # Import everything before forking, so the workers start warm.
+        for language in esolang.languages():
+            language.load()
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(self.path)
+        self.sock.listen(128)
+
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        try:
+            while self.running:
+                while len(self.children) < self.workers:
+                    self.spawn()
+
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    continue
+                except InterruptedError:
+                    continue
+                self.children.discard(pid)
+                if self.running:
+                    logger.warning("Worker %d died, restarting it" % pid)
+        finally:
+            self.shutdown()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return
+
+        # The worker process
+        status = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            worker = Worker(self.cache_size, cache_dir=self.cache_dir,
+                            timeout=self.timeout)
+            while True:
+                conn, _ = self.sock.accept()
+                try:
+                    worker.handle(conn)
+                finally:
+                    conn.close()
+        except BaseException:
+            logger.exception("Worker failed")
+            status = 1
+        finally:
+            os._exit(status)
+
+    def stop(self, signum=None, frame=None):
+        self.running = False
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def shutdown(self):
+        self.stop()
+        for pid in list(self.children):
+            try:
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        self.children.clear()
+
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def request(path, source, lang=None, filename="", input="", max_steps=None,
+            outfile=None):
+    """Run a program on the server listening on path.
+
+    The output is written to outfile, while the program runs.
+
+    Returns:
+        dict: The result message (see above).
+    """
+    outfile = sys.stdout if outfile is None else outfile
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    f = sock.makefile("rwb")
+    try:
+        send(f, {"source": source, "lang": lang, "filename": filename,
+                 "input": input, "max_steps": max_steps})
+        while True:
+            message = receive(f)
+            if "output" not in message:
+                return message
+            outfile.write(message["output"])
+            outfile.flush()
+    finally:
+        f.close()
+        sock.close()
+
+
+def main(argv=None):
+    parser = ArgumentParser(
+        prog="python -m esolang",
+        description="Run programs in a local server process.")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    serve = commands.add_parser("serve", help="start a server")
+    serve.add_argument(
+        "-s", "--socket", required=True, help="the unix socket to listen on")
+    serve.add_argument(
+        "-w", "--workers", type=int, default=os.cpu_count() or 1,
+        help="the number of worker processes (default: number of CPUs)")
+    serve.add_argument(
+        "--cache-size", type=int, default=128,
+        help="the number of compiled programs each worker keeps "
+             "(default: 128)")
+    serve.add_argument(
+        "--cache-dir", metavar="DIR",
+        help="keep the compiled programs in DIR between restarts")
+    serve.add_argument(
+        "--timeout", type=float, default=TIMEOUT,
+        help="stop requests running longer than TIMEOUT seconds; 0 for "
+             "no limit (default: %g)" % TIMEOUT)
+
+    client = commands.add_parser("client", help="run a file on a server")
+    client.add_argument(
+        "-s", "--socket", required=True, help="the unix socket of the server")
+    client.add_argument(
+        "-l", "--lang", help="interpret the file in the given esolang")
+    client.add_argument(
+        "--max-steps", type=int, help="stop after MAX_STEPS steps")
+    client.add_argument("filename", help="an esolang filename to run")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        if args.workers < 1:
+            parser.error("--workers must be at least 1")
+        Server(args.socket, args.workers, args.cache_size,
+               args.cache_dir, args.timeout or None).serve_forever()
+        return 0
+
+    try:
+        with open(args.filename, "r") as f:
+            source = f.read()
+    except IOError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    stdin = "" if sys.stdin.isatty() else sys.stdin.read()
+    result = request(args.socket, source, args.lang, args.filename, stdin,
+                     args.max_steps)
+    if "error" in result:
+        print(result["error"], file=sys.stderr)
+    return result["exit"]
@@ -0,0 +1,186 @@
+"""A compact binary format for the state of interpreters.
+
+Interpreter.snapshot() returns the complete state of an interpreter
+between two calls to run() and Interpreter.restore() continues from
+there, possibly in another process:
+
+    >>> from io import StringIO
+    >>> from esolang.lang.brainfuck import BrainfuckInterpreter
+    >>> intp = BrainfuckInterpreter(outfile=StringIO())
+    >>> intp.run("++++++++[>++++++++<-]>+.+.", max_steps=50)
+    'exhausted'
+    >>> data = intp.snapshot()
+    >>> copy = BrainfuckInterpreter(outfile=StringIO())
+    >>> copy.restore(data)
+    >>> copy.run()
+    'halted'
+    >>> copy.outfile.getvalue()
+    'AB'
+
+A snapshot starts with a header (MAGIC, the format VERSION, the
+language, the number of steps and the input read ahead, see
+esolang.streams) followed by whatever the save_state() method of the
+interpreter writes. Integers are written as varints (LEB128, signed
+ones zigzag encoded), memory cells as raw bytes, when they all fit.
+The files are not part of a snapshot.
+"""
+
+import struct
+
+MAGIC = b"ESOS"
+VERSION = 1
+
+
+class Encoder(object):
+    """Collects the encoded values."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def getvalue(self):
+        return bytes(self.data)
+
+    def uint(self, n):
+        """Write an unsigned integer."""
+        data = self.data
+        while n > 0x7f:
+            data.append(n & 0x7f | 0x80)
+            n >>= 7
+        data.append(n)
+
+    def sint(self, n):
+        """Write a signed integer."""
+        self.uint(n * 2 if n >= 0 else -n * 2 - 1)
+
+    def float(self, x):
+        self.data += struct.pack("<d", x)
+
+    def blob(self, data):
+        self.uint(len(data))
+        self.data += data
+
+    def text(self, s):
+        self.blob(s.encode("utf-8", "surrogatepass"))
+
+    def sints(self, values):
+        values = list(values)
+        self.uint(len(values))
+        for n in values:
+            self.sint(n)
+
+    def cells(self, memory):
+        """Write a dict mapping indices to integers (like a tape) as
+        the values from the lowest to the highest index."""
+        if not memory:
+            self.sint(0)
+            self.uint(1)
+            self.blob(b"")
+            return
+
+        lo, hi = min(memory), max(memory)
+        values = [memory.get(i, 0) for i in range(lo, hi + 1)]
+        self.sint(lo)
+        if all(0 <= n < 256 for n in values):
+            self.uint(1)
+            self.blob(bytes(values))
+        else:
+            self.uint(0)
+            self.sints(values)
+
+
+class Decoder(object):
+    """Reads the values written by an Encoder in the same order."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def done(self):
+        if self.pos != len(self.data):
+            raise ValueError("Snapshot has %d trailing bytes." %
+                             (len(self.data) - self.pos))
+
+    def uint(self):
+        data = self.data
+        n = shift = 0
+        try:
+            while True:
+                byte = data[self.pos]
+                self.pos += 1
+                n |= (byte & 0x7f) << shift
+                if byte < 0x80:
+                    return n
+                shift += 7
+        except IndexError:
+            raise ValueError("Snapshot is truncated.")
+
+    def sint(self):
+        n = self.uint()
+        return n >> 1 if not n & 1 else -(n >> 1) - 1
+
+    def float(self):
+        return struct.unpack("<d", self.take(8))[0]
+
+    def take(self, size):
+        if self.pos + size > len(self.data):
+            raise ValueError("Snapshot is truncated.")
+        self.pos += size
+        return self.data[self.pos - size:self.pos]
+
+    def blob(self):
+        return bytes(self.take(self.uint()))
+
+    def text(self):
+        return self.blob().decode("utf-8", "surrogatepass")
+
+    def sints(self):
+        return [self.sint() for _ in range(self.uint())]
+
+    def cells(self, memory):
+        """Read cells written by Encoder.cells() into memory."""
+        lo = self.sint()
+        if self.uint():
+            values = self.blob()
+        else:
+            values = self.sints()
+
+        memory.clear()
+        for i, value in enumerate(values, lo):
+            memory[i] = value
+
+
+def dump(intp):
+    """Return the snapshot of intp (see Interpreter.snapshot())."""
+    intp.writer.flush()
+
+    encoder = Encoder()
+    encoder.data += MAGIC
+    encoder.uint(VERSION)
+    encoder.text(intp.lang)
+    encoder.uint(intp.steps)
+    encoder.sints(intp.reader.pending)
+    intp.save_state(encoder)
+    return encoder.getvalue()
+
+
+def load(intp, data):
+    """Restore the snapshot data into intp (see Interpreter.restore())."""
+    decoder = Decoder(data)
+    if decoder.take(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a snapshot.")
+    version = decoder.uint()
+    if version != VERSION:
+        raise ValueError("Unsupported snapshot version %d." % version)
+    lang = decoder.text()
+    if lang != intp.lang:
+        raise ValueError("Snapshot of a %s interpreter can't be restored "
+                         "into a %s interpreter." % (lang, intp.lang))
+
+    intp.steps = decoder.uint()
+    pending = decoder.sints()
+    intp.load_state(decoder)
+    decoder.done()
+
+    intp.reader.pending.clear()
+    intp.reader.pending.extend(pending)
+    intp.reader.fetched = len(pending)
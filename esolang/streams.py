@@ -0,0 +1,232 @@
+"""Buffered byte I/O shared by the interpreters.
+
+Every interpreter reads with reader.getbyte() and writes with
+writer.putbyte() (see Interpreter.reader and Interpreter.writer):
+
+    >>> from io import BytesIO
+    >>> writer = ByteWriter(BytesIO())
+    >>> for byte in b"Hi":
+    ...     writer.putbyte(byte)
+    >>> writer.outfile.getvalue()
+    b''
+    >>> writer.flush()
+    >>> writer.outfile.getvalue()
+    b'Hi'
+    >>> reader = ByteReader(BytesIO(b"a"))
+    >>> reader.getbyte(), reader.getbyte()
+    (97, -1)
+
+Binary files and real text files (like sys.stdin and sys.stdout) are
+read and written in blocks through their binary buffer. The output is
+written, when the buffer is full, when the interpreter stops (at the
+end of Interpreter.execute()) and before reading input, so prompts are
+visible. Other file-like objects (StringIO, InputQueue or the proxies
+of esolang.instrument) are used one character at a time, so they see
+every read and write when it happens. A byte is the code point of a
+character for those.
+"""
+
+import io
+
+from collections import deque
+
+BUFSIZE = 8192
+
+
+def binary_file(f):
+    """Return the binary file underlying f or None, if f can only be
+    used as text file.
+
+    Wrappers of files (like the proxies of esolang.instrument) provide
+    a binary_file() method, that returns a wrapper of the binary file.
+    """
+    if hasattr(type(f), "binary_file"):
+        return f.binary_file()
+    if isinstance(f, (io.RawIOBase, io.BufferedIOBase)):
+        return f
+    if isinstance(f, io.TextIOWrapper):
+        return f.buffer
+    return None
+
+
+class ByteReader(object):
+    """Reads single bytes from infile.
+
+    Args:
+        infile: The file to read from.
+        pending: Bytes, that are returned before reading infile.
+        bufsize: The number of bytes read at once.
+
+    Attributes:
+        writer: A ByteWriter, that is flushed before reading infile.
+        fetched: The number of bytes put into pending so far (see
+                 consumed).
+    """
+
+    def __init__(self, infile, pending=(), bufsize=BUFSIZE):
+        self.infile = infile
+        self.pending = deque(pending)
+        self.bufsize = bufsize
+        self.writer = None
+        self.fetched = len(self.pending)
+
+        raw = binary_file(infile)
+        if raw is None:
+            self.fill = self._fill_text
+        else:
+            self.fill = getattr(raw, "read1", raw.read)
+
+    def getbyte(self):
+        """Return the next byte or -1 at the end of the input."""
+        if self.pending:
+            return self.pending.popleft()
+
+        if self.writer is not None:
+            self.writer.flush()
+
+        data = self.fill(self.bufsize)
+        if not data:
+            return -1
+        self.fetched += len(data)
+        self.pending.extend(data[1:])
+        return data[0]
+
+    @property
+    def consumed(self):
+        """The number of bytes returned by getbyte() so far (minus the
+        ones put back)."""
+        return self.fetched - len(self.pending)
+
+    def _fill_text(self, size):
+        char = self.infile.read(1)
+        return [ord(char)] if char else []
+
+    def unget(self, byte):
+        """Return byte by the next call to getbyte()."""
+        self.pending.appendleft(byte)
+
+    def read(self, size):
+        """Return a list of up to size bytes (less at the end of the
+        input)."""
+        data = []
+        while len(data) < size:
+            byte = self.getbyte()
+            if byte < 0:
+                break
+            data.append(byte)
+        return data
+
+
+class ByteWriter(object):
+    """Writes single bytes to outfile.
+
+    Bytes above 255 (e.g. written by Befunge's ",") are written as
+    UTF-8 encoded character to binary files.
+
+    Args:
+        outfile: The file to write to.
+        previous: The ByteWriter replaced by this one. Its counters
+                  and limit are taken over.
+        bufsize: The number of bytes written at once.
+
+    Attributes:
+        limit: None or the number of bytes after which all output
+               is dropped (see esolang.governor).
+        keep: The number of bytes of the output to keep in kept.
+    """
+
+    def __init__(self, outfile, previous=None, bufsize=BUFSIZE):
+        self.outfile = outfile
+        self.bufsize = bufsize
+        self.buffer = bytearray()
+        self.dirty = False
+
+        self.raw = binary_file(outfile)
+        if self.raw is None:
+            self.putbyte = self._putbyte_text
+        else:
+            # Write whatever is buffered by the text file first.
+            if self.raw is not outfile:
+                outfile.flush()
+            self.putbyte = self._putbyte_binary
+
+        if previous is None:
+            self.count = 0
+            self.limit = None
+            self.keep = 0
+            self.kept = []
+        else:
+            self.count = previous.written
+            self.limit = previous.limit
+            self.keep = previous.keep
+            self.kept = previous.kept
+
+    @property
+    def written(self):
+        """The number of bytes written so far (including the dropped
+        ones)."""
+        return self.count + len(self.buffer)
+
+    @property
+    def output(self):
+        """The kept output as str."""
+        return "".join(
+            chunk if isinstance(chunk, str) else chunk.decode("latin-1")
+            for chunk in self.kept)
+
+    def _putbyte_binary(self, byte):
+        buffer = self.buffer
+        try:
+            buffer.append(byte)
+        except ValueError:
+            buffer += chr(byte).encode("utf-8")
+        if len(buffer) >= self.bufsize:
+            self.flush()
+
+    def _putbyte_text(self, byte):
+        self._emit(chr(byte))
+
+    def write(self, data):
+        """Write data (str or bytes)."""
+        if self.raw is None:
+            if isinstance(data, bytes):
+                data = data.decode("latin-1")
+            self._emit(data)
+            return
+
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.buffer += data
+        if len(self.buffer) >= self.bufsize:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered bytes and flush outfile."""
+        if self.buffer:
+            data = bytes(self.buffer)
+            # Clear in place, the buffer may be referenced elsewhere.
+            del self.buffer[:]
+            self._emit(data)
+
+        if self.dirty:
+            self.dirty = False
+            flush = getattr(self.outfile, "flush", None)
+            if flush is not None:
+                flush()
+
+    def _emit(self, data):
+        size = len(data)
+        if self.limit is not None and self.count + size > self.limit:
+            data = data[:max(0, self.limit - self.count)]
+        self.count += size
+
+        if self.keep > 0 and data:
+            self.kept.append(data[:self.keep])
+            self.keep -= len(self.kept[-1])
+
+        if data:
+            if self.raw is None:
+                self.outfile.write(data)
+            else:
+                self.raw.write(data)
+            self.dirty = True
@@ -0,0 +1,162 @@
+"""Unittests for running interpreters on an asyncio event loop."""
+
+import asyncio
+import doctest
+import threading
+
+from unittest import TestCase
+
+from io import StringIO
+
+from esolang import aio
+from esolang.interpreter import HALTED, EXHAUSTED
+from esolang.lang import l33t, past
+from esolang.lang.brainfuck import BrainfuckInterpreter
+from esolang.tests.test_past import CAT
+
+
+class Writer(object):
+    """Collects what is written like an asyncio.StreamWriter."""
+
+    def __init__(self):
+        self.data = b""
+        self.drained = 0
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        self.drained += 1
+
+
+async def feed_later(reader, chunks):
+    """Feed the chunks to reader, one per run of the event loop."""
+    for chunk in chunks:
+        await asyncio.sleep(0)
+        reader.feed_data(chunk)
+    reader.feed_eof()
+
+
+class AsyncTests(TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(aio)
+        self.assertEqual(failed, 0)
+
+    def test_sessions(self):
+        """Many sessions waiting for input share one event loop."""
+        async def session(i):
+            reader = asyncio.StreamReader()
+            writer = Writer()
+            chunks = [b"%d" % i, b" ", b"x" * i, b"\0"]
+            feeder = asyncio.ensure_future(feed_later(reader, chunks))
+            status = await BrainfuckInterpreter().run_async(
+                reader, writer, ",[.,]")
+            await feeder
+            return status, writer.data
+
+        async def sessions():
+            return await asyncio.gather(*[session(i) for i in range(200)])
+
+        results = asyncio.run(sessions())
+        for i, (status, output) in enumerate(results):
+            self.assertEqual(status, HALTED)
+            self.assertEqual(output, b"%d %s" % (i, b"x" * i))
+
+    def test_slices(self):
+        """A program, that doesn't wait, gives control back after each
+        slice."""
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0)
+
+        async def main():
+            task = asyncio.ensure_future(ticker())
+            intp = BrainfuckInterpreter()
+            status = await intp.run_async(
+                asyncio.StreamReader(), Writer(), "+[]", max_steps=50000,
+                slice_steps=1000)
+            task.cancel()
+            return status, intp.steps
+
+        self.assertEqual(asyncio.run(main()), (EXHAUSTED, 50000))
+        self.assertGreaterEqual(len(ticks), 50)
+
+    def test_past(self):
+        """Past gets its input without the reactor thread."""
+        threads = threading.active_count()
+
+        async def main():
+            reader = asyncio.StreamReader()
+            writer = Writer()
+            feeder = asyncio.ensure_future(feed_later(reader, [b"a", b"b"]))
+            intp = past.Interpreter(seed=1)
+            status = await intp.run_async(reader, writer, CAT,
+                                          max_steps=200000, slice_steps=500)
+            await feeder
+            return status, intp, writer.data
+
+        status, intp, output = asyncio.run(main())
+        self.assertEqual(status, EXHAUSTED)
+        self.assertEqual(intp.input, ["a", "b"])
+        self.assertTrue(intp.input_eof)
+        # The registers start random, so the output may start with junk.
+        self.assertIn(b"ababab", output)
+        self.assertIsNone(past.reactor.thread)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_l33t_connect(self):
+        """CON connects and receives without blocking the event loop."""
+        received = []
+
+        async def handle(reader, writer):
+            received.append(await reader.read(1))
+            await asyncio.sleep(0.01)
+            writer.write(b"!")
+            await writer.drain()
+            writer.close()
+
+        async def main():
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+
+            # CON, WRT, RD, END with the address after the program
+            intp = l33t.L33tInterpreter(errfile=StringIO())
+            intp.load("9 1 2 55")
+            for i, value in enumerate([127, 0, 0, 1, port >> 8, port & 255]):
+                intp.memory[intp.ptr + i] = value
+
+            status = await intp.run_async(asyncio.StreamReader(), Writer())
+            server.close()
+            await server.wait_closed()
+            return status, intp
+
+        status, intp = asyncio.run(main())
+        self.assertEqual(status, HALTED)
+        self.assertEqual(received, [b"\x7f"])
+        self.assertEqual(intp.memory[intp.ptr], ord("!"))
+        self.assertEqual(intp.errfile.getvalue(), "")
+        self.assertFalse(intp.asynchronous)
+
+    def test_l33t_connection_error(self):
+        async def main():
+            # Find a port, nobody listens on.
+            server = await asyncio.start_server(
+                lambda reader, writer: None, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            server.close()
+            await server.wait_closed()
+
+            intp = l33t.L33tInterpreter(errfile=StringIO())
+            intp.load("9 55")
+            for i, value in enumerate([127, 0, 0, 1, port >> 8, port & 255]):
+                intp.memory[intp.ptr + i] = value
+            status = await intp.run_async(asyncio.StreamReader(), Writer())
+            return status, intp
+
+        status, intp = asyncio.run(main())
+        self.assertEqual(status, HALTED)
+        self.assertEqual(intp.errfile.getvalue(), l33t.CONNECTION_ERROR)
+        self.assertIsInstance(intp.connection, l33t.StandardConnection)
@@ -0,0 +1,103 @@
+"""Unittests for running a program against many inputs."""
+
+import doctest
+
+from io import BytesIO
+from unittest import TestCase
+
+from esolang import batch
+from esolang.batch import run_many, run_prefix
+from esolang.governor import Limits
+from esolang.interpreter import HALTED
+from esolang.lang.brainfuck import BrainfuckInterpreter
+from esolang.tests.test_instrument import ABCR_HELLO
+from esolang.tests.test_streams import L33T_ECHO
+
+# Add one to the first two bytes of the input.
+SUCC = ",+.,+."
+
+# Print "A", then add 64 to the input.
+PROLOGUE = "++++++++[>++++++++<-]>+.-<,[->+<]>."
+
+
+class BatchTests(TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(batch)
+        self.assertEqual(failed, 0)
+
+    def test_order(self):
+        inputs = [bytes([i, 255]) for i in range(1, 50)]
+        expected = [bytes([i + 1, 0]) for i in range(1, 50)]
+        for workers in 1, 3:
+            results = run_many("Brainfuck", SUCC, inputs, workers=workers)
+            self.assertEqual([r.output for r in results], expected)
+            self.assertTrue(all(r.error is None for r in results))
+
+    def test_errors(self):
+        limits = Limits(max_steps=1000)
+        results = run_many("Brainfuck", ",[.]", [b"\0", b"a", b""],
+                           workers=2, limits=limits)
+        self.assertEqual(results[0].output, b"")
+        self.assertIsNone(results[0].error)
+        self.assertTrue(results[1].error.startswith("ResourceExceeded"))
+        self.assertEqual(set(results[1].output), set(b"a"))
+        self.assertIsNone(results[1].status)
+        self.assertIsNone(results[2].error)
+
+    def test_numbers(self):
+        results = run_many("Befunge", "67*.@", [b"", b"x"], workers=1)
+        self.assertEqual([r.output for r in results], [b"42 ", b"42 "])
+        self.assertEqual(results[0].steps, 4)
+
+    def test_prefix(self):
+        cls = BrainfuckInterpreter
+        prefix = run_prefix(cls, cls().compile(PROLOGUE))
+        self.assertEqual(prefix.output, b"A")
+        self.assertIsNone(prefix.result)
+
+        whole = cls(outfile=BytesIO())
+        whole.run(PROLOGUE.split(",")[0])
+        self.assertEqual(prefix.steps, whole.steps)
+
+        inputs = [b"\x01", b"\x02", b""]
+        for workers in 1, 2:
+            results = run_many("Brainfuck", PROLOGUE, inputs,
+                               workers=workers)
+            self.assertEqual([r.output for r in results],
+                             [b"AA", b"AB", b"A@"])
+
+    def test_prefix_same_results(self):
+        programs = [("Brainfuck", SUCC), ("Brainfuck", PROLOGUE),
+                    ("l33t", L33T_ECHO), ("ABCR", ABCR_HELLO),
+                    ("Befunge", "&1+.~,@")]
+        inputs = [b"", b"7x", b"12 y", b"\xff\xfe"]
+        for lang, source in programs:
+            shared = run_many(lang, source, inputs, workers=1)
+            single = run_many(lang, source, inputs, workers=1,
+                              share_prefix=False)
+            self.assertEqual([repr(r) for r in shared],
+                             [repr(r) for r in single])
+
+    def test_prefix_limits(self):
+        limits = Limits(max_steps=300, check_every=1)
+        inputs = [b"\0", b"\3"]
+        for share_prefix in True, False:
+            results = run_many("Brainfuck", PROLOGUE.split(",")[0] + ",[]",
+                               inputs,
+                               workers=1, limits=limits,
+                               share_prefix=share_prefix)
+            self.assertEqual(results[0].status, HALTED)
+            self.assertEqual(results[1].error,
+                             "ResourceExceeded: steps limit of 300 "
+                             "exceeded (300)")
+            self.assertEqual(results[1].output, b"A")
+
+    def test_no_input(self):
+        results = run_many("Befunge", "67*.@", [b"", b"x"], workers=2)
+        self.assertEqual([r.output for r in results], [b"42 ", b"42 "])
+        results[0].output = b""
+        self.assertEqual(results[1].output, b"42 ")
+
+    def test_compile_error(self):
+        self.assertRaises(ValueError, run_many, "Brainfuck", "[", [b""])
+        self.assertRaises(ValueError, run_many, "?", "", [b""])
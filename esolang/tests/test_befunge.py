@@ -12,7 +12,7 @@ from esolang.lang.befunge import BefungeInterpreter as Interpreter
 
 HELLO_WORLD = """64+"!dlroW ,olleH">:#,_@"""
 
-HELLO_WORLD_OUTPUT = "Hello World!\n"
+HELLO_WORLD_OUTPUT = "Hello, World!\n"
 
 
 class BefungeTests(TestCase):
@@ -0,0 +1,70 @@
+"""Unittests for the benchmark harness."""
+
+import json
+import os
+import tempfile
+
+from unittest import TestCase
+
+from esolang import bench
+from esolang.bench import Benchmark
+
+SMALL = Benchmark("small", "Brainfuck", "++++[>++++<-]>.")
+
+
+class BenchTests(TestCase):
+    def test_measure(self):
+        result = bench.measure(SMALL, repeat=3, warmup=1)
+        self.assertEqual(result["steps"], 39)
+        self.assertEqual(result["repeat"], 3)
+        self.assertGreater(result["steps_per_sec"], 0)
+        self.assertGreater(result["peak_memory"], 0)
+
+    def test_error(self):
+        result = bench.measure(Benchmark("broken", "Brainfuck", "["))
+        self.assertIn("ValueError", result["error"])
+
+    def test_corpus(self):
+        names = [b.name for b in bench.CORPUS + bench.examples()]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn("example-hello-monkeys", names)
+
+    def test_compare(self):
+        baseline = {"startup": 0.05, "results": {
+            "a": {"wall": 1.0, "peak_memory": 100},
+            "b": {"wall": 1.0, "peak_memory": 100},
+            "c": {"wall": 1.0, "peak_memory": 100}}}
+        current = {"startup": 0.05, "results": {
+            "a": {"wall": 1.05, "peak_memory": 100},
+            "b": {"wall": 1.5, "peak_memory": 200},
+            "c": {"error": "ValueError: ..."},
+            "d": {"wall": 9.0, "peak_memory": 100}}}
+
+        self.assertEqual(bench.compare(baseline, current, 0.1), [
+            ("b", "wall", 1.0, 1.5),
+            ("b", "peak_memory", 100, 200),
+            ("c", "error", None, "ValueError: ...")])
+        self.assertEqual(bench.compare(baseline, baseline, 0.1), [])
+
+    def test_main(self):
+        report = bench.run([SMALL], repeat=1, warmup=0)
+        self.assertIn("small", report["results"])
+        self.assertGreater(report["startup"], 0)
+
+        slower = json.loads(json.dumps(report))
+        slower["results"]["small"]["wall"] *= 2
+
+        paths = []
+        for data in report, slower:
+            fd, path = tempfile.mkstemp(suffix=".json")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            paths.append(path)
+
+        try:
+            self.assertEqual(bench.main(["--compare"] + paths), 1)
+            self.assertEqual(bench.main(["--compare", paths[0], paths[0]]),
+                             0)
+        finally:
+            for path in paths:
+                os.remove(path)
@@ -8,6 +8,7 @@ from unittest import TestCase
 
 from io import StringIO
 
+from esolang.interpreter import InputQueue, EXHAUSTED, WAITING
 from esolang.lang.brainfuck import BrainfuckInterpreter
 
 HELLO_WORLD = """
@@ -48,6 +49,9 @@ Clean up used cells.
 [[-]<]
 """
 
+# Copy the input to the output until a zero byte.
+ECHO = ">,[.,]<+."
+
 
 class BrainfuckTests(TestCase):
     def run_code(self, code, interpreter=None):
@@ -74,3 +78,34 @@ class BrainfuckTests(TestCase):
         interpreter = BrainfuckInterpreter(cellsize=None)
         result = "32 bit cells\n"
         self.assertEqual(result, self.run_code(CELLSIZE_TEST, interpreter))
+
+    def test_engines(self):
+        """Every engine behaves like the reference engine, also when
+        running in slices."""
+        programs = [HELLO_WORLD, HELLO_WORLD_2, CELLSIZE_TEST, ECHO]
+        for source in programs:
+            for cellsize in 8, None:
+                for max_steps in None, 7, 100:
+                    results = []
+                    for engine in "reference", "fast", "compiled", "auto":
+                        intp = BrainfuckInterpreter(
+                            cellsize, StringIO("ab\0c"), StringIO(), engine)
+                        status = intp.run(source, max_steps=max_steps)
+                        while status == EXHAUSTED:
+                            status = intp.run(max_steps=max_steps)
+                        results.append((status, intp.steps,
+                                        intp.outfile.getvalue(),
+                                        intp.snapshot()))
+                    self.assertEqual(results.count(results[0]), 4)
+
+    def test_compiled_waiting(self):
+        infile = InputQueue()
+        intp = BrainfuckInterpreter(infile=infile, outfile=StringIO(),
+                                    engine="compiled")
+        self.assertEqual(intp.run(ECHO), WAITING)
+        self.assertEqual(intp.steps, 1)
+        infile.feed("xy")
+        self.assertEqual(intp.run(), WAITING)
+        infile.feed("\0")
+        intp.run()
+        self.assertEqual(intp.outfile.getvalue(), "xy\x01")
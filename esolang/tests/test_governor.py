@@ -0,0 +1,72 @@
+"""Unittests for the resource governor."""
+
+import doctest
+
+from unittest import TestCase
+
+from io import StringIO
+
+from esolang import governor
+from esolang.governor import Limits, ResourceExceeded
+from esolang.interpreter import HALTED, WAITING, InputQueue
+from esolang.lang.befunge import BefungeInterpreter
+from esolang.lang.brainfuck import BrainfuckInterpreter
+from esolang.lang.past import Interpreter as PastInterpreter
+from esolang.tests.test_interpreter import PROGRAMS
+
+
+class GovernorTests(TestCase):
+    def assertExceeds(self, resource, intp, source, limits):
+        with self.assertRaises(ResourceExceeded) as cm:
+            governor.run(intp, source, limits)
+        self.assertEqual(cm.exception.resource, resource)
+        return cm.exception
+
+    def test_doctests(self):
+        failed, _ = doctest.testmod(governor)
+        self.assertEqual(failed, 0)
+
+    def test_within_limits(self):
+        limits = Limits(max_steps=10 ** 6, timeout=10, max_memory=100,
+                        max_output=100, check_every=7)
+        for cls, source in PROGRAMS:
+            plain = cls(outfile=StringIO())
+            plain.run(source)
+
+            governed = cls(outfile=StringIO())
+            self.assertEqual(governor.run(governed, source, limits), HALTED)
+            self.assertEqual(governed.steps, plain.steps)
+            self.assertEqual(governed.outfile.getvalue(),
+                             plain.outfile.getvalue())
+
+    def test_steps(self):
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        error = self.assertExceeds("steps", intp, "+[]",
+                                   Limits(max_steps=1000, check_every=300))
+        self.assertEqual(intp.steps, 1000)
+        self.assertEqual(error.value, 1000)
+
+    def test_time(self):
+        intp = PastInterpreter(infile=StringIO(), outfile=StringIO(), seed=0)
+        self.assertExceeds("time", intp, "A+1;",
+                           Limits(timeout=0.05, check_every=1000))
+
+    def test_memory(self):
+        intp = BefungeInterpreter(outfile=StringIO())
+        self.assertExceeds("memory", intp, "1",
+                           Limits(max_memory=500, check_every=100))
+        self.assertLessEqual(intp.memory_size, 600)
+
+    def test_output(self):
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        error = self.assertExceeds("output", intp, "+[.]",
+                                   Limits(max_output=10, check_every=100))
+        self.assertEqual(intp.outfile.getvalue(), "\x01" * 10)
+        self.assertEqual(error.output, "\x01" * 10)
+        self.assertIsInstance(error, RuntimeError)
+
+    def test_waiting(self):
+        intp = BrainfuckInterpreter(infile=InputQueue(), outfile=StringIO())
+        self.assertEqual(governor.run(intp, ",.", Limits(max_steps=10)),
+                         WAITING)
+        self.assertIsInstance(intp.outfile, StringIO)
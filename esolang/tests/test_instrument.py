@@ -0,0 +1,113 @@
+"""Unittests for the instrumentation of interpreters."""
+
+import doctest
+
+from unittest import TestCase
+
+from io import BytesIO, StringIO
+
+from esolang import instrument
+from esolang.interpreter import HALTED, EXHAUSTED
+from esolang.lang.abcr import ABCRInterpreter
+from esolang.lang.brainfuck import BrainfuckInterpreter
+from esolang.lang.past import Interpreter as PastInterpreter
+from esolang.tests.test_interpreter import PROGRAMS
+
+ABCR_HELLO = ")))))AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAaO"
+
+
+class InstrumentTests(TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(instrument)
+        self.assertEqual(failed, 0)
+
+    def test_same_behaviour(self):
+        """Instrumented runs behave exactly like uninstrumented ones."""
+        for cls, source in PROGRAMS + [(ABCRInterpreter, ABCR_HELLO)]:
+            plain = cls(outfile=StringIO())
+            self.assertEqual(plain.run(source), HALTED)
+
+            instrumented = cls(outfile=StringIO())
+            instrumentation = instrumented.instrument()
+            self.assertEqual(instrumented.run(source), HALTED)
+
+            self.assertEqual(instrumented.steps, plain.steps)
+            self.assertEqual(instrumentation.steps, plain.steps)
+            self.assertEqual(sum(instrumentation.counters.values()),
+                             plain.steps)
+            self.assertEqual(instrumented.outfile.getvalue(),
+                             plain.outfile.getvalue())
+            self.assertEqual(instrumentation.output_bytes,
+                             len(plain.outfile.getvalue()))
+
+            # The original files are back in place.
+            self.assertIs(instrumented.outfile.__class__, StringIO)
+
+    def test_binary_files(self):
+        """Binary files are read and written as bytes through the
+        proxies."""
+        outputs = []
+        for instrumented in False, True:
+            intp = BrainfuckInterpreter(infile=BytesIO(b"\xe1"),
+                                        outfile=BytesIO())
+            if instrumented:
+                instrumentation = intp.instrument()
+            self.assertEqual(intp.run(",." + "+" * 255 + "."), HALTED)
+            outputs.append(intp.outfile.getvalue())
+
+        self.assertEqual(outputs, [b"\xe1\xe0"] * 2)
+        self.assertEqual(instrumentation.input_bytes, 1)
+        self.assertEqual(instrumentation.output_bytes, 2)
+
+    def test_callbacks(self):
+        events = []
+        intp = BrainfuckInterpreter(infile=StringIO("ab"), outfile=StringIO())
+        instrumentation = intp.instrument(
+            on_step=lambda intp, op: events.append(op),
+            on_output=lambda intp, data: events.append(("out", data)),
+            on_input=lambda intp, data: events.append(("in", data)))
+        intp.run(",+.>,.")
+
+        self.assertEqual(events, [
+            ("in", "a"), ",", "+", ("out", "b"), ".", ">",
+            ("in", "b"), ",", ("out", "b"), "."])
+        self.assertEqual(instrumentation.input_bytes, 2)
+        self.assertEqual(instrumentation.memory_high, 2)
+        self.assertEqual(instrumentation.counters[","], 2)
+
+    def test_budget(self):
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        instrumentation = intp.instrument()
+        self.assertEqual(intp.run("+[]", max_steps=10), EXHAUSTED)
+        self.assertEqual(intp.run(max_steps=10), EXHAUSTED)
+        self.assertEqual(instrumentation.steps, 20)
+        self.assertEqual(instrumentation.counters["]"], 18)
+
+    def test_detach(self):
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        instrumentation = intp.instrument()
+        intp.run("+", max_steps=1)
+        intp.instrumentation = None
+        intp.run("++")
+        self.assertEqual(instrumentation.steps, 1)
+        self.assertEqual(intp.steps, 3)
+
+    def test_past(self):
+        intp = PastInterpreter(infile=StringIO(), outfile=StringIO(), seed=0)
+        instrumentation = intp.instrument()
+        intp.run("O=0, O+34; A+1;", max_steps=1000)
+        self.assertEqual(instrumentation.steps, 1000)
+        self.assertEqual(set(instrumentation.counters), {0, 1})
+        self.assertEqual(instrumentation.output_bytes,
+                         len(intp.outfile.getvalue()))
+        self.assertGreater(instrumentation.output_bytes, 0)
+
+    def test_report(self):
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        instrumentation = intp.instrument()
+        intp.run("+++.")
+        report = instrumentation.report()
+        self.assertIn("steps: 4", report)
+        self.assertIn("75.00%", report)
+        self.assertEqual(instrumentation.summary()["opcodes"],
+                         {"+": 3, ".": 1})
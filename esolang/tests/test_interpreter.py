@@ -0,0 +1,114 @@
+"""Unittests for the execution protocol shared by all interpreters."""
+
+import doctest
+
+from unittest import TestCase
+
+from io import StringIO
+
+from esolang import interpreter
+from esolang.interpreter import (
+    InputQueue, HALTED, EXHAUSTED, WAITING)
+from esolang.lang.befunge import BefungeInterpreter
+from esolang.lang.brainfuck import BrainfuckInterpreter
+from esolang.lang.l33t import L33tInterpreter
+from esolang.lang.monkeys import MonkeysInterpreter
+from esolang.lang.past import Interpreter as PastInterpreter
+
+from esolang.tests.test_befunge import HELLO_WORLD as BEFUNGE_HELLO
+from esolang.tests.test_brainfuck import HELLO_WORLD as BRAINFUCK_HELLO
+from esolang.tests.test_monkeys import NEWLINE
+
+PROGRAMS = [
+    (BrainfuckInterpreter, BRAINFUCK_HELLO),
+    (BefungeInterpreter, BEFUNGE_HELLO),
+    (MonkeysInterpreter, NEWLINE),
+]
+
+
+class ProtocolTests(TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(interpreter)
+        self.assertEqual(failed, 0)
+
+    def test_slices(self):
+        """Running in slices gives the same result as a single run."""
+        for cls, source in PROGRAMS:
+            whole = cls(outfile=StringIO())
+            self.assertEqual(whole.run(source), HALTED)
+
+            sliced = cls(outfile=StringIO())
+            status = sliced.run(source, max_steps=7)
+            while status == EXHAUSTED:
+                status = sliced.run(max_steps=7)
+
+            self.assertEqual(status, HALTED)
+            self.assertEqual(sliced.steps, whole.steps)
+            self.assertEqual(sliced.outfile.getvalue(),
+                             whole.outfile.getvalue())
+
+            # Running a halted program does nothing.
+            self.assertEqual(sliced.run(max_steps=7), HALTED)
+            self.assertEqual(sliced.steps, whole.steps)
+
+    def test_exhausted(self):
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        self.assertEqual(intp.run("+[]", max_steps=100), EXHAUSTED)
+        self.assertEqual(intp.steps, 100)
+        self.assertEqual(intp.run(max_steps=0), EXHAUSTED)
+        self.assertEqual(intp.steps, 100)
+
+    def test_waiting(self):
+        infile = InputQueue()
+        intp = BrainfuckInterpreter(infile=infile, outfile=StringIO())
+        self.assertEqual(intp.run(",.,."), WAITING)
+        self.assertEqual(intp.steps, 0)
+
+        infile.feed("a")
+        self.assertEqual(intp.run(), WAITING)
+        self.assertEqual(intp.outfile.getvalue(), "a")
+
+        infile.feed("b")
+        infile.close()
+        self.assertEqual(intp.run(), HALTED)
+        self.assertEqual(intp.outfile.getvalue(), "ab")
+        self.assertEqual(intp.steps, 4)
+
+    def test_l33t_end(self):
+        intp = L33tInterpreter(outfile=StringIO())
+        # NOP, END
+        self.assertEqual(intp.run("0 1111111111"), HALTED)
+        self.assertEqual(intp.run(), HALTED)
+        self.assertEqual(intp.steps, 1)
+
+    def test_past(self):
+        intp = PastInterpreter(
+            infile=StringIO(), outfile=StringIO(), seed=0)
+        self.assertEqual(intp.run("O=0, O+34;", max_steps=100), EXHAUSTED)
+        self.assertEqual(intp.steps, 100)
+        self.assertEqual(intp.run(max_steps=50), EXHAUSTED)
+        self.assertEqual(intp.steps, 150)
+        self.assertTrue(intp.outfile.getvalue().endswith("!"))
+
+    def test_engines(self):
+        self.assertRaises(ValueError, BrainfuckInterpreter, engine="jit")
+
+        # Interpreters without faster tiers use the reference engine.
+        intp = BefungeInterpreter(outfile=StringIO(), engine="compiled")
+        self.assertEqual(intp.tier("compiled"), intp.execute_reference)
+        self.assertEqual(intp.run(BEFUNGE_HELLO), HALTED)
+
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        self.assertEqual(intp.tier("fast"), intp.execute_fast)
+
+    def test_promotion(self):
+        """The auto engine compiles long running programs only."""
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        intp.run(BRAINFUCK_HELLO)
+        self.assertEqual(intp.blocks, {})
+
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        steps = interpreter.PROMOTE_STEPS + 10
+        self.assertEqual(intp.run("+[+-]", max_steps=steps), EXHAUSTED)
+        self.assertEqual(intp.steps, steps)
+        self.assertNotEqual(intp.blocks, {})
@@ -0,0 +1,109 @@
+"""Unittests for the shared IR and VM."""
+
+import doctest
+
+from random import Random
+from unittest import TestCase
+
+from io import StringIO
+
+from esolang import ir
+from esolang.interpreter import InputQueue, EXHAUSTED, WAITING
+from esolang.lang.abcr import ABCRInterpreter
+from esolang.lang.brainfuck import BrainfuckInterpreter
+from esolang.tests.test_instrument import ABCR_HELLO
+
+
+def random_brainfuck(random, length):
+    code = []
+    depth = 0
+    for _ in range(length):
+        char = random.choice("+++---<>>..,[]x")
+        if char == "]":
+            if not depth:
+                continue
+            depth -= 1
+        elif char == "[":
+            depth += 1
+        code.append(char)
+    return "".join(code) + "]" * depth
+
+
+def random_abcr(random, length):
+    return "".join(random.choice("aAbBcC123!@#*+,-./oOpPqQ4567x()i ")
+                   for _ in range(length))
+
+
+def run(intp, source, max_steps):
+    """Run source in slices and return the result and the state."""
+    try:
+        status = intp.run(source, max_steps=max_steps)
+        for _ in range(20):
+            if status != EXHAUSTED:
+                break
+            status = intp.run(max_steps=max_steps)
+    except Exception as e:
+        status = type(e).__name__
+    return status, intp.steps, intp.outfile.getvalue(), intp.snapshot()
+
+
+class IRTests(TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(ir)
+        self.assertEqual(failed, 0)
+
+    def test_same_as_reference(self):
+        """The VM behaves like step() for random programs."""
+        random = Random(0)
+        cases = [(BrainfuckInterpreter, random_brainfuck),
+                 (ABCRInterpreter, random_abcr)]
+        for cls, generate in cases:
+            for _ in range(200):
+                source = generate(random, random.randrange(1, 40))
+                data = "".join(random.choice("12 -x")
+                               for _ in range(random.randrange(4)))
+                max_steps = random.choice([1, 3, 50])
+
+                results = []
+                for engine in "reference", "fast":
+                    intp = cls(infile=StringIO(data), outfile=StringIO(),
+                               engine=engine)
+                    results.append(run(intp, source, max_steps))
+                self.assertEqual(results[0], results[1], source)
+
+    def test_blocks(self):
+        intp = BrainfuckInterpreter(engine="fast")
+        intp.load("+++>[-]<.,[>+<-]")
+        code = intp.program.code
+        self.assertEqual([i.op for i in code], [
+            ir.ADD, ir.MOVE, ir.CLEAR, ir.OUT, ir.MOVE, ir.IN, ir.JZ,
+            ir.ADD, ir.ADD, ir.JNZ, ir.HALT])
+        self.assertEqual([i.cost for i in code if i.cost],
+                         [4, 1, 2, 2, 5, 1])
+        self.assertNotIn(3, intp.program.entries)
+
+    def test_clear_budget(self):
+        """A CLEAR, that doesn't fit into the budget, is stepped."""
+        intp = BrainfuckInterpreter(outfile=StringIO(), engine="fast")
+        self.assertEqual(intp.run("+++++[-].", max_steps=8), EXHAUSTED)
+        self.assertEqual((intp.steps, intp.pc, intp.memory[0]), (8, 6, 4))
+        intp.run()
+        self.assertEqual(intp.steps, 17)
+
+    def test_waiting(self):
+        infile = InputQueue()
+        intp = ABCRInterpreter(infile=infile, outfile=StringIO(),
+                               engine="fast")
+        self.assertEqual(intp.run(")))AcQ"), WAITING)
+        self.assertEqual((intp.steps, intp.pc), (4, 4))
+        infile.feed("x")
+        infile.close()
+        intp.run()
+        self.assertEqual(intp.outfile.getvalue(), "x")
+
+    def test_abcr(self):
+        intp = ABCRInterpreter(outfile=StringIO(), engine="fast")
+        intp.load(ABCR_HELLO)
+        self.assertEqual(intp.program.code[0][:4], (ir.RADD, 5, 0, 61))
+        intp.run()
+        self.assertEqual(intp.outfile.getvalue(), "\x05")
@@ -0,0 +1,73 @@
+"""Unittests for the registry of languages."""
+
+import os
+import subprocess
+import sys
+
+from unittest import TestCase
+
+import esolang
+
+from esolang import Language, LANGUAGES
+from esolang.__main__ import select_interpreter
+from esolang.tests.test_main import ROOT
+
+
+class FYIInterpreter(object):
+    """The example interpreter from the README."""
+
+    lang = "FYI"
+    ext = ".fyi"
+
+    def run(self, source):
+        pass
+
+
+FYI = Language("FYI", ".fyi", __name__, "FYIInterpreter")
+
+# Another interpreter for Brainfuck files.
+OTHER_BRAINFUCK = Language("Other Brainfuck", ".b", __name__, "FYIInterpreter")
+
+
+class LanguageTests(TestCase):
+    def setUp(self):
+        self.plugins = esolang._plugins
+        esolang._plugins = [FYI, OTHER_BRAINFUCK]
+
+    def tearDown(self):
+        esolang._plugins = self.plugins
+
+    def test_descriptors(self):
+        for language in LANGUAGES:
+            cls = language.load()
+            self.assertEqual(cls.lang, language.lang)
+            self.assertEqual(cls.ext, language.ext)
+            self.assertIn(cls, esolang.INTERPRETERS)
+
+    def test_plugins(self):
+        self.assertIs(select_interpreter("hello.fyi"), FYIInterpreter)
+        self.assertIs(select_interpreter("hello", "FYI"), FYIInterpreter)
+        self.assertIn(FYI, esolang.languages())
+
+    def test_bundled_first(self):
+        cls = select_interpreter("hello.b")
+        self.assertEqual(cls.lang, "Brainfuck")
+        self.assertIs(select_interpreter("hello.b", "Other Brainfuck"),
+                      FYIInterpreter)
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, select_interpreter, "hello.unknown")
+        self.assertRaises(ValueError, select_interpreter, "hello.b", "?")
+
+    def test_lazy_import(self):
+        """Only the selected interpreter module is imported."""
+        code = (
+            "import sys\n"
+            "from esolang.__main__ import select_interpreter\n"
+            "select_interpreter('hello.b')\n"
+            "print(' '.join(sorted(m for m in sys.modules\n"
+            "                      if m.startswith('esolang.lang.'))))\n")
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        output = subprocess.check_output(
+            [sys.executable, "-c", code], env=env).decode()
+        self.assertEqual(output.split(), ["esolang.lang.brainfuck"])
@@ -0,0 +1,191 @@
+"""Unittests for the command line interface."""
+
+import json
+import os
+import pstats
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from unittest import TestCase
+
+from io import StringIO
+
+from esolang.__main__ import run_file
+from esolang.cache import LRUCache, DiskCache
+from esolang.lang.brainfuck import BrainfuckInterpreter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+PROGRAMS = {
+    "a.b": "++++++++[>++++++++<-]>+.",
+    "cat.b": ",.,.",
+    "unbalanced.b": "+[",
+    "hello.mky": "7 RIGHT\n7 LEFT\n7 YELL\n",
+    "loop.b": "+[]",
+}
+
+
+class MainTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name, source in PROGRAMS.items():
+            with open(self.path(name), "w") as f:
+                f.write(source)
+
+    def tearDown(self):
+        for name in os.listdir(self.tmpdir):
+            os.remove(self.path(name))
+        os.rmdir(self.tmpdir)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def esolang(self, *args, **kwargs):
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "esolang"] + list(args), env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+        out, err = proc.communicate(kwargs.get("stdin", b""))
+        return proc.returncode, out.decode(), err.decode()
+
+    def test_run_file(self):
+        outfile = StringIO()
+        errfile = StringIO()
+        self.assertEqual(run_file(BrainfuckInterpreter, self.path("a.b"),
+                                  outfile=outfile, errfile=errfile), 0)
+        self.assertEqual(outfile.getvalue(), "A")
+
+        self.assertEqual(run_file(BrainfuckInterpreter,
+                                  self.path("unbalanced.b"),
+                                  outfile=outfile, errfile=errfile), 3)
+        self.assertIn("doesn't close", errfile.getvalue())
+
+        self.assertEqual(run_file(BrainfuckInterpreter, self.path("missing"),
+                                  outfile=outfile, errfile=errfile), 2)
+
+    def test_jobs(self):
+        names = ["a.b", "unbalanced.b", "cat.b", "hello.mky", "a.b"]
+        code, out, err = self.esolang(
+            "--jobs", "3", *map(self.path, names), stdin=b"xy")
+        self.assertEqual(code, 3)
+        self.assertEqual(out, "Axy\x02A")
+        self.assertIn("doesn't close", err)
+
+    def test_sequential_stops_at_error(self):
+        names = ["a.b", "unbalanced.b", "a.b"]
+        code, out, err = self.esolang(*map(self.path, names))
+        self.assertEqual(code, 3)
+        self.assertEqual(out, "A")
+
+    def test_engine(self):
+        for engine in "reference", "fast", "compiled", "auto":
+            code, out, err = self.esolang(
+                "--engine", engine, self.path("a.b"))
+            self.assertEqual((code, out, err), (0, "A", ""))
+
+    def test_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for _ in range(2):
+            outfile = StringIO()
+            cache = LRUCache(disk=DiskCache(directory))
+            self.assertEqual(run_file(BrainfuckInterpreter, self.path("a.b"),
+                                      outfile=outfile, cache=cache), 0)
+            self.assertEqual(outfile.getvalue(), "A")
+        self.assertEqual(cache.disk.hits, 1)
+
+        errfile = StringIO()
+        self.assertEqual(run_file(BrainfuckInterpreter,
+                                  self.path("unbalanced.b"), errfile=errfile,
+                                  cache=cache), 3)
+
+        env = dict(os.environ, PYTHONPATH=ROOT, ESOLANG_CACHE_DIR=directory)
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "esolang", "--cache", self.path("a.b")],
+            env=env, stdout=subprocess.PIPE)
+        self.assertEqual(proc.communicate()[0], b"A")
+
+    def test_stats(self):
+        stats = StringIO()
+        self.assertEqual(run_file(BrainfuckInterpreter, self.path("cat.b"),
+                                  infile=StringIO("xy"), outfile=StringIO(),
+                                  stats=stats), 0)
+        self.assertEqual(run_file(BrainfuckInterpreter,
+                                  self.path("unbalanced.b"),
+                                  errfile=StringIO(), stats=stats), 3)
+        first, second = [json.loads(line)
+                         for line in stats.getvalue().splitlines()]
+        self.assertEqual(first["lang"], "Brainfuck")
+        self.assertEqual(first["status"], "halted")
+        self.assertEqual(first["steps"], 4)
+        self.assertEqual((first["input_bytes"], first["output_bytes"]),
+                         (2, 2))
+        self.assertGreater(first["seconds"], 0)
+        self.assertEqual((second["exit"], second["status"]), (3, None))
+
+        path = self.path("stats.jsonl")
+        for args in ["--stats=" + path], ["--stats=" + path, "-j", "2"]:
+            code, out, err = self.esolang(
+                *args + [self.path("a.b"), self.path("cat.b")], stdin=b"z")
+            self.assertEqual((code, out, err), (0, "Azz", ""))
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line["filename"] for line in lines],
+                         [self.path("a.b"), self.path("cat.b")] * 2)
+
+        code, out, err = self.esolang("--stats", self.path("a.b"))
+        self.assertEqual((code, out), (0, "A"))
+        self.assertEqual(json.loads(err)["output_bytes"], 1)
+
+    def test_profile(self):
+        path = self.path("run.pstats")
+        code, out, err = self.esolang("--profile", path, self.path("a.b"))
+        self.assertEqual((code, out), (0, "A"))
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_binary_output(self):
+        """High bytes are written unchanged by every way of running."""
+        with open(self.path("high.b"), "w") as f:
+            f.write("+" * 225 + ".")
+        env = dict(os.environ, PYTHONPATH=ROOT)
+
+        def output(*args):
+            return subprocess.check_output(
+                [sys.executable, "-m", "esolang"] + list(args), env=env,
+                stdin=subprocess.DEVNULL)
+
+        high = self.path("high.b")
+        self.assertEqual(output(high), b"\xe1")
+        self.assertEqual(output("--instrument", high), b"\xe1")
+        self.assertEqual(output("--trace", self.path("run.trace"), high),
+                         b"\xe1")
+        self.assertEqual(output("-j", "2", high, high), b"\xe1\xe1")
+
+    def test_trace(self):
+        path = self.path("run.trace")
+        code, out, err = self.esolang("--trace", path, self.path("a.b"))
+        self.assertEqual((code, out), (0, "A"))
+
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        summary = subprocess.check_output(
+            [sys.executable, "-m", "esolang.trace", path], env=env)
+        self.assertIn(b"lang: Brainfuck", summary)
+        replay = subprocess.check_output(
+            [sys.executable, "-m", "esolang.trace", "--replay", path],
+            env=env)
+        self.assertEqual(replay, b"A")
+
+    def test_limits(self):
+        code, out, err = self.esolang(
+            "--max-steps", "100000", self.path("loop.b"))
+        self.assertEqual(code, 5)
+        self.assertIn("steps limit of 100000 exceeded", err)
+
+        code, out, err = self.esolang(
+            "--max-steps", "100000", "--jobs", "2", self.path("a.b"),
+            self.path("loop.b"))
+        self.assertEqual((code, out), (5, "A"))
@@ -0,0 +1,78 @@
+"""Unittests for the Monkeys interpreter."""
+
+from unittest import TestCase
+
+from io import StringIO
+
+from esolang.lang.monkeys import MonkeysInterpreter
+
+# Monkey 7 counts up to 10 and yells it.
+NEWLINE = "\n".join(["7 RIGHT", "7 LEFT"] * 5 + ["7 YELL"])
+
+# Monkey 1 walks left and right forever, which changes its value
+# on every step, but nothing else.
+WALK_FOREVER = """
+1 MARK
+1 RIGHT
+1 LEFT
+1 BACK
+"""
+
+# Monkey 1 walks into the left wall and stays there.
+WALK_INTO_WALL = """
+1 MARK
+1 LEFT
+1 BACK
+"""
+
+# Monkey 1 eats all bananas on its way to the left wall,
+# but there are more bananas elsewhere.
+EAT_AND_WALK = """
+1 MARK
+1 LEFT
+1 GRAB
+1 EAT
+1 BACK
+"""
+
+
+class MonkeysTests(TestCase):
+    def run_code(self, code, interpreter=None):
+        """Run the Monkeys code and return the standard output as string."""
+        outfile = StringIO()
+        if interpreter is None:
+            interpreter = MonkeysInterpreter(outfile=outfile)
+        else:
+            interpreter.outfile = outfile
+        interpreter.run(code)
+        return outfile.getvalue()
+
+    def test_yell(self):
+        self.assertEqual("\n", self.run_code(NEWLINE))
+
+    def test_detect_cycles_keeps_output(self):
+        intp = MonkeysInterpreter(detect_cycles=True)
+        self.assertEqual("\n", self.run_code(NEWLINE, intp))
+
+    def test_detect_infinite_loops(self):
+        for code in WALK_FOREVER, WALK_INTO_WALL, EAT_AND_WALK:
+            intp = MonkeysInterpreter(detect_cycles=True)
+            self.assertRaises(RuntimeError, self.run_code, code, intp)
+
+    def test_infinite_loop_values(self):
+        intp = MonkeysInterpreter(detect_cycles=True)
+        try:
+            self.run_code(WALK_INTO_WALL, intp)
+        except RuntimeError as e:
+            self.assertIn("1: -", str(e))
+        else:
+            self.fail("RuntimeError not raised")
+
+    def test_detect_cycles_eaten_banana(self):
+        """A monkey may hold a banana, that another one has eaten."""
+        intp = MonkeysInterpreter(detect_cycles=True)
+        intp.load(WALK_FOREVER)
+        banana = intp.bananas[0]
+        intp.monkeys[0].banana = intp.monkeys[1].banana = banana
+        intp.bananas.remove(banana)
+        self.assertRaises(RuntimeError, intp.run)
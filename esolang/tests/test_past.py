@@ -0,0 +1,396 @@
+"""Unittests for the My Unreliable Past interpreter."""
+
+import doctest
+import os
+import threading
+import time
+
+from random import choice, randrange
+
+from unittest import TestCase, skipIf
+
+from io import StringIO
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from esolang.lang import past
+from esolang.lang.past import (
+    REGISTERS, Interpreter, compile_transactions, reactor)
+
+# Output "!" with high probability.
+BANG = "A-0, A=0, A+2; A-1, A=0, A+2; A-2, A=0, O=0, O+34, A+3;"
+
+# Output the input forever (like examples/past/cat.past).
+CAT = "".join("O=0, I-%d, I=0, O+%d;" % (i, i) for i in range(1, 128))
+
+
+class ReactorTests(TestCase):
+    def test_read_stringio(self):
+        intp = Interpreter(infile=StringIO("abc"), outfile=StringIO())
+        reactor.register(intp)
+        reactor.unregister(intp)
+
+        self.assertTrue(intp.input_eof)
+        self.assertEqual([intp.input_q.get() for _ in range(3)],
+                         ["a", "b", "c"])
+        self.assertTrue(intp.input_q.empty())
+        self.assertIsNone(reactor.thread)
+
+    def test_read_pipe(self):
+        fd_r, fd_w = os.pipe()
+        with os.fdopen(fd_r, "r") as infile:
+            intp = Interpreter(infile=infile, outfile=StringIO())
+            reactor.register(intp)
+            os.write(fd_w, "hé".encode("utf-8"))
+            os.close(fd_w)
+
+            deadline = time.time() + 5
+            while not intp.input_eof and time.time() < deadline:
+                time.sleep(0.01)
+            reactor.unregister(intp)
+
+        self.assertTrue(intp.input_eof)
+        self.assertEqual([intp.input_q.get() for _ in range(2)],
+                         ["h", "é"])
+
+    def test_write_on_unregister(self):
+        outfile = StringIO()
+        intp = Interpreter(infile=StringIO(), outfile=outfile)
+        reactor.register(intp)
+        intp.output_q.put("x")
+        reactor.write(intp)
+        reactor.unregister(intp)
+        self.assertEqual(outfile.getvalue(), "x")
+
+    def test_shared_thread(self):
+        intps = [Interpreter(infile=StringIO(), outfile=StringIO())
+                 for _ in range(3)]
+        for intp in intps:
+            reactor.register(intp)
+        thread = reactor.thread
+        self.assertTrue(thread.is_alive())
+
+        for intp in intps:
+            self.assertIs(reactor.thread, thread)
+            reactor.unregister(intp)
+
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(reactor.thread)
+
+    def test_dead_reactor(self):
+        class BrokenFile(StringIO):
+            def fileno(self):
+                raise RuntimeError("broken")
+
+        excepthook = threading.excepthook
+        threading.excepthook = lambda args: None
+        try:
+            outfile = StringIO()
+            intp = Interpreter(infile=BrokenFile(), outfile=outfile)
+            reactor.register(intp)
+            intp.output_q.put("x")
+            reactor.unregister(intp)
+        finally:
+            threading.excepthook = excepthook
+
+        self.assertEqual(outfile.getvalue(), "x")
+        self.assertIsNone(reactor.thread)
+        self.test_shared_thread()
+
+
+def execute(commands, registers):
+    """Execute a transaction the way the specification describes it.
+
+    Returns the resulting registers and whether the transaction succeeded.
+    """
+    backup = dict(registers)
+
+    for name, op, value in commands:
+        if op == "+":
+            registers[name] += value
+        elif op == "-":
+            registers[name] -= value
+            if registers[name] < 0:
+                return backup, False
+        elif op == "=":
+            if registers[name] != value:
+                return backup, False
+
+    return registers, True
+
+
+class TransactionTests(TestCase):
+    def test_compiled_transactions(self):
+        names = "AOI"
+        for _ in range(2000):
+            transaction = [
+                (choice(names), choice("+-="), randrange(0, 4))
+                for _ in range(randrange(1, 6))]
+            registers = dict((n, randrange(0, 4)) for n in REGISTERS)
+
+            regs = [registers[n] for n in REGISTERS]
+            func = compile_transactions([transaction])[0]
+            result = func(regs)
+
+            expected, success = execute(transaction, dict(registers))
+            self.assertEqual(dict(zip(REGISTERS, regs)), expected)
+            self.assertEqual(result, success)
+
+    def test_load(self):
+        intp = Interpreter()
+        intp.load("(comment) A-1, A=0, B+2; C=1,C+1; A-0;")
+        self.assertEqual(len(intp.compiled), 3)
+        intp.regs[REGISTERS.index("A")] = 1
+
+        self.assertTrue(intp.compiled[0](intp.regs))
+        self.assertEqual(intp.registers["B"], 2)
+        self.assertFalse(intp.compiled[1](intp.regs))
+        self.assertTrue(intp.compiled[2](intp.regs))
+
+    def test_registers(self):
+        intp = Interpreter()
+        intp.load("A=5, B+1;")
+        intp.dead[0] = 1
+        intp.registers["A"] = 5
+        self.assertEqual(intp.regs[REGISTERS.index("A")], 5)
+        self.assertEqual(intp.dead[0], 0)
+
+        intp.registers = {"B": 3}
+        self.assertEqual(intp.registers["B"], 3)
+        self.assertEqual(len(dict(intp.registers)), 24)
+
+        self.assertRaises(KeyError, intp.registers.__setitem__, "J", 1)
+        self.assertRaises(TypeError, intp.registers.__delitem__, "A")
+
+
+class RandomnessTests(TestCase):
+    def test_geometric(self):
+        intp = Interpreter(seed=1)
+        for chance in 0.125, 0.5:
+            draws = [intp.geometric(chance) for _ in range(20000)]
+            self.assertEqual(min(draws), 1)
+
+            # P(result == 1) = chance, E(result) = 1 / chance
+            ones = draws.count(1) / float(len(draws))
+            mean = sum(draws) / float(len(draws))
+            self.assertAlmostEqual(ones, chance, delta=0.02)
+            self.assertAlmostEqual(mean * chance, 1, delta=0.05)
+
+        self.assertEqual(intp.geometric(1), 1)
+        self.assertEqual(intp.geometric(0), float("inf"))
+
+    def test_seed(self):
+        results = []
+        for _ in range(2):
+            outfile = StringIO()
+            intp = Interpreter(
+                infile=StringIO(), outfile=outfile, seed=42)
+            intp.load(BANG)
+            intp.setup_registers()
+            intp.reset_countdowns()
+            for _ in range(2000):
+                intp.step()
+            results.append((intp.regs, outfile.getvalue()))
+
+        self.assertEqual(results[0], results[1])
+
+
+def naive_align(source):
+    """Return the rotation starting at the first '(', after which
+    the count of open comments never drops below zero."""
+    for start in [idx for idx, char in enumerate(source) if char == "("]:
+        rotated = source[start:] + source[:start]
+        depth = 0
+        for char in rotated:
+            depth += {"(": 1, ")": -1}.get(char, 0)
+            if depth < 0:
+                break
+        else:
+            return rotated
+
+
+class SourceTests(TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(past)
+        self.assertEqual(failed, 0)
+
+    def test_align(self):
+        for _ in range(2000):
+            source = "".join(
+                choice("(()) O=1;") for _ in range(randrange(1, 16)))
+            if source.count("(") != source.count(")") or "(" not in source:
+                continue
+            self.assertEqual(past.align(source), naive_align(source))
+
+    def test_large_source(self):
+        source = "".join(
+            "(comment (%d)) A-%d, A=0, A+%d;\n" % (i, i, i + 1)
+            for i in range(20000))
+        source = source[-10:] + source[:-10]
+
+        intp = Interpreter()
+        intp.load(source)
+        self.assertEqual(len(intp.transactions), 20000)
+        self.assertEqual(intp.transactions[5],
+                         [("A", "-", 5), ("A", "=", 0), ("A", "+", 6)])
+
+
+@skipIf(numpy is None, "NumPy is not installed")
+class EnsembleTests(TestCase):
+    def test_outputs(self):
+        ensemble = past.Ensemble("O=0, O+34;", size=200, seed=3)
+        outputs = ensemble.run(steps=300, max_output=2)
+        self.assertEqual(len(outputs), 200)
+
+        # The first character depends on the random initial value of O.
+        self.assertTrue(all(len(o) == 2 and o[1] == "!" for o in outputs))
+        self.assertIn("!!", outputs)
+
+    def test_seed(self):
+        histograms = [
+            past.Ensemble(BANG, size=50, seed=7).histogram(steps=100)
+            for _ in range(2)]
+        self.assertEqual(histograms[0], histograms[1])
+
+    def test_input(self):
+        ensemble = past.Ensemble(CAT, size=100, input="ab", seed=5)
+        histogram = ensemble.histogram(steps=5000, max_output=6)
+        self.assertGreater(
+            sum(n for o, n in histogram.items() if "abab" in o), 90)
+
+
+# A counter in Z, that makes the registers repeat every 3 passes.
+COUNTER = "Z-0, Z=0, Z+3; Z-1;"
+
+# Output "Hi" once, then do nothing forever.
+HI = "X-0, X=0, O=0, O+73, X+1; X-1, X=0, O=0, O+106, X+2;"
+
+
+class SkipTests(TestCase):
+    def make_interpreter(self, source, seed):
+        intp = Interpreter(infile=StringIO(), outfile=StringIO(), seed=seed)
+        intp.load(source)
+        intp.setup_registers()
+        intp.reset_countdowns()
+        for char in "hi":
+            intp.input_q.put(char)
+        intp.input_eof = True
+        return intp
+
+    def test_skip(self):
+        """Skipping dead transactions doesn't change the behaviour."""
+        for source in BANG, CAT, BANG + CAT:
+            for seed in range(5):
+                stepped = self.make_interpreter(source, seed)
+                for _ in range(5000):
+                    stepped.step()
+
+                skipped = self.make_interpreter(source, seed)
+                steps = 0
+                while steps < 5000:
+                    if skipped.dead[skipped.tc]:
+                        steps += skipped.skip(5000 - steps)
+                    if steps < 5000:
+                        skipped.step()
+                        steps += 1
+
+                for attr in ("regs", "tc", "output_countdown",
+                             "input_countdown", "input"):
+                    self.assertEqual(getattr(stepped, attr),
+                                     getattr(skipped, attr))
+                self.assertEqual(stepped.outfile.getvalue(),
+                                 skipped.outfile.getvalue())
+
+    def test_dead(self):
+        # align() starts the program after the first ";".
+        intp = self.make_interpreter("A+1; A=1, B+1; A-1;", 0)
+        intp.regs[:] = [0] * len(REGISTERS)
+        intp.tc = 0
+        intp.step()
+        intp.step()
+        self.assertEqual(list(intp.dead), [1, 1, 0])
+        intp.step()
+        self.assertEqual(list(intp.dead), [0, 0, 0])
+
+
+class CycleTests(TestCase):
+    def make_interpreter(self, source, seed, infile=None):
+        intp = Interpreter(infile=infile or StringIO(), outfile=StringIO(),
+                           seed=seed, detect_cycles=True)
+        intp.load(source)
+        intp.setup_registers()
+        intp.reset_countdowns()
+        intp.regs[:] = [0] * len(REGISTERS)
+        intp.tc = 0
+        return intp
+
+    def execute(self, intp, chars, timeout=5):
+        """Run the loop of Interpreter.execute() until enough output."""
+        count = len(intp.transactions)
+        deadline = time.time() + timeout
+        while len(intp.outfile.getvalue()) < chars:
+            self.assertLess(time.time(), deadline)
+            if not intp.tc:
+                intp.check_cycle()
+            if intp.dead[intp.tc] and intp.skip(count - intp.tc):
+                continue
+            intp.step()
+        return intp.outfile.getvalue()
+
+    def test_fast_forward(self):
+        """Fast-forwarding doesn't change the behaviour."""
+        for source in CAT, CAT + COUNTER, COUNTER + CAT:
+            for seed in range(3):
+                stepped = self.make_interpreter(source, seed)
+                stepped.input[:] = "hi"
+                stepped.input_eof = True
+                for _ in range(10 ** 6):
+                    if len(stepped.outfile.getvalue()) >= 6:
+                        break
+                    stepped.step()
+                else:
+                    self.fail("No output after 10 ** 6 steps")
+
+                detected = self.make_interpreter(source, seed)
+                detected.input[:] = "hi"
+                detected.input_eof = True
+                self.assertEqual(self.execute(detected, 6),
+                                 stepped.outfile.getvalue())
+                for attr in ("regs", "tc", "output_countdown",
+                             "input_countdown", "input_idx"):
+                    self.assertEqual(getattr(stepped, attr),
+                                     getattr(detected, attr))
+
+    def test_stuck(self):
+        intp = self.make_interpreter(HI + COUNTER, 0)
+        intp.regs[REGISTERS.index("I")] = 1
+        with self.assertRaises(RuntimeError) as cm:
+            self.execute(intp, 3)
+        self.assertIn("stuck", str(cm.exception))
+        self.assertEqual(intp.outfile.getvalue(), "Hi")
+
+    def test_stuck_at_eof(self):
+        intp = self.make_interpreter(CAT, 0)
+        intp.input_eof = True
+        self.assertRaises(RuntimeError, self.execute, intp, 1)
+
+    def test_run(self):
+        intp = Interpreter(infile=StringIO(), outfile=StringIO(), seed=1,
+                           detect_cycles=True)
+        self.assertRaises(RuntimeError, intp.run, HI)
+
+    def test_wait_for_input(self):
+        intp = self.make_interpreter(CAT, 0)
+
+        def feed():
+            intp.input_q.put("x")
+            intp.input_ready.set()
+
+        timer = threading.Timer(0.2, feed)
+        timer.start()
+        self.assertEqual(self.execute(intp, 1), "x")
+        timer.join()
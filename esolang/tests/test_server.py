@@ -0,0 +1,166 @@
+"""Unittests for the local server."""
+
+import doctest
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from unittest import TestCase
+
+from io import StringIO
+
+from esolang import cache, server
+from esolang.cache import DiskCache, LRUCache, source_key
+from esolang.lang.monkeys import MonkeysInterpreter
+from esolang.server import Worker
+from esolang.tests.test_main import ROOT
+
+HELLO = "++++++++[>++++++++<-]>+."
+
+
+class WorkerTests(TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(cache)
+        self.assertEqual(failed, 0)
+
+    def test_execute(self):
+        worker = Worker(slice_steps=10)
+        for cached in False, True:
+            outfile = StringIO()
+            result = worker.execute(
+                {"source": HELLO, "lang": "Brainfuck"}, outfile)
+            self.assertEqual(result["exit"], 0)
+            self.assertEqual(result["status"], "halted")
+            self.assertIs(result["cached"], cached)
+            self.assertEqual(outfile.getvalue(), "A")
+
+    def test_disk_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for cached in False, True:
+            worker = Worker(cache_dir=directory)
+            result = worker.execute(
+                {"source": HELLO, "lang": "Brainfuck"}, StringIO())
+            self.assertIs(result["cached"], cached)
+
+    def test_errors(self):
+        worker = Worker()
+        result = worker.execute({"source": "+[", "filename": "a.b"},
+                                StringIO())
+        self.assertEqual(result["exit"], 3)
+        result = worker.execute({"source": "", "filename": "a.unknown"},
+                                StringIO())
+        self.assertEqual(result["exit"], 1)
+
+    def test_interpreter_error(self):
+        """Any exception of an interpreter is sent as error."""
+        result = Worker().execute(
+            {"source": "9:*:*:*:*,@", "lang": "Befunge"}, StringIO())
+        self.assertEqual(result["exit"], 1)
+        self.assertIn("OverflowError", result["error"])
+
+    def test_timeout(self):
+        result = Worker(slice_steps=1000, timeout=0.05).execute(
+            {"source": "+[]", "lang": "Brainfuck"}, StringIO())
+        self.assertEqual(result["exit"], 5)
+        self.assertIn("time limit of 0.05 exceeded", result["error"])
+
+    def test_max_steps(self):
+        result = Worker(slice_steps=7).execute(
+            {"source": "O=0, O+34;", "lang": "My Unreliable Past",
+             "max_steps": 100}, StringIO())
+        self.assertEqual(result["status"], "exhausted")
+        self.assertEqual(result["steps"], 100)
+
+
+class DiskCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.disk = DiskCache(self.directory)
+
+    def test_roundtrip(self):
+        program = ("+[-]", {1: 3, 3: 1}, [1.5, None, b"x"])
+        self.disk.put("key", program)
+        self.assertEqual(self.disk.get("key"), program)
+        self.assertIsNone(self.disk.get("other"))
+        self.assertEqual((self.disk.hits, self.disk.misses), (1, 1))
+
+    def test_invalid(self):
+        self.disk.put("key", "program")
+        path = self.disk.path("key")
+        with open(path, "rb") as f:
+            data = f.read()
+
+        for invalid in b"", data[:10], data[:-1], b"PK" + data[2:]:
+            with open(path, "wb") as f:
+                f.write(invalid)
+            self.assertIsNone(self.disk.get("key"))
+
+        # A file written for another key isn't used.
+        self.disk.path = lambda key: path
+        with open(path, "wb") as f:
+            f.write(data)
+        self.assertIsNone(self.disk.get("other"))
+        self.assertEqual(self.disk.get("key"), "program")
+
+    def test_unmarshallable(self):
+        self.disk.put("key", object())
+        self.assertIsNone(self.disk.get("key"))
+
+    def test_key(self):
+        self.assertNotEqual(source_key("Brainfuck", "+"),
+                            source_key("Brainfuck", "+", "strict"))
+        self.assertNotEqual(source_key("Brainfuck", "+"),
+                            source_key("Ook", "+"))
+
+        cache = LRUCache(disk=self.disk)
+        source = "1 RIGHT\n"
+        cache.compile(MonkeysInterpreter(), source)
+        self.assertEqual(
+            cache.compile(MonkeysInterpreter(strict=True), source)[1], False)
+
+
+class ServerTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket = os.path.join(self.tmpdir, "esolang.sock")
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "esolang", "serve", "--socket",
+             self.socket, "--workers", "2"], env=env)
+
+        for _ in range(100):
+            if os.path.exists(self.socket):
+                break
+            time.sleep(0.05)
+
+    def tearDown(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        for name in os.listdir(self.tmpdir):
+            os.remove(os.path.join(self.tmpdir, name))
+        os.rmdir(self.tmpdir)
+
+    def test_request(self):
+        for _ in range(3):
+            outfile = StringIO()
+            result = server.request(self.socket, ",[.,]", "Brainfuck",
+                                    input="hi\0", outfile=outfile)
+            self.assertEqual(result["exit"], 0)
+            self.assertEqual(outfile.getvalue(), "hi")
+
+        result = server.request(self.socket, "[", filename="a.b",
+                                outfile=StringIO())
+        self.assertEqual(result["exit"], 3)
+        self.assertIn("error", result)
+
+    def test_shutdown(self):
+        self.proc.send_signal(signal.SIGTERM)
+        self.assertEqual(self.proc.wait(10), 0)
+        self.assertFalse(os.path.exists(self.socket))
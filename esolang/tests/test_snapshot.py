@@ -0,0 +1,108 @@
+"""Unittests for snapshots of the interpreter state."""
+
+import doctest
+
+from unittest import TestCase
+
+from io import StringIO
+
+from esolang import snapshot
+from esolang.interpreter import HALTED, EXHAUSTED
+from esolang.lang.abcr import ABCRInterpreter
+from esolang.lang.brainfuck import BrainfuckInterpreter
+from esolang.lang.l33t import L33tInterpreter
+from esolang.lang.past import Interpreter as PastInterpreter
+from esolang.snapshot import Encoder, Decoder
+from esolang.tests.test_instrument import ABCR_HELLO
+from esolang.tests.test_interpreter import PROGRAMS
+from esolang.tests.test_streams import L33T_ECHO
+
+
+class SnapshotTests(TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(snapshot)
+        self.assertEqual(failed, 0)
+
+    def test_codec(self):
+        values = [0, 1, -1, 127, 128, -129, 2 ** 70, -2 ** 70]
+        encoder = Encoder()
+        encoder.sints(values)
+        encoder.uint(300)
+        encoder.text("☺")
+        encoder.cells({-2: 1, 1: 255})
+        encoder.cells({0: 300})
+
+        decoder = Decoder(encoder.getvalue())
+        self.assertEqual(decoder.sints(), values)
+        self.assertEqual(decoder.uint(), 300)
+        self.assertEqual(decoder.text(), "☺")
+        memory = {}
+        decoder.cells(memory)
+        self.assertEqual(memory, {-2: 1, -1: 0, 0: 0, 1: 255})
+        decoder.cells(memory)
+        self.assertEqual(memory, {0: 300})
+        decoder.done()
+
+    def test_resume(self):
+        """Every interpreter continues exactly where it stopped."""
+        programs = PROGRAMS + [(ABCRInterpreter, ABCR_HELLO)]
+        for cls, source in programs:
+            for steps in 1, 5, 30:
+                whole = cls(outfile=StringIO())
+                self.assertEqual(whole.run(source), HALTED)
+
+                first = cls(outfile=StringIO())
+                if first.run(source, max_steps=steps) == HALTED:
+                    continue
+                data = first.snapshot()
+
+                second = cls(outfile=StringIO())
+                second.restore(data)
+                self.assertEqual(second.run(), HALTED)
+                self.assertEqual(second.steps, whole.steps)
+                self.assertEqual(
+                    first.outfile.getvalue() + second.outfile.getvalue(),
+                    whole.outfile.getvalue())
+                self.assertEqual(second.snapshot(), whole.snapshot())
+
+    def test_input_read_ahead(self):
+        """Input read from the infile, but not consumed, is kept."""
+        intp = L33tInterpreter(infile=StringIO("xy"), outfile=StringIO())
+        intp.run(L33T_ECHO)
+        intp.reader.unget(ord("y"))
+
+        copy = L33tInterpreter(infile=StringIO(), outfile=StringIO())
+        copy.restore(intp.snapshot())
+        self.assertEqual(copy.reader.getbyte(), ord("y"))
+
+    def test_compact(self):
+        intp = BrainfuckInterpreter(outfile=StringIO())
+        intp.run("+[>+]", max_steps=60000)
+        data = intp.snapshot()
+        self.assertLess(len(data), 30100)
+
+    def test_past(self):
+        source = "O=0, O+34; A+1; B=0, B+1, I=0;"
+        intp = PastInterpreter(infile=StringIO("abc"), outfile=StringIO(),
+                               seed=1)
+        self.assertEqual(intp.run(source, max_steps=500), EXHAUSTED)
+
+        copy = PastInterpreter(infile=StringIO(), outfile=StringIO())
+        copy.restore(intp.snapshot())
+        self.assertEqual(copy.registers, intp.registers)
+
+        intp.run(max_steps=2000)
+        copy.run(max_steps=2000)
+        self.assertEqual(copy.registers, intp.registers)
+        self.assertEqual(copy.steps, intp.steps)
+        self.assertEqual(copy.input, intp.input)
+
+    def test_errors(self):
+        data = BrainfuckInterpreter().snapshot()
+        self.assertRaises(ValueError, L33tInterpreter().restore, data)
+        self.assertRaises(ValueError, BrainfuckInterpreter().restore,
+                          data[:-1])
+        self.assertRaises(ValueError, BrainfuckInterpreter().restore,
+                          data + b"\0")
+        self.assertRaises(ValueError, BrainfuckInterpreter().restore,
+                          b"PK" + data)
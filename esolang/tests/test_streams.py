@@ -0,0 +1,117 @@
+"""Unittests for the byte I/O shared by the interpreters."""
+
+import doctest
+
+from unittest import TestCase
+
+from io import BytesIO, StringIO, TextIOWrapper
+
+from esolang import streams
+from esolang.interpreter import InputQueue, WAITING
+from esolang.lang.befunge import BefungeInterpreter
+from esolang.lang.brainfuck import BrainfuckInterpreter
+from esolang.lang.l33t import L33tInterpreter
+from esolang.streams import ByteReader, ByteWriter
+
+CAT = ",[.,]"
+
+# INC 71 + 1, WRT, END (the digits of a word are summed up)
+L33T_H = "7 99999998 1 55"
+L33T_ECHO = "2 1 55"
+
+
+class StreamTests(TestCase):
+    def test_doctests(self):
+        failed, _ = doctest.testmod(streams)
+        self.assertEqual(failed, 0)
+
+    def test_block_buffered(self):
+        raw = BytesIO()
+        writer = ByteWriter(raw, bufsize=4)
+        for byte in b"abcdef":
+            writer.putbyte(byte)
+        self.assertEqual(raw.getvalue(), b"abcd")
+        self.assertEqual(writer.written, 6)
+        writer.flush()
+        self.assertEqual(raw.getvalue(), b"abcdef")
+
+    def test_text_files(self):
+        """Text files are written through and decoded as latin-1."""
+        outfile = StringIO()
+        writer = ByteWriter(outfile)
+        writer.putbyte(233)
+        writer.write(b"\xe9")
+        self.assertEqual(outfile.getvalue(), "\xe9\xe9")
+
+    def test_text_wrapper(self):
+        """Real text files are used through their binary buffer."""
+        raw = BytesIO()
+        outfile = TextIOWrapper(raw, encoding="utf-8")
+        outfile.write("x")
+        writer = ByteWriter(outfile)
+        writer.putbyte(233)
+        writer.putbyte(0x263a)
+        writer.flush()
+        self.assertEqual(raw.getvalue(), b"x\xe9\xe2\x98\xba")
+
+        reader = ByteReader(TextIOWrapper(BytesIO(b"\xe9a")))
+        self.assertEqual(reader.read(3), [233, 97])
+
+    def test_limit(self):
+        raw = BytesIO()
+        writer = ByteWriter(raw, bufsize=4)
+        writer.limit = 5
+        writer.keep = 2
+        writer.write(b"abcdefgh")
+        writer.flush()
+        self.assertEqual(raw.getvalue(), b"abcde")
+        self.assertEqual(writer.written, 8)
+        self.assertEqual(writer.output, "ab")
+
+    def test_flush_before_read(self):
+        outfile = BytesIO()
+        intp = BrainfuckInterpreter(infile=InputQueue(), outfile=outfile)
+        intp.infile.feed("a")
+        intp.run(",.,.")
+        self.assertEqual(outfile.getvalue(), b"a")
+
+    def test_swap_files(self):
+        """Bytes read ahead aren't lost, when the infile is replaced."""
+        intp = BrainfuckInterpreter(infile=BytesIO(b"ab"), outfile=BytesIO())
+        intp.run(",.", max_steps=1)
+        intp.infile = StringIO("c")
+        intp.run(max_steps=1)
+        intp.run(",.,.")
+        self.assertEqual(intp.outfile.getvalue(), b"abc")
+
+    def test_binary(self):
+        data = bytes(range(1, 256))
+        intp = BrainfuckInterpreter(infile=BytesIO(data + b"\0"),
+                                    outfile=BytesIO())
+        intp.run(CAT)
+        self.assertEqual(intp.outfile.getvalue(), data)
+
+    def test_l33t(self):
+        intp = L33tInterpreter(outfile=BytesIO())
+        intp.run(L33T_H)
+        self.assertEqual(intp.outfile.getvalue(), b"H")
+
+        intp = L33tInterpreter(infile=BytesIO(b"x"), outfile=BytesIO())
+        intp.run(L33T_ECHO)
+        self.assertEqual(intp.outfile.getvalue(), b"x")
+
+        intp = L33tInterpreter(infile=BytesIO(), outfile=BytesIO())
+        intp.run(L33T_ECHO)
+        self.assertEqual(intp.outfile.getvalue(), b"\0")
+
+    def test_befunge_input(self):
+        intp = BefungeInterpreter(infile=StringIO("x 42!"),
+                                  outfile=StringIO())
+        intp.run("~&.,&.@")
+        self.assertEqual(intp.outfile.getvalue(), "42 x-1 ")
+
+        intp = BefungeInterpreter(infile=InputQueue("1"), outfile=StringIO())
+        self.assertEqual(intp.run("&.@"), WAITING)
+        intp.infile.feed("2 ")
+        intp.run()
+        self.assertEqual(intp.outfile.getvalue(), "12 ")
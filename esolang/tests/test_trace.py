@@ -0,0 +1,85 @@
+"""Unittests for the execution trace recorder."""
+
+import doctest
+import os
+import shutil
+import tempfile
+
+from io import BytesIO, StringIO
+from unittest import TestCase
+
+from esolang import trace
+from esolang.lang.abcr import ABCRInterpreter
+from esolang.lang.l33t import L33tInterpreter
+from esolang.lang.past import Interpreter as PastInterpreter
+from esolang.tests.test_instrument import ABCR_HELLO
+from esolang.tests.test_interpreter import PROGRAMS
+from esolang.tests.test_streams import L33T_ECHO
+from esolang.trace import Tracer, Trace
+
+
+class TraceTests(TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "run.trace")
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.path))
+
+    def test_doctests(self):
+        failed, _ = doctest.testmod(trace)
+        self.assertEqual(failed, 0)
+
+    def test_interpreters(self):
+        """The positions and the output of every interpreter are
+        recorded."""
+        programs = PROGRAMS + [(ABCRInterpreter, ABCR_HELLO),
+                               (L33tInterpreter, L33T_ECHO)]
+        for cls, source in programs:
+            intp = cls(infile=StringIO("hi"), outfile=StringIO())
+            positions = []
+            intp.instrument(on_step=lambda intp, opcode: positions.append(
+                intp.position))
+            intp.load(source)
+            positions.insert(0, intp.position)
+            intp.run()
+
+            intp = cls(infile=StringIO("hi"), outfile=StringIO())
+            with Tracer(intp, self.path, chunk=64):
+                intp.run(source)
+
+            recorded = Trace(self.path)
+            self.assertEqual(recorded.lang, cls.lang)
+            self.assertEqual(
+                [v for kind, v in recorded.events() if kind == "step"],
+                positions[:-1])
+
+            output = BytesIO()
+            self.assertEqual(recorded.replay(output), intp.steps)
+            self.assertEqual(output.getvalue().decode("utf-8"),
+                             intp.outfile.getvalue())
+
+    def test_past(self):
+        intp = PastInterpreter(infile=StringIO(), outfile=StringIO(), seed=0)
+        with Tracer(intp, self.path):
+            intp.run("O=0, O+34;", max_steps=100)
+        summary = Trace(self.path).summary()
+        self.assertEqual(summary["steps"], 100)
+        self.assertEqual(summary["hot_positions"], [(0, 100)])
+
+    def test_killed(self):
+        """Events are readable before the tracer is closed."""
+        intp = ABCRInterpreter(outfile=StringIO())
+        tracer = Tracer(intp, self.path)
+        intp.run(ABCR_HELLO)
+        self.assertEqual(os.path.getsize(self.path), tracer.chunk)
+
+        summary = Trace(self.path).summary()
+        self.assertEqual(summary["steps"], intp.steps)
+        self.assertEqual(summary["output_bytes"], 1)
+        tracer.close()
+        self.assertEqual(os.path.getsize(self.path), tracer.pos)
+
+    def test_not_a_trace(self):
+        with open(self.path, "wb") as f:
+            f.write(b"ESOS\x01")
+        self.assertRaises(ValueError, Trace, self.path)
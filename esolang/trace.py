@@ -0,0 +1,276 @@
+"""Record the steps and I/O of a run into a compact binary trace.
+
+    >>> import os, tempfile
+    >>> from io import StringIO
+    >>> from esolang.lang.brainfuck import BrainfuckInterpreter
+    >>> path = os.path.join(tempfile.mkdtemp(), "run.trace")
+    >>> intp = BrainfuckInterpreter(infile=StringIO("a"), outfile=StringIO())
+    >>> with Tracer(intp, path):
+    ...     intp.run(",+.")
+    'halted'
+    >>> trace = Trace(path)
+    >>> for event in trace.events():
+    ...     print(event)
+    ('input', b'a')
+    ('step', 0)
+    ('step', 1)
+    ('output', b'b')
+    ('step', 2)
+    >>> trace.summary()["steps"]
+    3
+
+The tracer uses the hooks of an Instrumentation (see
+esolang.instrument), so it works with the step() loop of every
+interpreter. I/O events come before the step, that caused them.
+
+A trace starts with MAGIC, the format VERSION and the language,
+followed by the events as varints (see esolang.snapshot): the low two
+bits are the kind of the event, the other bits the distance to the
+position (see Interpreter.position) of the last step (zigzag encoded)
+or the length of the data, which follows. A step to the next position
+takes a single byte. The file is memory-mapped and grown in chunks,
+so the events are in the file, even if the process is killed. The
+rest of the last chunk consists of zero bytes then, which end the
+events.
+"""
+
+from __future__ import print_function
+
+import mmap
+import os
+import sys
+
+from argparse import ArgumentParser
+from collections import Counter
+
+from esolang.snapshot import Encoder, Decoder
+
+MAGIC = b"ESOT"
+VERSION = 1
+
+# The kinds of events (0 ends the events)
+STEP = 1
+OUTPUT = 2
+INPUT = 3
+
+KINDS = {STEP: "step", OUTPUT: "output", INPUT: "input"}
+
+
+class Tracer(object):
+    """Writes a trace of intp to the file path until it's closed.
+
+    Args:
+        intp: The interpreter. The hooks of its Instrumentation are
+              replaced (a new one is attached, if it has none).
+        path: The trace file (replaced, if it exists).
+        chunk: The number of bytes the file grows by at least.
+    """
+
+    def __init__(self, intp, path, chunk=1 << 20):
+        self.intp = intp
+        self.chunk = chunk
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.map = None
+        self.size = self.pos = 0
+
+        # The position of the last recorded and the next step
+        self.last = 0
+        self.next = intp.position
+
+        header = Encoder()
+        header.data += MAGIC
+        header.uint(VERSION)
+        header.text(intp.lang)
+        self.write(header.getvalue())
+
+        instrumentation = intp.instrumentation
+        if instrumentation is None:
+            instrumentation = intp.instrument()
+        instrumentation.on_execute = self.on_execute
+        instrumentation.on_step = self.on_step
+        instrumentation.on_output = self.on_output
+        instrumentation.on_input = self.on_input
+        self.instrumentation = instrumentation
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def grow(self, size):
+        """Make the file (and the map) at least size bytes large."""
+        size = max(size, self.size * 2, self.chunk)
+        if self.map is not None:
+            self.map.close()
+        os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        self.size = size
+
+    def write(self, data):
+        end = self.pos + len(data)
+        if end > self.size:
+            self.grow(end)
+        self.map[self.pos:end] = data
+        self.pos = end
+
+    def event(self, value):
+        """Write a varint."""
+        if value < 0x80 and self.pos < self.size:
+            self.map[self.pos] = value
+            self.pos += 1
+            return
+        encoder = Encoder()
+        encoder.uint(value)
+        self.write(encoder.data)
+
+    def on_execute(self, intp):
+        # The program may have been loaded since the last step.
+        self.next = intp.position
+
+    def on_step(self, intp, opcode):
+        position = self.next
+        delta = position - self.last
+        self.last = position
+        self.next = intp.position
+        self.event((delta * 2 if delta >= 0 else -delta * 2 - 1) << 2 | STEP)
+
+    def on_output(self, intp, data):
+        self.data(OUTPUT, data)
+
+    def on_input(self, intp, data):
+        self.data(INPUT, data)
+
+    def data(self, kind, data):
+        if not data:
+            return
+        if not isinstance(data, bytes):
+            data = data.encode("utf-8", "surrogatepass")
+        self.event(len(data) << 2 | kind)
+        self.write(data)
+
+    def close(self):
+        """Stop tracing and cut the file to the written events."""
+        if self.fd is None:
+            return
+
+        instrumentation = self.instrumentation
+        instrumentation.on_execute = instrumentation.on_step = None
+        instrumentation.on_output = instrumentation.on_input = None
+
+        if self.map is not None:
+            self.map.close()
+        os.ftruncate(self.fd, self.pos)
+        os.close(self.fd)
+        self.fd = None
+
+
+class Trace(object):
+    """Reads a trace written by a Tracer.
+
+    Raises:
+        ValueError: If the file isn't a trace.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = b""
+
+        self.decoder = decoder = Decoder(data)
+        if decoder.take(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a trace.")
+        version = decoder.uint()
+        if version != VERSION:
+            raise ValueError("Unsupported trace version %d." % version)
+        self.lang = decoder.text()
+        self.start = decoder.pos
+
+    def events(self):
+        """Yield the events as ("step", position), ("output", data) or
+        ("input", data)."""
+        decoder = self.decoder
+        data = decoder.data
+        decoder.pos = self.start
+        position = 0
+
+        while decoder.pos < len(data) and data[decoder.pos]:
+            value = decoder.uint()
+            kind = value & 3
+            value >>= 2
+            if kind == STEP:
+                position += value >> 1 if not value & 1 else -(value >> 1) - 1
+                yield "step", position
+            else:
+                yield KINDS[kind], bytes(decoder.take(value))
+
+    def replay(self, outfile):
+        """Write the output of the traced run to the binary outfile.
+
+        Returns:
+            int: The number of steps.
+        """
+        steps = 0
+        for kind, value in self.events():
+            if kind == "step":
+                steps += 1
+            elif kind == "output":
+                outfile.write(value)
+        return steps
+
+    def summary(self, top=10):
+        """Return the totals and the top most executed positions."""
+        positions = Counter()
+        output = input = 0
+        for kind, value in self.events():
+            if kind == "step":
+                positions[value] += 1
+            elif kind == "output":
+                output += len(value)
+            else:
+                input += len(value)
+
+        return {
+            "lang": self.lang,
+            "steps": sum(positions.values()),
+            "output_bytes": output,
+            "input_bytes": input,
+            "hot_positions": positions.most_common(top),
+        }
+
+
+def main(argv=None):
+    parser = ArgumentParser(
+        prog="python -m esolang.trace",
+        description="Summarize or replay a trace (see --trace).")
+    parser.add_argument("filename", help="the trace file")
+    parser.add_argument(
+        "--replay", action="store_true",
+        help="write the output of the traced run to stdout")
+    args = parser.parse_args(argv)
+
+    try:
+        trace = Trace(args.filename)
+    except (IOError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    if args.replay:
+        trace.replay(getattr(sys.stdout, "buffer", sys.stdout))
+        return 0
+
+    summary = trace.summary()
+    print("lang: %s" % summary["lang"])
+    print("steps: %d" % summary["steps"])
+    print("output: %d byte(s)" % summary["output_bytes"])
+    print("input: %d byte(s)" % summary["input_bytes"])
+    print("hot positions:")
+    for position, n in summary["hot_positions"]:
+        print("  %-8d %10d" % (position, n))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())